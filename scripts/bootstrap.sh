@@ -11,9 +11,9 @@ cd "$ROOT_DIR"
 echo "[bootstrap] Root directory: $ROOT_DIR"
 
 # Create data directories
-mkdir -p data/inbox data/logs data/briefs
+mkdir -p data/inbox data/logs data/briefs data/index
 
-echo "[bootstrap] Ensured data directories: data/inbox, data/logs, data/briefs"
+echo "[bootstrap] Ensured data directories: data/inbox, data/logs, data/briefs, data/index"
 
 # Copy .env.example to .env if .env does not exist
 if [[ ! -f .env ]]; then
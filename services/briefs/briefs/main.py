@@ -1,30 +1,119 @@
 from __future__ import annotations
 
+import argparse
+import os
 from datetime import datetime, timedelta
 from pathlib import Path
+from typing import List, Optional
 
 from services.common.events import DailyBriefEvent, DailyBriefPayload, make_event
+from services.common.rollups import Rollup, RollupStore
 
 
-def generate_brief(now: datetime | None = None) -> DailyBriefEvent:
+LOG_DIR = Path(os.getenv("EVIDENCE_LOG_DIR", "data/logs"))
+ROLLUP_DIR = Path(os.getenv("EVIDENCE_ROLLUP_DIR", "data/rollups"))
+BRIEF_DIR = Path("data/briefs")
+
+TOP_N = 10
+
+
+def _rate(part: int, whole: int) -> str:
+    return f"{part / whole:.0%}" if whole else "n/a"
+
+
+def render_brief(rollup: Rollup, start: datetime, end: datetime) -> str:
+    """Markdown summary of one period's rollup."""
+
+    lines: List[str] = [
+        "# Daily Brief",
+        "",
+        f"Period: {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M} UTC",
+        "",
+        "## Activity",
+        "",
+    ]
+    if rollup.events:
+        lines += [f"- {kind}: {count}" for kind, count in sorted(rollup.events.items())]
+    else:
+        lines.append("- No evidence recorded.")
+
+    lines += [
+        "",
+        "## Ingestion and Indexing",
+        "",
+        f"- Documents ingested: {rollup.events['ingestion']} ({rollup.ingested_bytes} bytes)",
+        f"- Documents indexed: {rollup.indexed_documents} ({rollup.indexed_chunks} chunks)",
+        f"- Index errors: {rollup.index_errors}",
+        "",
+        "## Answers",
+        "",
+        f"- Questions answered: {rollup.answers}",
+        f"- Abstained: {rollup.abstained} ({_rate(rollup.abstained, rollup.answers)})",
+        f"- Served from cache: {rollup.cached} ({_rate(rollup.cached, rollup.answers)})",
+    ]
+    if rollup.answer_latency.count:
+        p50, p95, p99 = (rollup.latency_ms(q) for q in (0.5, 0.95, 0.99))
+        lines.append(f"- Latency: p50 {p50} ms, p95 {p95} ms, p99 {p99} ms")
+
+    if rollup.cited_documents:
+        lines += ["", "## Most Cited Documents", ""]
+        lines += [f"- {doc_id}: {n}" for doc_id, n in rollup.cited_documents.most_common(TOP_N)]
+
+    lines += ["", "## Evaluation", ""]
+    if rollup.eval_cases:
+        lines.append(
+            f"- Cases passed: {rollup.eval_passed}/{rollup.eval_cases} ({_rate(rollup.eval_passed, rollup.eval_cases)})"
+        )
+    else:
+        lines.append("- No evaluation runs.")
+
+    if rollup.failure_reasons:
+        lines += ["", "## Top Failure Reasons", ""]
+        lines += [f"- {reason}: {n}" for reason, n in rollup.failure_reasons.most_common(TOP_N)]
+
+    return "\n".join(lines) + "\n"
+
+
+def generate_brief(
+    now: datetime | None = None,
+    *,
+    period: timedelta = timedelta(days=1),
+    log_dir: Path = LOG_DIR,
+    rollup_dir: Path = ROLLUP_DIR,
+    brief_dir: Path = BRIEF_DIR,
+) -> DailyBriefEvent:
+    """Write the brief for `[now - period, now)` from the hourly evidence rollups.
+
+    The period is widened to whole hours. Only log lines not yet folded into a
+    rollup (normally the tail of the current hour) are read; everything else
+    comes from the rollup files.
+    """
+
     now = now or datetime.utcnow()
-    start = now - timedelta(days=1)
-    brief_dir = Path("data/briefs")
-    brief_dir.mkdir(parents=True, exist_ok=True)
+    start = now - period
+    store = RollupStore(rollup_dir)
+    store.catch_up(log_dir)
+    rollup = store.period(start, now)
 
+    brief_dir.mkdir(parents=True, exist_ok=True)
     brief_path = brief_dir / f"{now.date()}_daily_brief.md"
-    brief_path.write_text("# Daily Brief\n\n(Stub contents)", encoding="utf-8")
+    brief_path.write_text(render_brief(rollup, start, now), encoding="utf-8")
 
     payload = DailyBriefPayload(
         brief_path=str(brief_path),
-        num_items=0,
+        num_items=sum(rollup.events.values()),
         period_start=start,
         period_end=now,
     )
     return DailyBriefEvent(event_type="daily_brief", service="briefs", payload=payload)
 
 
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Write a brief from the hourly evidence rollups.")
+    parser.add_argument("--hours", type=int, default=24, help="Length of the period ending now")
+    args = parser.parse_args(argv)
+    print(generate_brief(period=timedelta(hours=args.hours)))
+
+
 if __name__ == "__main__":
-    ev = generate_brief()
-    print(ev)
-  
+    main()
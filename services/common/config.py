@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict
+
+import yaml
+
+from services.common.settings import get_settings
+
+
+_DEFAULT_MODELS = {
+    "chat_model": "llama3.1:8b",
+    "embedding_model": "nomic-embed-text",
+    "judge_model": "llama3.1:8b",
+}
+
+
+@lru_cache(maxsize=None)
+def load_config(name: str) -> Dict[str, Any]:
+    """Load `config/<name>.yaml` as a plain mapping.
+
+    The directory comes from `FACTORY_CONFIG_DIR` (default: `config`). A
+    missing file yields an empty mapping so services can fall back to their
+    built-in defaults.
+    """
+
+    path = Path(get_settings().config_dir) / f"{name}.yaml"
+    if not path.exists():
+        return {}
+    data = yaml.safe_load(path.read_text(encoding="utf-8"))
+    return data or {}
+
+
+def model_name(role: str) -> str:
+    """Return the model configured for `role` (e.g. "chat_model") in `config/models.yaml`.
+
+    The environment is taken from `FACTORY_ENV`, falling back to the file's
+    `default_env`.
+    """
+
+    cfg = load_config("models")
+    envs = cfg.get("environments", {})
+    env = envs.get(get_settings().env) or envs.get(cfg.get("default_env", "local"), {})
+    return env.get(role, _DEFAULT_MODELS[role])
@@ -17,7 +17,7 @@ def get_engine():
     global _engine, _SessionLocal
     if _engine is None:
         s = get_settings()
-        url = f"postgresql+psycopg2://{s.db_user}:{s.db_password}@{s.db_host}:{s.db_port}/{s.db_name}"
+        url = s.db_url or f"postgresql+psycopg2://{s.db_user}:{s.db_password}@{s.db_host}:{s.db_port}/{s.db_name}"
         _engine = create_engine(url, pool_pre_ping=True)
         _SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=_engine)
     return _engine
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
+import os
 from datetime import datetime
-from typing import Any, Dict, List, Literal, Optional
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Mapping, Optional, Type, Union, get_args
 from uuid import UUID, uuid4
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
+from services.common.tracing import current_trace_id
 
-SCHEMA_VERSION = "1.0.0"
+
+SCHEMA_VERSION = "1.5.0"
 
 
 class BaseEvent(BaseModel):
@@ -18,6 +22,7 @@ class BaseEvent(BaseModel):
     event_type: str
     service: str  # e.g., "ingestion", "indexer", "rag-api", "eval", "briefs"
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+    trace_id: Optional[str] = None  # W3C trace id of the request that produced the event
     payload: Dict[str, Any]
 
     class Config:
@@ -69,6 +74,9 @@ class AnswerPayload(BaseModel):
     latency_ms: int
     model_name: str
     abstained: bool = False
+    ttft_ms: Optional[int] = None  # time to first streamed token, streaming answers only
+    cached: bool = False  # served from the RAG answer cache
+    stage_ms: Dict[str, float] = Field(default_factory=dict)  # e.g. {"embed": 12.1, "search": 3.4, "generate": 850.0}
 
 
 class AnswerEvent(BaseEvent):
@@ -94,6 +102,7 @@ class EvaluationPayload(BaseModel):
     score: float
     passed: bool
     failure_reasons: List[str] = []
+    reused_from: Optional[str] = None  # run whose answer was re-graded instead of asking again
 
 
 class EvaluationEvent(BaseEvent):
@@ -102,10 +111,78 @@ class EvaluationEvent(BaseEvent):
 
 
 def make_event(event: BaseEvent, *, service: str) -> Dict[str, Any]:
-    """Set the service and return a JSON-serializable dict for logging.
+    """Set the service and trace id and return a JSON-serializable dict for logging.
 
     This is the only function other services should use to emit events.
     """
     event.service = service
-    return event.model_dump()
-  
+    if event.trace_id is None:
+        event.trace_id = current_trace_id()
+    return event.model_dump(mode="json")
+
+
+@lru_cache(maxsize=None)
+def _adapter(event_cls: Type[BaseEvent]) -> TypeAdapter:
+    return TypeAdapter(event_cls)
+
+
+class EventEncoder:
+    """Fast path for bulk emitters: validate and serialize events straight to JSON bytes.
+
+    Validation and serialization run in pydantic-core through a pre-built
+    adapter for `event_cls`, so defaults (`schema_version`, `event_id`,
+    `timestamp`) and payload checks are the same as constructing the model,
+    and the bytes decode to exactly what `make_event` returns. Roughly twice
+    as fast as building the model and calling `make_event`
+    (`python -m tests.benchmarks.bench_events`).
+    """
+
+    def __init__(self, event_cls: Type[BaseEvent], *, service: str) -> None:
+        self.event_type: str = get_args(event_cls.model_fields["event_type"].annotation)[0]
+        self.service = service
+        adapter = _adapter(event_cls)
+        self._validate = adapter.validator.validate_python
+        self._to_json = adapter.serializer.to_json
+
+    def encode(
+        self,
+        payload: Union[BaseModel, Mapping[str, Any]],
+        *,
+        trace_id: Optional[str] = None,
+        event_id: Optional[str] = None,
+    ) -> bytes:
+        fields = {
+            "event_type": self.event_type,
+            "service": self.service,
+            "trace_id": trace_id if trace_id is not None else current_trace_id(),
+            "payload": payload,
+        }
+        if event_id is not None:
+            fields["event_id"] = event_id
+        return self._to_json(self._validate(fields))
+
+    def encode_many(self, payloads: Iterable[Union[BaseModel, Mapping[str, Any]]]) -> List[bytes]:
+        payloads = list(payloads)
+        trace_id = current_trace_id()
+        return [
+            self.encode(p, trace_id=trace_id, event_id=event_id)
+            for p, event_id in zip(payloads, _uuid4_strings(len(payloads)))
+        ]
+
+
+def _uuid4_strings(n: int) -> Iterator[str]:
+    """`n` random version-4 UUIDs as strings, from one `os.urandom` call.
+
+    `uuid4()` is a third of the encoder's time when called per event.
+    """
+
+    raw = os.urandom(16 * n).hex()
+    for i in range(0, 32 * n, 32):
+        h = raw[i : i + 32]
+        yield f"{h[:8]}-{h[8:12]}-4{h[13:16]}-{'89ab'[int(h[16], 16) & 3]}{h[17:20]}-{h[20:]}"
+
+
+def batch_body(encoded: Iterable[bytes]) -> bytes:
+    """Evidence Logger `POST /events` body for pre-encoded events (send with `content=`)."""
+
+    return b'{"events":[' + b",".join(b'{"data":' + e + b"}" for e in encoded) + b"]}"
@@ -0,0 +1,452 @@
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import os
+import re
+import threading
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+
+_TOKEN_RE = re.compile(r"\w+(?:[-./:#]\w+)*")
+_PART_RE = re.compile(r"[-_./:#]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokenizer that keeps identifiers intact.
+
+    Compound tokens such as `POL-2024-007`, `ERR_CONN_RESET` or `v1.2.3` are
+    emitted whole (so exact identifier queries match precisely) and also split
+    into their parts (so partial queries still match).
+    """
+
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer(text.lower()):
+        tok = match.group(0)
+        tokens.append(tok)
+        if not tok.isalnum():
+            tokens.extend(p for p in _PART_RE.split(tok) if p)
+    return tokens
+
+
+def _encode_postings(postings: Iterable[Tuple[int, int]]) -> bytes:
+    """Varint-encode `(ordinal, tf)` pairs, delta-coding the ordinals."""
+
+    out = bytearray()
+    prev = 0
+    for ordinal, tf in postings:
+        for value in (ordinal - prev, tf):
+            while value >= 0x80:
+                out.append((value & 0x7F) | 0x80)
+                value >>= 7
+            out.append(value)
+        prev = ordinal
+    return bytes(out)
+
+
+def _decode_postings(buf: np.ndarray, offset: int, length: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorised inverse of `_encode_postings`; returns `(ordinals, tfs)` arrays."""
+
+    b = buf[offset : offset + length].astype(np.uint64)
+    if not len(b):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    ends = np.flatnonzero(b < 0x80)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    group = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = (np.arange(len(b)) - starts[group]).astype(np.uint64) * np.uint64(7)
+    values = np.add.reduceat((b & np.uint64(0x7F)) << shifts, starts).astype(np.int64)
+    return np.cumsum(values[0::2]), values[1::2]
+
+
+@dataclass
+class Segment:
+    """Immutable on-disk unit of the lexical index.
+
+    `terms` maps a term to `(offset, length, df)` inside `postings`; ordinals
+    index into `doc_ids` / `doc_lens`.
+    """
+
+    name: str
+    doc_ids: List[str]
+    doc_lens: array
+    terms: Dict[str, Tuple[int, int, int]]
+    postings: bytes
+    _postings_np: np.ndarray = field(init=False, repr=False)
+    _lens_np: np.ndarray = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._postings_np = np.frombuffer(self.postings, dtype=np.uint8)
+        self._lens_np = np.frombuffer(self.doc_lens, dtype=np.uint32).astype(np.float32)
+
+    @classmethod
+    def build(cls, name: str, docs: List[Tuple[str, Counter]]) -> "Segment":
+        inverted: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lens = array("I")
+        for ordinal, (_, tfs) in enumerate(docs):
+            doc_lens.append(sum(tfs.values()))
+            for term, tf in tfs.items():
+                inverted.setdefault(term, []).append((ordinal, tf))
+
+        buf = bytearray()
+        terms: Dict[str, Tuple[int, int, int]] = {}
+        for term in sorted(inverted):
+            encoded = _encode_postings(inverted[term])
+            terms[term] = (len(buf), len(encoded), len(inverted[term]))
+            buf.extend(encoded)
+
+        return cls(name=name, doc_ids=[d for d, _ in docs], doc_lens=doc_lens, terms=terms, postings=bytes(buf))
+
+    def postings_for(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        entry = self.terms.get(term)
+        if entry is None:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty
+        return _decode_postings(self._postings_np, entry[0], entry[1])
+
+    def term_frequencies(self) -> List[Counter]:
+        """Rebuild per-document term counts (used when merging)."""
+
+        docs: List[Counter] = [Counter() for _ in self.doc_ids]
+        for term in self.terms:
+            ordinals, tfs = self.postings_for(term)
+            for ordinal, tf in zip(ordinals.tolist(), tfs.tolist()):
+                docs[ordinal][term] = tf
+        return docs
+
+    def save(self, root: Path) -> None:
+        meta = {"doc_ids": self.doc_ids, "doc_lens": self.doc_lens.tolist(), "terms": self.terms}
+        (root / f"{self.name}.post").write_bytes(self.postings)
+        _write_json_atomic(root / f"{self.name}.json", meta)
+
+    @classmethod
+    def load(cls, root: Path, name: str) -> "Segment":
+        meta = json.loads((root / f"{name}.json").read_text(encoding="utf-8"))
+        return cls(
+            name=name,
+            doc_ids=meta["doc_ids"],
+            doc_lens=array("I", meta["doc_lens"]),
+            terms={t: tuple(v) for t, v in meta["terms"].items()},  # type: ignore[misc]
+            postings=(root / f"{name}.post").read_bytes(),
+        )
+
+
+def _write_json_atomic(path: Path, data: object) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+@dataclass
+class _Memtable:
+    docs: List[Tuple[str, Counter]] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class LexicalSnapshot:
+    """One consistent, read-only view of a `LexicalIndex`.
+
+    Built whole on reload or commit and published with a single reference
+    assignment; searches running on an older snapshot are unaffected.
+    """
+
+    segments: Tuple[Segment, ...]
+    deleted: Dict[str, FrozenSet[int]]
+    k1: float = 1.2
+    b: float = 0.75
+    locations: Dict[str, Tuple[str, int]] = field(init=False, repr=False)
+    live: Dict[str, np.ndarray] = field(init=False, repr=False)
+    total_len: int = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        locations: Dict[str, Tuple[str, int]] = {}
+        live_masks: Dict[str, np.ndarray] = {}
+        total_len = 0
+        for seg in self.segments:
+            dead = self.deleted.get(seg.name, frozenset())
+            live = np.ones(len(seg.doc_ids), dtype=bool)
+            if dead:
+                live[list(dead)] = False
+            live_masks[seg.name] = live
+            for ordinal, doc_id in enumerate(seg.doc_ids):
+                if ordinal not in dead:
+                    locations[doc_id] = (seg.name, ordinal)
+            total_len += int(seg._lens_np[live].sum())
+        object.__setattr__(self, "locations", locations)
+        object.__setattr__(self, "live", live_masks)
+        object.__setattr__(self, "total_len", total_len)
+
+    def __len__(self) -> int:
+        return len(self.locations)
+
+    def align(self, ids: Mapping[str, int]) -> Dict[str, np.ndarray]:
+        """Map each segment's ordinals through `ids` (doc id -> row); -1 where absent.
+
+        Lets a caller holding a row mask over another index derive `masks`
+        for `search` with one gather per segment.
+        """
+
+        return {
+            seg.name: np.fromiter((ids.get(doc_id, -1) for doc_id in seg.doc_ids), dtype=np.int64, count=len(seg.doc_ids))
+            for seg in self.segments
+        }
+
+    def search(
+        self,
+        query: str,
+        *,
+        top_k: int = 10,
+        allowed: Optional[Iterable[str]] = None,
+        masks: Optional[Mapping[str, np.ndarray]] = None,
+    ) -> List[Tuple[str, float]]:
+        """Return up to `top_k` `(doc_id, bm25_score)` pairs, best first.
+
+        `allowed` optionally restricts results to the given doc ids; it is
+        turned into per-segment masks so scoring never leaves that set.
+        Callers that already have those masks (boolean arrays over each
+        segment's ordinals, keyed by segment name) pass them as `masks`.
+        When both are given, only documents passing both are scored.
+        """
+
+        terms = set(tokenize(query))
+        n_docs = len(self.locations)
+        if not terms or n_docs == 0:
+            return []
+
+        if masks is not None:
+            masks = {name: masks[name] & live for name, live in self.live.items()}
+        else:
+            masks = self.live
+        if allowed is not None:
+            only = {name: np.zeros_like(mask) for name, mask in masks.items()}
+            for doc_id in allowed:
+                loc = self.locations.get(doc_id)
+                if loc is not None:
+                    only[loc[0]][loc[1]] = True
+            masks = {name: mask & only[name] for name, mask in masks.items()}
+
+        avgdl = self.total_len / n_docs or 1.0
+        k1, b = self.k1, self.b
+        acc: Dict[int, np.ndarray] = {}
+        for term in terms:
+            df = sum(seg.terms[term][2] for seg in self.segments if term in seg.terms)
+            if df == 0:
+                continue
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            for seg_no, seg in enumerate(self.segments):
+                ordinals, tfs = seg.postings_for(term)
+                keep = masks[seg.name][ordinals]
+                ordinals, tfs = ordinals[keep], tfs[keep]
+                if not len(ordinals):
+                    continue
+                norm = tfs + k1 * (1.0 - b + b * seg._lens_np[ordinals] / avgdl)
+                scores = acc.get(seg_no)
+                if scores is None:
+                    scores = acc[seg_no] = np.zeros(len(seg.doc_ids), dtype=np.float32)
+                scores[ordinals] += idf * tfs * (k1 + 1.0) / norm
+
+        candidates: List[Tuple[str, float]] = []
+        for seg_no, scores in acc.items():
+            seg = self.segments[seg_no]
+            hits = np.flatnonzero(scores > 0)
+            if len(hits) > top_k:
+                hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+            candidates.extend((seg.doc_ids[i], float(scores[i])) for i in hits)
+
+        return heapq.nlargest(top_k, candidates, key=lambda kv: kv[1])
+
+
+class LexicalIndex:
+    """Segmented BM25 inverted index stored under `root`.
+
+    Writers buffer documents with `add` and publish them with `commit`, which
+    flushes a new segment and runs a tiered merge: whenever `merge_factor`
+    segments fall into the same size tier they are rewritten as one segment,
+    dropping deleted documents. Readers call `refresh` to pick up commits from
+    another process; the manifest is replaced atomically so a reader always
+    sees a consistent set of segments.
+
+    Searches run against `snapshot`, an immutable `LexicalSnapshot` replaced
+    wholesale by `refresh` and `commit`. `segments` and `deleted` are the
+    writer's working state and only become visible to searches on commit.
+
+    Document frequencies include deleted-but-unmerged documents, as in most
+    segment-based engines; the skew disappears on the next merge.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, root: Path, *, k1: float = 1.2, b: float = 0.75, merge_factor: int = 4) -> None:
+        self.root = Path(root)
+        self.k1 = k1
+        self.b = b
+        self.merge_factor = merge_factor
+        self.generation = 0
+        self.segments: List[Segment] = []
+        self.deleted: Dict[str, set] = {}
+        self.snapshot = LexicalSnapshot(segments=(), deleted={}, k1=k1, b=b)
+        self._locations: Dict[str, Tuple[str, int]] = {}
+        self._memtable = _Memtable()
+        self._next_segment = 0
+        self._manifest_mtime: Optional[int] = None
+        self._refresh_lock = threading.Lock()
+        self.refresh()
+
+    # -- reading -----------------------------------------------------------
+
+    def refresh(self) -> bool:
+        """Reload segments if another process committed. Returns True on reload.
+
+        Reads every segment from disk, so call it from a worker thread in
+        async code.
+        """
+
+        path = self.root / self.MANIFEST
+        with self._refresh_lock:
+            try:
+                mtime = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                return False
+            if mtime == self._manifest_mtime:
+                return False
+
+            for _ in range(3):
+                manifest = json.loads(path.read_text(encoding="utf-8"))
+                try:
+                    segments = [Segment.load(self.root, name) for name in manifest["segments"]]
+                except FileNotFoundError:
+                    # A concurrent merge removed a segment between reads; retry
+                    # against the newer manifest.
+                    continue
+                break
+            else:
+                return False
+
+            self.segments = segments
+            self.deleted = {name: set(ords) for name, ords in manifest.get("deleted", {}).items()}
+            self.generation = manifest.get("generation", 0)
+            self._next_segment = manifest.get("next_segment", len(segments))
+            self._manifest_mtime = mtime
+            self._publish()
+            return True
+
+    def _publish(self) -> None:
+        """Swap in a snapshot of the writer's current segments."""
+
+        snapshot = LexicalSnapshot(
+            segments=tuple(self.segments),
+            deleted={name: frozenset(ords) for name, ords in self.deleted.items()},
+            k1=self.k1,
+            b=self.b,
+        )
+        self._locations = dict(snapshot.locations)
+        self.snapshot = snapshot
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def search(
+        self,
+        query: str,
+        *,
+        top_k: int = 10,
+        allowed: Optional[Iterable[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        return self.snapshot.search(query, top_k=top_k, allowed=allowed)
+
+    # -- writing -----------------------------------------------------------
+
+    def add(self, doc_id: str, text: str) -> None:
+        """Buffer a document; an existing document with the same id is replaced on commit."""
+
+        self.delete(doc_id)
+        self._memtable.docs.append((doc_id, Counter(tokenize(text))))
+
+    def delete(self, doc_id: str) -> None:
+        loc = self._locations.pop(doc_id, None)
+        if loc is not None:
+            self.deleted.setdefault(loc[0], set()).add(loc[1])
+        self._memtable.docs = [d for d in self._memtable.docs if d[0] != doc_id]
+
+    def delete_prefix(self, prefix: str) -> None:
+        """Delete every document whose id starts with `prefix` (e.g. all chunks of a file)."""
+
+        for doc_id in [d for d in self._locations if d.startswith(prefix)]:
+            self.delete(doc_id)
+        self._memtable.docs = [d for d in self._memtable.docs if not d[0].startswith(prefix)]
+
+    def commit(self) -> None:
+        """Flush buffered documents into a new segment, merge, and publish the manifest."""
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        if self._memtable.docs:
+            seg = Segment.build(self._new_segment_name(), self._memtable.docs)
+            seg.save(self.root)
+            self.segments.append(seg)
+            self._memtable = _Memtable()
+
+        obsolete = self._maybe_merge()
+        self.generation += 1
+        self._write_manifest()
+        for name in obsolete:
+            for suffix in (".json", ".post"):
+                (self.root / f"{name}{suffix}").unlink(missing_ok=True)
+        self._publish()
+
+    def _new_segment_name(self) -> str:
+        name = f"seg-{self._next_segment:06d}"
+        self._next_segment += 1
+        return name
+
+    def _tier(self, seg: Segment) -> int:
+        live = len(seg.doc_ids) - len(self.deleted.get(seg.name, ()))
+        return int(math.log(max(live, 1), self.merge_factor))
+
+    def _maybe_merge(self) -> List[str]:
+        obsolete: List[str] = []
+        while True:
+            tiers: Dict[int, List[Segment]] = {}
+            for seg in self.segments:
+                tiers.setdefault(self._tier(seg), []).append(seg)
+            group = next((g for _, g in sorted(tiers.items()) if len(g) >= self.merge_factor), None)
+            if group is None:
+                return obsolete
+            group = group[: self.merge_factor]
+            self._merge(group)
+            obsolete.extend(s.name for s in group)
+
+    def _merge(self, group: List[Segment]) -> None:
+        docs: List[Tuple[str, Counter]] = []
+        for seg in group:
+            dead = self.deleted.get(seg.name, set())
+            for ordinal, tfs in enumerate(seg.term_frequencies()):
+                if ordinal not in dead:
+                    docs.append((seg.doc_ids[ordinal], tfs))
+
+        merged = Segment.build(self._new_segment_name(), docs)
+        merged.save(self.root)
+
+        names = {s.name for s in group}
+        first = min(i for i, s in enumerate(self.segments) if s.name in names)
+        remaining = [s for s in self.segments if s.name not in names]
+        remaining.insert(first, merged)
+        self.segments = remaining
+        for name in names:
+            self.deleted.pop(name, None)
+
+    def _write_manifest(self) -> None:
+        manifest = {
+            "generation": self.generation,
+            "next_segment": self._next_segment,
+            "segments": [s.name for s in self.segments],
+            "deleted": {name: sorted(ords) for name, ords in self.deleted.items() if ords},
+        }
+        _write_json_atomic(self.root / self.MANIFEST, manifest)
+        self._manifest_mtime = (self.root / self.MANIFEST).stat().st_mtime_ns
@@ -1,40 +1,225 @@
+"""JSON logging for all services, written off the calling thread.
+
+Loggers from `get_logger` share one `LogPipeline`: records are put on a
+bounded queue and a background `QueueListener` thread formats and writes them
+to stdout, so a handler on the event loop never waits on `json.dumps` or a
+slow pipe. When the queue is full, records are dropped and counted rather than
+blocking the caller, and DEBUG records can be rate-limited per logger.
+
+Levels, field names and `extra_keys` come from `config/logging.yaml`:
+
+    queue:
+      max_size: 10000        # records waiting for the writer thread
+    sampling:
+      debug_per_second: 100  # per logger; 0 disables sampling
+      debug_burst: 200
+
+Drops are exported as `factory_log_records_dropped_total{reason}` with
+reason `overload` (queue full) or `sampled`.
+"""
+
 from __future__ import annotations
 
+import atexit
 import json
 import logging
+import queue
 import sys
-from typing import Any, Dict, Optional
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Mapping, MutableMapping, Optional, TextIO, Tuple
+
+from services.common.metrics import counter
+from services.common.tracing import current_trace_id
+
+
+LOG_RECORDS_DROPPED = counter(
+    "factory_log_records_dropped_total", "Log records dropped before being written, by reason.", ["reason"]
+)
 
 
 class JsonFormatter(logging.Formatter):
+    def __init__(
+        self,
+        *,
+        fields: Optional[Mapping[str, Any]] = None,
+        include_timestamp: bool = True,
+        include_trace_id: bool = True,
+        include_service_name: bool = True,
+    ) -> None:
+        super().__init__()
+        fields = fields or {}
+        self.timestamp_key = fields.get("timestamp_key", "ts") if include_timestamp else None
+        self.level_key = fields.get("level_key", "level")
+        self.message_key = fields.get("message_key", "msg")
+        self.service_key = fields.get("service_key", "service") if include_service_name else None
+        self.trace_id_key = fields.get("trace_id_key", "trace_id") if include_trace_id else None
+        self.extra_keys: Tuple[str, ...] = tuple(fields.get("extra_keys") or ())
+
     def format(self, record: logging.LogRecord) -> str:  # type: ignore[override]
-        payload: Dict[str, Any] = {
-            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
-            "level": record.levelname,
-            "msg": record.getMessage(),
-        }
-        if hasattr(record, "service"):
-            payload["service"] = getattr(record, "service")
-        if hasattr(record, "trace_id"):
-            payload["trace_id"] = getattr(record, "trace_id")
+        payload: Dict[str, Any] = {}
+        if self.timestamp_key:
+            payload[self.timestamp_key] = self.formatTime(record, "%Y-%m-%dT%H:%M:%S")
+        payload[self.level_key] = record.levelname
+        payload[self.message_key] = record.getMessage()
+        if self.service_key and hasattr(record, "service"):
+            payload[self.service_key] = getattr(record, "service")
+        if self.trace_id_key and hasattr(record, "trace_id"):
+            payload[self.trace_id_key] = getattr(record, "trace_id")
+        for key in self.extra_keys:
+            if hasattr(record, key):
+                payload[key] = getattr(record, key)
         if record.exc_info:
             payload["exc_info"] = self.formatException(record.exc_info)
-        return json.dumps(payload, separators=(",", ":"))
+        return json.dumps(payload, separators=(",", ":"), default=str)
 
 
-def get_logger(name: str, *, service: Optional[str] = None, level: int = logging.INFO) -> logging.Logger:
-    logger = logging.getLogger(name)
-    if logger.handlers:
-        return logger
+class TraceIdFilter(logging.Filter):
+    """Stamp records with the current trace id so log lines join up with spans."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not hasattr(record, "trace_id"):
+            trace_id = current_trace_id()
+            if trace_id is not None:
+                record.trace_id = trace_id
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """Token bucket per logger for DEBUG records; the rest pass untouched."""
+
+    def __init__(self, per_second: float, burst: Optional[float] = None) -> None:
+        super().__init__()
+        self.rate = float(per_second)
+        self.burst = float(burst if burst is not None else per_second)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(record.name, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            allowed = tokens >= 1
+            self._buckets[record.name] = (tokens - 1 if allowed else tokens, now)
+        if not allowed:
+            LOG_RECORDS_DROPPED.inc(reason="sampled")
+        return allowed
+
+
+class DroppingQueueHandler(QueueHandler):
+    """`QueueHandler` that never blocks and leaves formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message now, in case the arguments change after the call;
+        # timestamps, JSON and tracebacks are rendered by the listener.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc(reason="overload")
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self) -> None:
+        self.queue.put(self._sentinel)  # wait for room rather than lose the stop signal
+
+
+class LogPipeline:
+    """Bounded queue between loggers and an output stream, drained by one background thread."""
 
-    logger.setLevel(level)
-    handler = logging.StreamHandler(sys.stdout)
-    handler.setFormatter(JsonFormatter())
-    logger.addHandler(handler)
-    logger.propagate = False
+    def __init__(self, cfg: Optional[Mapping[str, Any]] = None, *, stream: Optional[TextIO] = None) -> None:
+        cfg = cfg or {}
+        self.cfg = cfg
+        self.queue: "queue.Queue[logging.LogRecord]" = queue.Queue(
+            maxsize=int((cfg.get("queue") or {}).get("max_size", 10000))
+        )
+
+        output = logging.StreamHandler(stream or sys.stdout)
+        output.setFormatter(build_formatter(cfg))
+        self.listener = _Listener(self.queue, output)
+
+        self.handler = DroppingQueueHandler(self.queue)
+        sampling = cfg.get("sampling") or {}
+        if sampling.get("debug_per_second"):
+            self.handler.addFilter(DebugSampler(sampling["debug_per_second"], sampling.get("debug_burst")))
+        self.handler.addFilter(TraceIdFilter())
+        self._running = False
+
+    def start(self) -> "LogPipeline":
+        if not self._running:
+            self.listener.start()
+            self._running = True
+        return self
+
+    def stop(self) -> None:
+        """Write out everything queued so far and stop the listener thread."""
+
+        if self._running:
+            self.listener.stop()
+            self._running = False
+
+    def level_for(self, service: Optional[str]) -> int:
+        overrides = (self.cfg.get("services") or {}).get(service or "", {}) or {}
+        return logging.getLevelName(str(overrides.get("level", self.cfg.get("level", "INFO"))).upper())
+
+
+def build_formatter(cfg: Mapping[str, Any]) -> logging.Formatter:
+    if cfg.get("format", "json") == "text":
+        return logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+    return JsonFormatter(
+        fields=cfg.get("fields"),
+        include_timestamp=cfg.get("include_timestamp", True),
+        include_trace_id=cfg.get("include_trace_id", True),
+        include_service_name=cfg.get("include_service_name", True),
+    )
+
+
+class _ServiceAdapter(logging.LoggerAdapter):
+    """Adds `service` while keeping the caller's own `extra` (the stock adapter replaces it)."""
+
+    def process(self, msg: Any, kwargs: MutableMapping[str, Any]) -> Tuple[Any, MutableMapping[str, Any]]:
+        kwargs["extra"] = {**self.extra, **(kwargs.get("extra") or {})}
+        return msg, kwargs
+
+
+_pipeline: Optional[LogPipeline] = None
+_pipeline_lock = threading.Lock()
+
+
+def get_pipeline() -> LogPipeline:
+    """The process-wide pipeline, configured from `config/logging.yaml` and started on first use."""
+
+    global _pipeline
+    if _pipeline is None:
+        with _pipeline_lock:
+            if _pipeline is None:
+                from services.common.config import load_config
+
+                _pipeline = LogPipeline(load_config("logging")).start()
+                atexit.register(_pipeline.stop)
+    return _pipeline
+
+
+def get_logger(name: str, *, service: Optional[str] = None, level: Optional[int] = None) -> logging.Logger:
+    """Logger writing through the shared pipeline; `level` defaults to the service's configured level."""
+
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        pipeline = get_pipeline()
+        logger.setLevel(level if level is not None else pipeline.level_for(service))
+        logger.addHandler(pipeline.handler)
+        logger.propagate = False
 
     if service is not None:
-        logger = logging.LoggerAdapter(logger, {"service": service})  # type: ignore[assignment]
+        logger = _ServiceAdapter(logger, {"service": service})  # type: ignore[assignment]
 
     return logger
-  
+
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+
+# An array container costs 32 bits per row and a bitmap container one bit per
+# row of the universe, so arrays win below 1/32 density.
+_ARRAY_DENSITY_LIMIT = 32
+
+
+class RowBitmap:
+    """Compressed set of row numbers.
+
+    Sparse sets are held as a sorted int32 array and dense ones as a packed
+    bitmap, whichever is smaller (the same trade-off roaring bitmaps make per
+    container). Set operations run in numpy and return the compact form.
+    """
+
+    __slots__ = ("rows", "bits", "universe")
+
+    def __init__(self, *, rows: Optional[np.ndarray] = None, bits: Optional[np.ndarray] = None, universe: int) -> None:
+        self.rows = rows
+        self.bits = bits
+        self.universe = universe
+
+    @classmethod
+    def from_rows(cls, rows: np.ndarray, universe: int) -> "RowBitmap":
+        if len(rows) * _ARRAY_DENSITY_LIMIT < universe:
+            return cls(rows=rows.astype(np.int32, copy=False), universe=universe)
+        mask = np.zeros(universe, dtype=bool)
+        mask[rows] = True
+        return cls(bits=np.packbits(mask, bitorder="little"), universe=universe)
+
+    @classmethod
+    def from_mask(cls, mask: np.ndarray) -> "RowBitmap":
+        return cls.from_rows(np.flatnonzero(mask), len(mask))
+
+    def to_rows(self) -> np.ndarray:
+        if self.rows is not None:
+            return self.rows
+        return np.flatnonzero(self.to_mask())
+
+    def to_mask(self) -> np.ndarray:
+        if self.bits is not None:
+            return np.unpackbits(self.bits, count=self.universe, bitorder="little").astype(bool)
+        mask = np.zeros(self.universe, dtype=bool)
+        mask[self.rows] = True
+        return mask
+
+    def __len__(self) -> int:
+        if self.rows is not None:
+            return len(self.rows)
+        return int(np.unpackbits(self.bits, count=self.universe, bitorder="little").sum())
+
+    @property
+    def nbytes(self) -> int:
+        return int((self.rows if self.rows is not None else self.bits).nbytes)
+
+    def __and__(self, other: "RowBitmap") -> "RowBitmap":
+        universe = min(self.universe, other.universe)
+        if self.rows is not None and other.rows is not None:
+            return RowBitmap(rows=np.intersect1d(self.rows, other.rows, assume_unique=True), universe=universe)
+        if self.rows is not None or other.rows is not None:
+            sparse, dense = (self, other) if self.rows is not None else (other, self)
+            rows = sparse.rows[sparse.rows < universe]
+            return RowBitmap(rows=rows[dense.to_mask()[rows]], universe=universe)
+        return RowBitmap.from_mask(self.to_mask()[:universe] & other.to_mask()[:universe])
+
+    def __or__(self, other: "RowBitmap") -> "RowBitmap":
+        universe = max(self.universe, other.universe)
+        if self.rows is not None and other.rows is not None:
+            return RowBitmap.from_rows(np.union1d(self.rows, other.rows), universe)
+        mask = np.zeros(universe, dtype=bool)
+        for bm in (self, other):
+            mask[bm.to_rows()] = True
+        return RowBitmap.from_mask(mask)
+
+
+@dataclass
+class MetadataFilter:
+    """Pre-retrieval filter. Values within a field are OR-ed; fields are AND-ed.
+
+    Empty lists and `None` mean "no constraint on this field".
+    """
+
+    tags: List[str] = field(default_factory=list)
+    mime_types: List[str] = field(default_factory=list)
+    sources: List[str] = field(default_factory=list)
+    doc_ids: List[str] = field(default_factory=list)
+    since: Optional[date] = None
+
+    def is_empty(self) -> bool:
+        return not (self.tags or self.mime_types or self.sources or self.doc_ids or self.since)
+
+
+# Filter field -> metadata field used as the bitmap key.
+_FIELDS: Tuple[Tuple[str, str], ...] = (
+    ("tags", "tag"),
+    ("mime_types", "mime_type"),
+    ("sources", "source"),
+    ("doc_ids", "doc"),
+)
+
+
+class MetadataIndex:
+    """Bitmaps over vector-index rows, keyed by tag, mime type, source,
+    document and ingestion day.
+
+    Rows are appended in increasing order, so each posting list is a sorted
+    `array('i')`; compressed `RowBitmap`s are built lazily per key and cached
+    until the next append.
+    """
+
+    def __init__(self) -> None:
+        self._postings: Dict[Tuple[str, str], array] = {}
+        self._compiled: Dict[Tuple[str, str], RowBitmap] = {}
+        self._universe = 0
+
+    def add(self, row: int, document_id: str, metadata: Mapping[str, Any]) -> None:
+        keys = [("doc", document_id)]
+        for tag in metadata.get("tags") or ():
+            keys.append(("tag", str(tag)))
+        for name in ("mime_type", "source"):
+            if metadata.get(name):
+                keys.append((name, str(metadata[name])))
+        if metadata.get("ingested_at"):
+            keys.append(("day", str(metadata["ingested_at"])[:10]))
+
+        for key in keys:
+            self._postings.setdefault(key, array("i")).append(row)
+            self._compiled.pop(key, None)
+        self._universe = max(self._universe, row + 1)
+
+    def copy(self) -> "MetadataIndex":
+        """Independent copy to append to; bitmaps are recompiled lazily."""
+
+        other = MetadataIndex()
+        other._postings = {key: array("i", rows) for key, rows in self._postings.items()}
+        other._universe = self._universe
+        return other
+
+    def extend(self, start_row: int, items: Iterable[Tuple[str, Mapping[str, Any]]]) -> None:
+        for offset, (document_id, metadata) in enumerate(items):
+            self.add(start_row + offset, document_id, metadata)
+
+    def bitmap(self, name: str, value: str) -> RowBitmap:
+        key = (name, value)
+        bm = self._compiled.get(key)
+        if bm is None or bm.universe != self._universe:
+            rows = np.frombuffer(self._postings.get(key, array("i")), dtype=np.int32)
+            bm = RowBitmap.from_rows(rows, self._universe)
+            self._compiled[key] = bm
+        return bm
+
+    def values(self, name: str) -> List[str]:
+        return sorted(v for n, v in self._postings if n == name)
+
+    def evaluate(self, flt: MetadataFilter) -> Optional[RowBitmap]:
+        """Return the rows matching `flt`, or None when the filter is empty."""
+
+        if flt.is_empty():
+            return None
+
+        result: Optional[RowBitmap] = None
+        clauses: List[List[RowBitmap]] = []
+        for attr, name in _FIELDS:
+            wanted = getattr(flt, attr)
+            if wanted:
+                clauses.append([self.bitmap(name, v) for v in wanted])
+        if flt.since is not None:
+            cutoff = flt.since.isoformat()
+            clauses.append([self.bitmap("day", d) for d in self.values("day") if d >= cutoff])
+
+        # Intersect the most selective clause first so later ANDs stay sparse.
+        unions = []
+        for bitmaps in clauses:
+            union = RowBitmap(rows=np.zeros(0, dtype=np.int32), universe=self._universe)
+            for bm in bitmaps:
+                union = union | bm
+            unions.append(union)
+        for union in sorted(unions, key=len):
+            result = union if result is None else result & union
+            if not len(result):
+                break
+        return result
+
+
+def parse_since(value: Any) -> Optional[date]:
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.fromisoformat(str(value)).date()
@@ -0,0 +1,419 @@
+"""In-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are registered once per process in
+`REGISTRY` and rendered by each service's `GET /metrics`. Updates take a
+per-series lock and a bisect, so instrumentation can stay on in production
+(see `tests/benchmarks/bench_metrics.py`).
+
+Pipeline stages are timed with `stage(name)`: every duration lands in the
+`factory_stage_seconds` histogram and, inside `collect_stages()`, in a
+per-request dict that services attach to their responses and events. When
+tracing is on, each stage is also recorded as a child span of the request.
+"""
+
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple, Type, TypeVar
+
+from services.common import tracing
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans sub-millisecond index lookups up to slow local generations.
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self) -> None:
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+
+class HistogramSeries:
+    """One histogram series.
+
+    Mergeable and serialisable, so it also backs the hourly evidence rollups
+    (`services/common/rollups.py`).
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count", "_lock")
+
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = tuple(buckets)
+        # counts[i] holds observations in (buckets[i-1], buckets[i]]; the
+        # last slot is the +Inf overflow. Cumulated only when rendering.
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def merge(self, other: "HistogramSeries") -> None:
+        if other.buckets != self.buckets:
+            raise ValueError("cannot merge histograms with different buckets")
+        with self._lock:
+            for i, n in enumerate(other.counts):
+                self.counts[i] += n
+            self.sum += other.sum
+            self.count += other.count
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"buckets": list(self.buckets), "counts": list(self.counts), "sum": self.sum, "count": self.count}
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "HistogramSeries":
+        series = cls(data["buckets"])
+        series.counts = list(data["counts"])
+        series.sum = float(data["sum"])
+        series.count = int(data["count"])
+        return series
+
+    def quantile(self, q: float) -> float:
+        """Estimate the `q` quantile by linear interpolation within its bucket."""
+
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else lower
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def labels(self, **labels: Any) -> Any:
+        """Return the series for these label values, creating it on first use."""
+
+        key = tuple([str(labels[n]) for n in self.labelnames])
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _series(self) -> List[Tuple[LabelValues, Any]]:
+        return list(self._children.items())
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._series(), key=lambda kv: kv[0]):
+            lines.extend(self._render_series(_labels(self.labelnames, key), child))
+        return lines
+
+    def _render_series(self, labels: str, child: Any) -> List[str]:
+        return [f"{self.name}{labels} {_num(child.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        self.labels(**labels).inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()) -> None:
+        super().__init__(name, help, labelnames)
+        self._function: Optional[Callable[[], Any]] = None
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+    def set(self, value: float, **labels: Any) -> None:
+        self.labels(**labels).set(value)
+
+    def set_function(self, fn: Callable[[], Any]) -> None:
+        """Read the value(s) from `fn` at render time.
+
+        `fn` returns a number, or a mapping of label-value tuples to numbers
+        for a labelled gauge.
+        """
+
+        self._function = fn
+
+    def _series(self) -> List[Tuple[LabelValues, Any]]:
+        if self._function is None:
+            return super()._series()
+        value = self._function()
+        if not isinstance(value, Mapping):
+            value = {(): value}
+        series = []
+        for key, v in value.items():
+            child = _GaugeChild()
+            child.set(v)
+            series.append((tuple(str(k) for k in key), child))
+        return series
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> HistogramSeries:
+        return HistogramSeries(self.buckets)
+
+    def observe(self, value: float, **labels: Any) -> None:
+        self.labels(**labels).observe(value)
+
+    def time(self, **labels: Any):
+        return self.labels(**labels).time()
+
+    def _render_series(self, labels: str, child: HistogramSeries) -> List[str]:
+        base = labels[1:-1] + "," if labels else ""
+        lines = []
+        cumulative = 0
+        for upper, n in zip(self.buckets + (math.inf,), child.counts):
+            cumulative += n
+            le = "+Inf" if upper == math.inf else _num(upper)
+            lines.append(f'{self.name}_bucket{{{base}le="{le}"}} {cumulative}')
+        lines.append(f"{self.name}_sum{labels} {_num(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+M = TypeVar("M", bound=_Metric)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def get_or_create(self, cls: Type[M], name: str, help: str, labelnames: Sequence[str] = (), **kwargs: Any) -> M:
+        """Return the metric called `name`, registering it on first use.
+
+        Modules can therefore declare their metrics at import time without
+        clashing when imported more than once (e.g. in tests).
+        """
+
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = cls(name, help, labelnames, **kwargs)
+                self._metrics[name] = metric
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name!r} already registered with a different type or labels")
+            return metric  # type: ignore[return-value]
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.get_or_create(Counter, name, help, labelnames)
+
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+    return REGISTRY.get_or_create(Gauge, name, help, labelnames)
+
+
+def histogram(
+    name: str,
+    help: str,
+    labelnames: Sequence[str] = (),
+    buckets: Sequence[float] = DEFAULT_BUCKETS,
+) -> Histogram:
+    return REGISTRY.get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+def _labels(names: Sequence[str], values: LabelValues) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+# -- pipeline stages -----------------------------------------------------------
+
+STAGE_SECONDS = histogram("factory_stage_seconds", "Duration of pipeline stages.", ["stage"])
+
+_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("factory_stages", default=None)
+
+
+def record_stage(name: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage=name).observe(seconds)
+    stages = _stages.get()
+    if stages is not None:
+        stages[name] = stages.get(name, 0.0) + seconds
+
+
+class stage:
+    """Context manager timing a pipeline stage.
+
+    Repeated or concurrent runs of a stage within one request are summed, so
+    stages that overlap (e.g. lexical and vector search) can add up to more
+    than the request's wall time. A plain class rather than a generator-based
+    context manager, as it wraps every hot-path call.
+    """
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc: Any) -> None:
+        seconds = time.perf_counter() - self.start
+        record_stage(self.name, seconds)
+        if tracing.current_span() is not None:
+            tracing.add_span(self.name, start=time.time() - seconds, duration=seconds)
+
+
+@contextmanager
+def collect_stages() -> Iterator[Dict[str, float]]:
+    """Collect `stage` timings (seconds) from this context and threads started in it."""
+
+    stages: Dict[str, float] = {}
+    token = _stages.set(stages)
+    try:
+        yield stages
+    finally:
+        _stages.reset(token)
+
+
+def stages_ms(stages: Mapping[str, float]) -> Dict[str, float]:
+    return {name: round(seconds * 1000, 2) for name, seconds in stages.items()}
+
+
+# -- HTTP ----------------------------------------------------------------------
+
+HTTP_REQUESTS = counter("factory_http_requests_total", "HTTP requests served.", ["method", "route", "status"])
+HTTP_SECONDS = histogram("factory_http_request_seconds", "HTTP request duration, including streamed bodies.", ["route"])
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests and timing them per route template."""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            HTTP_REQUESTS.labels(method=scope["method"], route=route, status=status).inc()
+            HTTP_SECONDS.labels(route=route).observe(time.perf_counter() - start)
+
+
+def instrument_app(app: Any) -> None:
+    """Add request metrics and a `GET /metrics` endpoint to a FastAPI app."""
+
+    from starlette.responses import Response
+
+    async def metrics_endpoint() -> Response:
+        return Response(render(), media_type=CONTENT_TYPE)
+
+    app.add_middleware(MetricsMiddleware)
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
@@ -0,0 +1,271 @@
+"""Hourly rollups of the evidence log.
+
+Each hour of evidence is folded into one small JSON file under the rollup
+directory: event counts, ingestion and index totals, answer latency as a
+mergeable histogram, cited documents, and evaluation results with failure
+reasons. `RollupStore.catch_up` reads only the log bytes appended since its
+last call, so the evidence logger can run it after every batch and a brief
+for any period merges rollups instead of rescanning the logs.
+
+Each rollup also records how far into every log file it has absorbed, so a
+crash between writing rollups and the checkpoint never double-counts. The
+evidence logger and the brief generator may catch up at the same time, so
+`catch_up` holds an exclusive lock on `<root>/catch_up.lock` throughout.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from services.common.metrics import DEFAULT_BUCKETS, HistogramSeries
+
+
+# Distinct documents kept per hour; the rest are dropped as the least cited.
+MAX_DOCUMENTS = 500
+# Distinct failure reasons kept per hour; later new reasons count as OTHER_REASON.
+MAX_FAILURE_REASONS = 100
+OTHER_REASON = "other"
+
+
+def hour_of(ts: datetime) -> datetime:
+    """Start of the (naive UTC) hour containing `ts`, the evidence logger's clock."""
+
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+@dataclass
+class Rollup:
+    """Evidence totals for one hour, or the merge of several."""
+
+    hour: Optional[datetime] = None
+    events: Counter = field(default_factory=Counter)
+    ingested_bytes: int = 0
+    indexed_documents: int = 0
+    indexed_chunks: int = 0
+    index_errors: int = 0
+    answers: int = 0
+    abstained: int = 0
+    cached: int = 0
+    answer_latency: HistogramSeries = field(default_factory=lambda: HistogramSeries(DEFAULT_BUCKETS))
+    cited_documents: Counter = field(default_factory=Counter)
+    eval_cases: int = 0
+    eval_passed: int = 0
+    failure_reasons: Counter = field(default_factory=Counter)
+    offsets: Dict[str, int] = field(default_factory=dict)  # resolved log path -> bytes absorbed
+
+    def add(self, event: Dict[str, Any]) -> None:
+        kind = event.get("event_type", "unknown")
+        payload = event.get("payload") or {}
+        self.events[kind] += 1
+        if kind == "ingestion":
+            self.ingested_bytes += int(payload.get("size_bytes") or 0)
+        elif kind == "index":
+            if payload.get("status") == "error":
+                self.index_errors += 1
+                self._fail(f"index: {payload.get('error_message') or 'unknown error'}")
+            else:
+                self.indexed_documents += 1
+                self.indexed_chunks += int(payload.get("num_chunks") or 0)
+        elif kind == "answer":
+            self.answers += 1
+            self.abstained += bool(payload.get("abstained"))
+            self.cached += bool(payload.get("cached"))
+            if payload.get("latency_ms") is not None:
+                self.answer_latency.observe(payload["latency_ms"] / 1000)
+            for doc_id in {c.get("doc_id") for c in payload.get("citations") or [] if c.get("doc_id")}:
+                self.cited_documents[doc_id] += 1
+        elif kind == "evaluation":
+            self.eval_cases += 1
+            self.eval_passed += bool(payload.get("passed"))
+            for reason in payload.get("failure_reasons") or []:
+                self._fail(f"eval: {reason}")
+
+    def _fail(self, reason: str) -> None:
+        if reason not in self.failure_reasons and len(self.failure_reasons) >= MAX_FAILURE_REASONS:
+            reason = OTHER_REASON
+        self.failure_reasons[reason] += 1
+
+    def merge(self, other: "Rollup") -> None:
+        self.events.update(other.events)
+        self.ingested_bytes += other.ingested_bytes
+        self.indexed_documents += other.indexed_documents
+        self.indexed_chunks += other.indexed_chunks
+        self.index_errors += other.index_errors
+        self.answers += other.answers
+        self.abstained += other.abstained
+        self.cached += other.cached
+        self.answer_latency.merge(other.answer_latency)
+        self.cited_documents.update(other.cited_documents)
+        self.eval_cases += other.eval_cases
+        self.eval_passed += other.eval_passed
+        self.failure_reasons.update(other.failure_reasons)
+
+    def latency_ms(self, q: float) -> Optional[float]:
+        if not self.answer_latency.count:
+            return None
+        return round(self.answer_latency.quantile(q) * 1000, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "hour": self.hour.isoformat() if self.hour else None,
+            "events": dict(self.events),
+            "ingested_bytes": self.ingested_bytes,
+            "indexed_documents": self.indexed_documents,
+            "indexed_chunks": self.indexed_chunks,
+            "index_errors": self.index_errors,
+            "answers": self.answers,
+            "abstained": self.abstained,
+            "cached": self.cached,
+            "answer_latency": self.answer_latency.to_dict(),
+            "cited_documents": dict(self.cited_documents.most_common(MAX_DOCUMENTS)),
+            "eval_cases": self.eval_cases,
+            "eval_passed": self.eval_passed,
+            "failure_reasons": dict(self.failure_reasons),
+            "offsets": self.offsets,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Rollup":
+        return cls(
+            hour=datetime.fromisoformat(data["hour"]) if data.get("hour") else None,
+            events=Counter(data.get("events", {})),
+            ingested_bytes=data.get("ingested_bytes", 0),
+            indexed_documents=data.get("indexed_documents", 0),
+            indexed_chunks=data.get("indexed_chunks", 0),
+            index_errors=data.get("index_errors", 0),
+            answers=data.get("answers", 0),
+            abstained=data.get("abstained", 0),
+            cached=data.get("cached", 0),
+            answer_latency=HistogramSeries.from_dict(data["answer_latency"]),
+            cited_documents=Counter(data.get("cited_documents", {})),
+            eval_cases=data.get("eval_cases", 0),
+            eval_passed=data.get("eval_passed", 0),
+            failure_reasons=Counter(data.get("failure_reasons", {})),
+            offsets=dict(data.get("offsets", {})),
+        )
+
+
+def _complete_lines(path: Path, offset: int) -> Iterator[Tuple[int, bytes]]:
+    """Yield `(end_offset, line)` for each newline-terminated line after `offset`."""
+
+    with path.open("rb") as f:
+        f.seek(offset)
+        pos = offset
+        for line in f:
+            if not line.endswith(b"\n"):
+                return  # still being written
+            pos += len(line)
+            yield pos, line
+
+
+class RollupStore:
+    """Hourly rollup files plus a checkpoint of how far each log has been read."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self.hourly_dir = self.root / "hourly"
+        self.hourly_dir.mkdir(parents=True, exist_ok=True)
+        self._checkpoint_path = self.root / "checkpoint.json"
+        self._lock_path = self.root / "catch_up.lock"
+
+    def _path(self, hour: datetime) -> Path:
+        return self.hourly_dir / f"{hour:%Y-%m-%dT%H}.json"
+
+    def load(self, hour: datetime) -> Optional[Rollup]:
+        path = self._path(hour)
+        if not path.exists():
+            return None
+        return Rollup.from_dict(json.loads(path.read_text(encoding="utf-8")))
+
+    def _write(self, rollup: Rollup) -> None:
+        assert rollup.hour is not None
+        _write_json(self._path(rollup.hour), rollup.to_dict())
+
+    def _checkpoint(self) -> Dict[str, int]:
+        if not self._checkpoint_path.exists():
+            return {}
+        return json.loads(self._checkpoint_path.read_text(encoding="utf-8"))
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock_path.open("a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def catch_up(self, log_dir: Path, files: Optional[Iterable[Path]] = None) -> int:
+        """Fold log lines appended since the last call into the hourly rollups; return how many.
+
+        `files` limits the scan (the evidence logger passes the file it just
+        appended to); by default every `evidence-*.jsonl` in `log_dir` is checked.
+        Blocks while another caller, in this or another process, is catching up.
+        """
+
+        with self._locked():
+            return self._catch_up(log_dir, files)
+
+    def _catch_up(self, log_dir: Path, files: Optional[Iterable[Path]]) -> int:
+        checkpoint = self._checkpoint()
+        touched: Dict[datetime, Rollup] = {}
+        folded = 0
+        advanced = False
+        paths = sorted(files) if files is not None else sorted(Path(log_dir).glob("evidence-*.jsonl"))
+        for path in paths:
+            key = str(path.resolve())  # not the name: every log directory has the same day files
+            start = checkpoint.get(key, 0)
+            if path.stat().st_size <= start:
+                continue
+            end = start
+            for end, line in _complete_lines(path, start):
+                try:
+                    record = json.loads(line)
+                    hour = hour_of(datetime.fromisoformat(record["timestamp"]))
+                except (ValueError, KeyError):
+                    continue
+                rollup = touched.get(hour)
+                if rollup is None:
+                    rollup = touched[hour] = self.load(hour) or Rollup(hour=hour)
+                if end <= rollup.offsets.get(key, 0):
+                    continue  # already absorbed before a crash lost the checkpoint
+                rollup.add(record.get("event") or {})
+                rollup.offsets[key] = end
+                folded += 1
+            advanced = advanced or end > start
+            checkpoint[key] = end
+
+        if not advanced:
+            return 0
+        for rollup in touched.values():
+            self._write(rollup)
+        _write_json(self._checkpoint_path, checkpoint)
+        return folded
+
+    def period(self, start: datetime, end: datetime) -> Rollup:
+        """Merge the rollups of every hour overlapping `[start, end)`."""
+
+        total = Rollup()
+        hour = hour_of(start)
+        while hour < end:
+            rollup = self.load(hour)
+            if rollup is not None:
+                total.merge(rollup)
+            hour += timedelta(hours=1)
+        return total
+
+
+def _write_json(path: Path, data: Any) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(data, separators=(",", ":")), encoding="utf-8")
+    os.replace(tmp, path)
@@ -19,10 +19,21 @@ class FactorySettings(BaseSettings):
     db_name: str = "factory"
     db_user: str = "factory"
     db_password: str = "factory"
+    db_url: str = ""  # full SQLAlchemy URL, overrides the db_* parts (e.g. sqlite:///data/factory.db on CI)
 
     ollama_host: str = "host.docker.internal"
     ollama_port: int = 11434
 
+    config_dir: str = "config"
+    index_dir: str = "data/index"
+    embedding_backend: str = "ollama"  # ollama | hashing
+    generation_backend: str = "stub"  # stub | ollama
+    trace_file: str = ""  # JSONL span output; tracing is off when empty
+
+    @property
+    def ollama_url(self) -> str:
+        return f"http://{self.ollama_host}:{self.ollama_port}"
+
     class Config:
         env_prefix = "FACTORY_"
 
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+
+
+# Words, numbers and individual punctuation marks; long words are charged
+# one token per four characters, which tracks BPE vocabularies such as
+# llama's closely enough for budgeting.
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def _count(text: str) -> int:
+    total = 0
+    for piece in _PIECE_RE.findall(text):
+        total += (len(piece) + 3) // 4 if len(piece) > 4 else 1
+    return total
+
+
+@lru_cache(maxsize=4096)
+def _count_cached(text: str) -> int:
+    return _count(text)
+
+
+def count_tokens(text: str) -> int:
+    """Approximate model token count for `text`.
+
+    Short strings (prompt templates, questions) are memoised; chunk texts
+    should be counted once at index time and stored with the chunk.
+    """
+
+    if len(text) <= 2048:
+        return _count_cached(text)
+    return _count(text)
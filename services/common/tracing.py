@@ -0,0 +1,305 @@
+"""Lightweight cross-service tracing.
+
+A trace starts at the edge (the first service to receive a request without
+a `traceparent` header) and follows W3C `traceparent` headers through the
+RAG API, the Evidence Logger and the model clients. The active span lives in
+a context variable, so it also follows `asyncio.to_thread` work.
+
+Finished spans are appended as JSON lines to `FACTORY_TRACE_FILE` when set;
+nothing is recorded otherwise. Like log records, spans go through a bounded
+queue to a background writer thread (see `services.common.logging`), so
+closing a span never touches the file; `flush()` waits for the writer. To
+break a trace down from those files:
+
+    python -m services.common.tracing data/traces/*.jsonl --trace-id <id>
+"""
+
+from __future__ import annotations
+
+import argparse
+import atexit
+import json
+import logging
+import queue
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+TRACEPARENT = "traceparent"
+
+_TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+@dataclass
+class Span:
+    trace_id: str
+    span_id: str
+    name: str
+    parent_id: Optional[str] = None
+    service: Optional[str] = None
+    start: float = field(default_factory=time.time)  # epoch seconds, comparable across services
+    duration_ms: Optional[float] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("factory_span", default=None)
+
+_UNSET = object()
+_trace_path: Any = _UNSET
+_exporter: Optional["_SpanExporter"] = None
+_exporter_lock = threading.Lock()
+
+SPAN_QUEUE_SIZE = 10000
+
+
+class _SpanFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:  # type: ignore[override]
+        return json.dumps(asdict(getattr(record, "span")), separators=(",", ":"), default=str)
+
+
+class _SpanExporter:
+    """Bounded span queue drained into the trace file by one background thread."""
+
+    def __init__(self, path: Path) -> None:
+        from services.common.logging import DroppingQueueHandler, _Listener
+
+        self.queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=SPAN_QUEUE_SIZE)
+        self.output = logging.FileHandler(path, encoding="utf-8", delay=True)
+        self.output.setFormatter(_SpanFormatter())
+        self.handler = DroppingQueueHandler(self.queue)
+        self.listener = _Listener(self.queue, self.output)
+        self.listener.start()
+
+    def export(self, s: Span) -> None:
+        self.handler.handle(logging.makeLogRecord({"name": "factory.spans", "span": s}))
+
+    def flush(self) -> None:
+        self.listener.stop()
+        self.output.flush()
+        self.listener.start()
+
+    def stop(self) -> None:
+        self.listener.stop()
+        self.output.close()
+
+
+def configure(path: Optional[str]) -> None:
+    """Write finished spans to `path` (JSON lines), or stop recording with None."""
+
+    global _trace_path, _exporter
+    with _exporter_lock:
+        if _exporter is not None:
+            _exporter.stop()
+            _exporter = None
+        _trace_path = Path(path) if path else None
+        if _trace_path is not None:
+            _trace_path.parent.mkdir(parents=True, exist_ok=True)
+            _exporter = _SpanExporter(_trace_path)
+
+
+def flush() -> None:
+    """Block until every span exported so far is in the trace file."""
+
+    with _exporter_lock:
+        if _exporter is not None:
+            _exporter.flush()
+
+
+atexit.register(configure, None)
+
+
+def recording() -> bool:
+    if _trace_path is _UNSET:
+        from services.common.settings import get_settings
+
+        configure(get_settings().trace_file or None)
+    return _trace_path is not None
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str]]:
+    """Return `(trace_id, parent_span_id)` from a `traceparent` header, if valid."""
+
+    if not value:
+        return None
+    m = _TRACEPARENT_RE.match(value.strip().lower())
+    if m is None or m.group(1) == "0" * 32:
+        return None
+    return m.group(1), m.group(2)
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current.get()
+    return span.trace_id if span else None
+
+
+def trace_headers() -> Dict[str, str]:
+    """Headers that continue the current trace on an outgoing HTTP request."""
+
+    span = _current.get()
+    return {TRACEPARENT: span.traceparent} if span else {}
+
+
+def _new_span(name: str, *, traceparent: Optional[str], service: Optional[str], attrs: Dict[str, Any]) -> Span:
+    parent = _current.get()
+    remote = parse_traceparent(traceparent)
+    if remote is not None:
+        trace_id, parent_id = remote
+    elif parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+    if service is None and parent is not None:
+        service = parent.service
+    return Span(trace_id, secrets.token_hex(8), name, parent_id, service, attrs=attrs)
+
+
+@contextmanager
+def span(name: str, *, traceparent: Optional[str] = None, service: Optional[str] = None, **attrs: Any) -> Iterator[Span]:
+    """Open a span as a child of `traceparent`, else of the current span, else as a new trace."""
+
+    s = _new_span(name, traceparent=traceparent, service=service, attrs=attrs)
+    token = _current.set(s)
+    started = time.perf_counter()
+    try:
+        yield s
+    except BaseException as exc:
+        s.attrs["error"] = type(exc).__name__
+        raise
+    finally:
+        s.duration_ms = round((time.perf_counter() - started) * 1000, 3)
+        _current.reset(token)
+        _export(s)
+
+
+def add_span(name: str, *, start: float, duration: float) -> None:
+    """Record an already finished child of the current span (used by `metrics.stage`)."""
+
+    parent = _current.get()
+    if parent is None or not recording():
+        return
+    _export(
+        Span(
+            parent.trace_id,
+            secrets.token_hex(8),
+            name,
+            parent.span_id,
+            parent.service,
+            start=start,
+            duration_ms=round(duration * 1000, 3),
+        )
+    )
+
+
+def _export(s: Span) -> None:
+    if not recording():
+        return
+    exporter = _exporter
+    if exporter is not None:
+        exporter.export(s)
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per request.
+
+    Continues an incoming `traceparent` or starts a new trace, and returns
+    the span's `traceparent` on the response so callers can find it.
+    """
+
+    def __init__(self, app: Any, *, service: str) -> None:
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = None
+        for key, value in scope.get("headers", ()):
+            if key == b"traceparent":
+                incoming = value.decode("latin-1")
+                break
+
+        with span(f"{scope['method']} {scope['path']}", traceparent=incoming, service=self.service) as s:
+
+            async def send_wrapper(message: Dict[str, Any]) -> None:
+                if message["type"] == "http.response.start":
+                    s.attrs["status"] = message["status"]
+                    headers = list(message.get("headers", []))
+                    headers.append((b"traceparent", s.traceparent.encode("latin-1")))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    s.name = f"{scope['method']} {route.path}"
+
+
+def load_spans(paths: List[Path]) -> List[Dict[str, Any]]:
+    spans = []
+    for path in paths:
+        with path.open("r", encoding="utf-8") as f:
+            spans.extend(json.loads(line) for line in f if line.strip())
+    return spans
+
+
+def format_trace(spans: List[Dict[str, Any]]) -> str:
+    """Indented span tree with start offsets and durations in milliseconds."""
+
+    if not spans:
+        return ""
+    t0 = min(s["start"] for s in spans)
+    ids = {s["span_id"] for s in spans}
+    children: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    for s in spans:
+        parent = s["parent_id"] if s["parent_id"] in ids else None
+        children.setdefault(parent, []).append(s)
+
+    lines: List[str] = []
+
+    def walk(parent: Optional[str], depth: int) -> None:
+        for s in sorted(children.get(parent, []), key=lambda s: s["start"]):
+            offset = (s["start"] - t0) * 1000
+            lines.append(
+                f"{offset:9.1f}ms {s['duration_ms']:9.1f}ms  {'  ' * depth}{s['name']} [{s.get('service') or '-'}]"
+            )
+            walk(s["span_id"], depth + 1)
+
+    walk(None, 0)
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Print a trace from span files as an indented timeline.")
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--trace-id", help="Trace to show (default: the trace with the slowest span)")
+    args = parser.parse_args()
+
+    spans = load_spans(args.files)
+    if not spans:
+        raise SystemExit("no spans found")
+    trace_id = args.trace_id or max(spans, key=lambda s: s["duration_ms"] or 0)["trace_id"]
+    print(f"trace {trace_id}")
+    print(format_trace([s for s in spans if s["trace_id"] == trace_id]))
+
+
+if __name__ == "__main__":
+    main()
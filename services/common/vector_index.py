@@ -0,0 +1,462 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, FrozenSet, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+import numpy as np
+
+from services.common.metadata_index import MetadataFilter, MetadataIndex, RowBitmap
+
+
+@dataclass
+class ChunkRecord:
+    """A stored chunk: the unit of retrieval and citation."""
+
+    chunk_id: str
+    document_id: str
+    index: int
+    text: str
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    # Counted once at index time so query-time context packing never tokenizes.
+    token_count: int = 0
+    # Prefix repeated from the previous chunk of the same document.
+    overlap_chars: int = 0
+    overlap_tokens: int = 0
+
+
+def chunk_id_for(document_id: str, index: int) -> str:
+    return f"{document_id}#{index}"
+
+
+@dataclass(frozen=True)
+class VectorSnapshot:
+    """One consistent, read-only view of a `VectorIndex`.
+
+    Snapshots are never modified: reloads and commits build a new one and
+    publish it with a single reference assignment, so a search that started
+    on the old view finishes on it even while the index moves on.
+    """
+
+    records: List[ChunkRecord]
+    matrix: np.ndarray
+    deleted: FrozenSet[int]
+    documents: Dict[str, Dict[str, Any]]
+    metadata: MetadataIndex
+    dim: Optional[int] = None
+    generation: int = 0
+    epoch: Optional[str] = None
+    live_mask: np.ndarray = field(init=False, repr=False)
+    rows: Dict[str, int] = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        mask = np.ones(len(self.records), dtype=bool)
+        if self.deleted:
+            mask[np.fromiter(self.deleted, dtype=np.int64)] = False
+        object.__setattr__(self, "live_mask", mask)
+        object.__setattr__(self, "rows", {rec.chunk_id: row for row, rec in enumerate(self.records) if mask[row]})
+
+    @classmethod
+    def empty(cls) -> "VectorSnapshot":
+        return cls(records=[], matrix=np.zeros((0, 0), dtype=np.float32), deleted=frozenset(), documents={}, metadata=MetadataIndex())
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def filter_rows(self, flt: Optional[MetadataFilter]) -> Optional[RowBitmap]:
+        """Rows matching `flt`, or None if it would not exclude any live row.
+
+        Config defaults such as `allowed_mime_types` usually match the whole
+        corpus; returning None then keeps searches on the unfiltered path.
+        """
+
+        if flt is None:
+            return None
+        rows = self.metadata.evaluate(flt)
+        if rows is not None and len(rows) >= len(self.rows):
+            matched = rows.to_mask()
+            if matched.size >= self.live_mask.size and matched[: self.live_mask.size][self.live_mask].all():
+                return None
+        return rows
+
+    def record(self, row: int) -> ChunkRecord:
+        return self.records[row]
+
+    def get(self, chunk_id: str) -> Optional[ChunkRecord]:
+        row = self.rows.get(chunk_id)
+        return None if row is None else self.records[row]
+
+    def document_version(self, document_id: str) -> Optional[int]:
+        doc = self.documents.get(document_id)
+        return doc["version"] if doc else None
+
+    def document_sha256(self, document_id: str) -> Optional[str]:
+        """Content hash the document was indexed from, if it has any chunks."""
+
+        doc = self.documents.get(document_id)
+        if not doc or doc["rows"][0] == doc["rows"][1]:
+            return None
+        return self.records[doc["rows"][0]].metadata.get("sha256")
+
+    def search(
+        self,
+        query: Sequence[float],
+        *,
+        top_k: int = 10,
+        min_score: float = -1.0,
+        rows: Optional[RowBitmap] = None,
+    ) -> List[Tuple[int, float]]:
+        """Return up to `top_k` `(row, cosine_similarity)` pairs, best first.
+
+        With `rows`, only those rows are scored, so a selective filter
+        shrinks the scan instead of emptying a post-filtered top-k.
+        """
+
+        if not len(self.records):
+            return []
+
+        q = _normalise(np.asarray(query, dtype=np.float32))
+        if rows is not None:
+            candidates = rows.to_rows()
+            candidates = candidates[self.live_mask[candidates]]
+            if not len(candidates):
+                return []
+            scores = self.matrix[candidates] @ q
+            return [(int(candidates[i]), s) for i, s in _top_k(scores, top_k, min_score)]
+
+        scores = self.matrix @ q
+        scores[~self.live_mask] = -np.inf
+        return _top_k(scores, top_k, min_score)
+
+    def search_batch(
+        self,
+        queries: Sequence[Sequence[float]],
+        *,
+        top_k: int = 10,
+        min_score: float = -1.0,
+        rows: Optional[RowBitmap] = None,
+    ) -> List[List[Tuple[int, float]]]:
+        """`search` for many queries with one matrix product.
+
+        Scores the `(queries x rows)` similarity matrix in a single pass and
+        selects each query's top `top_k` with a row-wise partition.
+        """
+
+        if not len(self.records) or not len(queries):
+            return [[] for _ in queries]
+
+        q = _normalise(np.asarray(queries, dtype=np.float32))
+        ids: Optional[np.ndarray] = None
+        if rows is not None:
+            ids = rows.to_rows()
+            ids = ids[self.live_mask[ids]]
+            if not len(ids):
+                return [[] for _ in queries]
+            scores = q @ self.matrix[ids].T
+        else:
+            scores = q @ self.matrix.T
+            scores[:, ~self.live_mask] = -np.inf
+
+        k = min(top_k, scores.shape[1])
+        if k <= 0:
+            return [[] for _ in queries]
+        idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top = np.take_along_axis(scores, idx, axis=1)
+        order = np.argsort(-top, axis=1)
+        idx = np.take_along_axis(idx, order, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        if ids is not None:
+            idx = ids[idx]
+
+        results = []
+        for r in range(len(q)):
+            keep = top[r] >= min_score
+            results.append(list(zip(idx[r][keep].tolist(), top[r][keep].tolist())))
+        return results
+
+
+class VectorIndex:
+    """Append-only, file-backed store of chunks and their embeddings.
+
+    Layout under `root`:
+
+    - `chunks.jsonl`  – one `ChunkRecord` per row, in row order
+    - `vectors.f32`   – L2-normalised float32 embeddings, one row per chunk
+    - `manifest.json` – row count, dimension, deleted rows and per-document
+      row ranges and versions; replaced atomically on every commit. Its
+      `epoch` is minted when the store is created, so it only changes when
+      the index is rebuilt from scratch.
+
+    A `MetadataIndex` of bitmaps over the same rows is maintained alongside
+    (rebuilt from chunk metadata on load) so filters can be applied before
+    the vector scan rather than after it.
+
+    Re-indexing a document appends its new rows and marks the old ones
+    deleted; `compact` rewrites the files once deleted rows dominate.
+    Readers only trust the first `rows` rows listed in the manifest, so a
+    writer appending concurrently never exposes partial data.
+
+    All reads go through `snapshot`, an immutable `VectorSnapshot` that
+    `refresh` and the write methods replace wholesale. Callers that make
+    several reads for one request should take the snapshot once.
+    """
+
+    MANIFEST = "manifest.json"
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root)
+        self.snapshot = VectorSnapshot.empty()
+        self._manifest_mtime: Optional[int] = None
+        self._refresh_lock = threading.Lock()
+        self.refresh()
+
+    # -- reading -----------------------------------------------------------
+
+    def refresh(self) -> bool:
+        """Reload from disk if the manifest changed. Returns True on reload.
+
+        Reads files and rebuilds the metadata bitmaps, so call it from a
+        worker thread in async code.
+        """
+
+        path = self.root / self.MANIFEST
+        with self._refresh_lock:
+            try:
+                mtime = path.stat().st_mtime_ns
+            except FileNotFoundError:
+                return False
+            if mtime == self._manifest_mtime:
+                return False
+
+            manifest = json.loads(path.read_text(encoding="utf-8"))
+            rows = manifest["rows"]
+            dim = manifest["dim"]
+
+            records: List[ChunkRecord] = []
+            if rows:
+                with (self.root / "chunks.jsonl").open("r", encoding="utf-8") as f:
+                    for _, line in zip(range(rows), f):
+                        records.append(ChunkRecord(**json.loads(line)))
+                matrix = np.fromfile(self.root / "vectors.f32", dtype=np.float32, count=rows * dim)
+                if len(records) != rows or matrix.size != rows * dim:
+                    # Caught a concurrent compaction between manifest and data
+                    # files; the next refresh will see the new manifest.
+                    return False
+                matrix = matrix.reshape(rows, dim)
+            else:
+                matrix = np.zeros((0, dim or 0), dtype=np.float32)
+
+            self.snapshot = VectorSnapshot(
+                records=records,
+                matrix=matrix,
+                deleted=frozenset(manifest.get("deleted", [])),
+                documents=manifest.get("documents", {}),
+                metadata=_metadata_for(records),
+                dim=dim,
+                generation=manifest.get("generation", 0),
+                epoch=manifest.get("epoch"),
+            )
+            self._manifest_mtime = mtime
+            return True
+
+    @property
+    def records(self) -> List[ChunkRecord]:
+        return self.snapshot.records
+
+    @property
+    def dim(self) -> Optional[int]:
+        return self.snapshot.dim
+
+    @property
+    def generation(self) -> int:
+        return self.snapshot.generation
+
+    @property
+    def epoch(self) -> Optional[str]:
+        return self.snapshot.epoch
+
+    @property
+    def documents(self) -> Dict[str, Dict[str, Any]]:
+        return self.snapshot.documents
+
+    def __len__(self) -> int:
+        return len(self.snapshot)
+
+    def filter_rows(self, flt: Optional[MetadataFilter]) -> Optional[RowBitmap]:
+        return self.snapshot.filter_rows(flt)
+
+    def record(self, row: int) -> ChunkRecord:
+        return self.snapshot.record(row)
+
+    def get(self, chunk_id: str) -> Optional[ChunkRecord]:
+        return self.snapshot.get(chunk_id)
+
+    def document_version(self, document_id: str) -> Optional[int]:
+        return self.snapshot.document_version(document_id)
+
+    def document_sha256(self, document_id: str) -> Optional[str]:
+        return self.snapshot.document_sha256(document_id)
+
+    def search(self, query: Sequence[float], **kwargs: Any) -> List[Tuple[int, float]]:
+        return self.snapshot.search(query, **kwargs)
+
+    def search_batch(self, queries: Sequence[Sequence[float]], **kwargs: Any) -> List[List[Tuple[int, float]]]:
+        return self.snapshot.search_batch(queries, **kwargs)
+
+    # -- writing -----------------------------------------------------------
+    #
+    # Writers build the next snapshot from copies of the current one, so a
+    # reader holding the old snapshot never sees a half-applied change.
+
+    def upsert_document(
+        self,
+        document_id: str,
+        records: Sequence[ChunkRecord],
+        embeddings: Sequence[Sequence[float]],
+    ) -> None:
+        """Replace all chunks of `document_id` and commit."""
+
+        if len(records) != len(embeddings):
+            raise ValueError("records and embeddings must have the same length")
+
+        snap = self.snapshot
+        self.root.mkdir(parents=True, exist_ok=True)
+        epoch = snap.epoch or uuid4().hex[:12]
+        deleted = snap.deleted | self._document_rows(document_id)
+
+        start = len(snap.records)
+        all_records, matrix, metadata, dim = snap.records, snap.matrix, snap.metadata, snap.dim
+        if records:
+            new = _normalise(np.asarray(embeddings, dtype=np.float32))
+            if dim is None:
+                dim = int(new.shape[1])
+                matrix = np.zeros((0, dim), dtype=np.float32)
+            elif new.shape[1] != dim:
+                raise ValueError(f"embedding dimension {new.shape[1]} does not match index dimension {dim}")
+
+            with (self.root / "chunks.jsonl").open("a", encoding="utf-8") as f:
+                for rec in records:
+                    f.write(json.dumps(asdict(rec), separators=(",", ":")))
+                    f.write("\n")
+            with (self.root / "vectors.f32").open("ab") as f:
+                f.write(new.tobytes())
+
+            all_records = snap.records + list(records)
+            matrix = np.vstack([matrix, new])
+            metadata = snap.metadata.copy()
+            metadata.extend(start, ((rec.document_id, rec.metadata) for rec in records))
+
+        generation = snap.generation + 1
+        documents = {**snap.documents, document_id: {"version": generation, "rows": [start, len(all_records)]}}
+        self.snapshot = VectorSnapshot(
+            records=all_records,
+            matrix=matrix,
+            deleted=deleted,
+            documents=documents,
+            metadata=metadata,
+            dim=dim,
+            generation=generation,
+            epoch=epoch,
+        )
+        if len(deleted) * 2 > len(all_records):
+            self.compact()
+            return
+        self._write_manifest()
+
+    def delete_document(self, document_id: str) -> None:
+        snap = self.snapshot
+        if document_id not in snap.documents:
+            return
+        self.snapshot = replace(
+            snap,
+            deleted=snap.deleted | self._document_rows(document_id),
+            documents={k: v for k, v in snap.documents.items() if k != document_id},
+            generation=snap.generation + 1,
+        )
+        self._write_manifest()
+
+    def _document_rows(self, document_id: str) -> FrozenSet[int]:
+        doc = self.snapshot.documents.get(document_id)
+        if doc is None:
+            return frozenset()
+        start, end = doc["rows"]
+        return frozenset(range(start, end))
+
+    def compact(self) -> None:
+        """Rewrite the store without deleted rows."""
+
+        snap = self.snapshot
+        if not snap.deleted:
+            return
+        keep = [row for row in range(len(snap.records)) if row not in snap.deleted]
+        records = [snap.records[row] for row in keep]
+        matrix = snap.matrix[keep] if keep else np.zeros((0, snap.dim or 0), dtype=np.float32)
+
+        tmp_chunks = self.root / "chunks.jsonl.tmp"
+        with tmp_chunks.open("w", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(asdict(rec), separators=(",", ":")))
+                f.write("\n")
+        tmp_vectors = self.root / "vectors.f32.tmp"
+        tmp_vectors.write_bytes(np.ascontiguousarray(matrix).tobytes())
+
+        remap = {old: new for new, old in enumerate(keep)}
+        documents: Dict[str, Dict[str, Any]] = {}
+        for document_id, doc in snap.documents.items():
+            start, end = doc["rows"]
+            live = [remap[r] for r in range(start, end) if r in remap]
+            documents[document_id] = {**doc, "rows": [live[0], live[-1] + 1] if live else [0, 0]}
+
+        os.replace(tmp_chunks, self.root / "chunks.jsonl")
+        os.replace(tmp_vectors, self.root / "vectors.f32")
+        self.snapshot = replace(
+            snap,
+            records=records,
+            matrix=matrix,
+            deleted=frozenset(),
+            documents=documents,
+            metadata=_metadata_for(records),
+            generation=snap.generation + 1,
+        )
+        self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        snap = self.snapshot
+        manifest = {
+            "epoch": snap.epoch,
+            "generation": snap.generation,
+            "rows": len(snap.records),
+            "dim": snap.dim,
+            "deleted": sorted(snap.deleted),
+            "documents": snap.documents,
+        }
+        path = self.root / self.MANIFEST
+        tmp = path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(manifest, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp, path)
+        self._manifest_mtime = path.stat().st_mtime_ns
+
+
+def _metadata_for(records: Sequence[ChunkRecord]) -> MetadataIndex:
+    metadata = MetadataIndex()
+    metadata.extend(0, ((rec.document_id, rec.metadata) for rec in records))
+    return metadata
+
+
+def _normalise(x: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def _top_k(scores: np.ndarray, top_k: int, min_score: float) -> List[Tuple[int, float]]:
+    k = min(top_k, scores.shape[0])
+    if k <= 0:
+        return []
+    idx = np.argpartition(-scores, k - 1)[:k]
+    idx = idx[np.argsort(-scores[idx])]
+    return [(int(i), float(scores[i])) for i in idx if scores[i] >= min_score]
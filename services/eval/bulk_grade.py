@@ -0,0 +1,212 @@
+"""Grade historical answers from the evidence logs.
+
+Streams `answer` events out of `evidence-*.jsonl` files and grades each one
+against `grading.global_forbid_phrases`, any extra phrase files, and — when
+the question matches an evaluation case — that case's expected and forbidden
+phrases. Work is spread over processes in chunks of raw log lines, so JSON
+decoding is parallel too.
+
+    python -m services.eval.bulk_grade data/logs --phrases extra-phrases.txt --workers 8 --output flagged.jsonl
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter, deque
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import yaml
+
+from services.common.config import load_config
+from services.eval.grading import Grading
+from services.eval.matcher import normalise
+
+
+CaseIndex = Dict[str, Tuple[str, List[str], List[str]]]  # question -> (case id, expected, forbid)
+
+_grading: Optional[Grading] = None
+_cases: CaseIndex = {}
+
+
+def load_case_index(path: Path) -> CaseIndex:
+    index: CaseIndex = {}
+    for item in yaml.safe_load(path.read_text(encoding="utf-8")) or []:
+        key = normalise(item["question"], ignore_case=True, normalise_whitespace=True).strip()
+        index[key] = (item["id"], item.get("expected_contains", []), item.get("forbid_phrases", []))
+    return index
+
+
+def log_files(paths: Iterable[Path]) -> List[Path]:
+    files: List[Path] = []
+    for path in paths:
+        files.extend(sorted(path.glob("evidence-*.jsonl")) if path.is_dir() else [path])
+    return files
+
+
+def read_chunks(files: Iterable[Path], size: int) -> Iterator[List[str]]:
+    for path in files:
+        with path.open("r", encoding="utf-8") as f:
+            while True:
+                lines = list(islice(f, size))
+                if not lines:
+                    break
+                yield lines
+
+
+def _init_worker(grading: Grading, cases: CaseIndex) -> None:
+    global _grading, _cases
+    _grading, _cases = grading, cases
+
+
+def grade_lines(lines: List[str]) -> Tuple[int, List[Dict[str, Any]]]:
+    """Grade the answer events among raw log lines; return (answers graded, flagged results)."""
+
+    assert _grading is not None
+    graded = 0
+    flagged: List[Dict[str, Any]] = []
+    for line in lines:
+        if '"answer"' not in line:  # cheap skip of other event types before decoding
+            continue
+        try:
+            envelope = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        event = envelope.get("event") or {}
+        if event.get("event_type") != "answer":
+            continue
+        payload = event.get("payload") or {}
+        question = payload.get("question", "")
+        case_id, expected, forbid = _cases.get(
+            normalise(question, ignore_case=True, normalise_whitespace=True).strip(), (None, [], [])
+        )
+        grade = _grading.grade(payload.get("answer", ""), expected, forbid)
+        graded += 1
+        if grade["failures"]:
+            flagged.append(
+                {
+                    "event_id": event.get("event_id"),
+                    "timestamp": envelope.get("timestamp"),
+                    "question": question,
+                    "case_id": case_id,
+                    "score": round(grade["score"], 4),
+                    "failures": grade["failures"],
+                }
+            )
+    return graded, flagged
+
+
+def _imap_bounded(pool: Any, fn: Any, items: Iterable[Any], *, window: int) -> Iterator[Any]:
+    """Ordered `pool.imap` that keeps at most `window` chunks in flight.
+
+    `Pool.imap` reads its input as fast as it can, which would pull whole
+    log directories into memory ahead of the workers.
+    """
+
+    pending: deque = deque()
+    for item in items:
+        pending.append(pool.apply_async(fn, (item,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def bulk_grade(
+    files: List[Path],
+    grading: Grading,
+    cases: CaseIndex,
+    *,
+    workers: int = 1,
+    chunk_lines: int = 2000,
+    out=None,
+) -> Dict[str, Any]:
+    """Grade every answer event in `files`, writing flagged results to `out` as JSON lines."""
+
+    start = time.perf_counter()
+    answers = flagged = 0
+    reasons: Counter = Counter()
+    chunks = read_chunks(files, chunk_lines)
+
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker, initargs=(grading, cases))
+        results: Iterable[Tuple[int, List[Dict[str, Any]]]] = _imap_bounded(
+            pool, grade_lines, chunks, window=workers * 2
+        )
+    else:
+        pool = None
+        _init_worker(grading, cases)
+        results = map(grade_lines, chunks)
+
+    try:
+        for graded, rows in results:
+            answers += graded
+            flagged += len(rows)
+            for row in rows:
+                reasons.update(row["failures"])
+                if out is not None:
+                    out.write(json.dumps(row, separators=(",", ":")) + "\n")
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    seconds = time.perf_counter() - start
+    return {
+        "files": len(files),
+        "answers": answers,
+        "flagged": flagged,
+        "seconds": round(seconds, 3),
+        "answers_per_second": round(answers / seconds, 1) if seconds else None,
+        "top_failures": dict(reasons.most_common(20)),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    cfg = load_config("eval")
+    suite = (cfg.get("suites", {}) or {}).get(cfg.get("default_suite", "smoke"), {}) or {}
+
+    parser = argparse.ArgumentParser(description="Grade answer events from the evidence logs.")
+    parser.add_argument("paths", nargs="*", type=Path, default=[Path(os.getenv("EVIDENCE_LOG_DIR", "data/logs"))])
+    parser.add_argument(
+        "--phrases", type=Path, action="append", default=[], help="File of extra forbidden phrases, one per line"
+    )
+    parser.add_argument(
+        "--questions",
+        type=Path,
+        default=Path(suite.get("questions_file", "tests/evaluation/questions.yaml")),
+        help="Evaluation cases whose phrases apply to matching questions",
+    )
+    parser.add_argument("--ignore-case", action="store_true", help="Override grading.ignore_case")
+    parser.add_argument("--normalise-whitespace", action="store_true", help="Override grading.normalise_whitespace")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-lines", type=int, default=2000)
+    parser.add_argument("--output", type=Path, help="Write flagged answers here as JSON lines")
+    args = parser.parse_args(argv)
+
+    grading = Grading.from_config(cfg.get("grading", {}) or {})
+    for path in args.phrases:
+        lines = path.read_text(encoding="utf-8").splitlines()
+        grading.global_forbid_phrases.extend(p.strip() for p in lines if p.strip() and not p.startswith("#"))
+    grading.ignore_case = grading.ignore_case or args.ignore_case
+    grading.normalise_whitespace = grading.normalise_whitespace or args.normalise_whitespace
+    cases = load_case_index(args.questions) if args.questions.exists() else {}
+
+    files = log_files(args.paths)
+    if args.output:
+        with args.output.open("w", encoding="utf-8") as out:
+            summary = bulk_grade(files, grading, cases, workers=args.workers, chunk_lines=args.chunk_lines, out=out)
+    else:
+        summary = bulk_grade(files, grading, cases, workers=args.workers, chunk_lines=args.chunk_lines)
+    json.dump(summary, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
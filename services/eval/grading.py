@@ -0,0 +1,77 @@
+"""Rule-based answer grading shared by the eval runner and bulk grading."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple
+
+from services.eval.matcher import PhraseMatcher
+
+
+@dataclass
+class Grading:
+    """Grading weights and phrase options from `grading` in `config/eval.yaml`.
+
+    The phrases of each distinct case are compiled once, together with
+    `global_forbid_phrases`, into a `PhraseMatcher` reused for every answer.
+    """
+
+    expected_contains_weight: float = 0.5
+    forbid_phrases_weight: float = 0.5
+    global_forbid_phrases: List[str] = field(default_factory=list)
+    ignore_case: bool = False
+    normalise_whitespace: bool = False
+    _matchers: Dict[Tuple[Tuple[str, ...], Tuple[str, ...]], PhraseMatcher] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any]) -> "Grading":
+        return cls(
+            expected_contains_weight=float(cfg.get("expected_contains_weight", 0.5)),
+            forbid_phrases_weight=float(cfg.get("forbid_phrases_weight", 0.5)),
+            global_forbid_phrases=list(cfg.get("global_forbid_phrases") or []),
+            ignore_case=bool(cfg.get("ignore_case", False)),
+            normalise_whitespace=bool(cfg.get("normalise_whitespace", False)),
+        )
+
+    def _matcher(self, expected: Tuple[str, ...], forbid: Tuple[str, ...]) -> PhraseMatcher:
+        matcher = self._matchers.get((expected, forbid))
+        if matcher is None:
+            matcher = self._matchers[(expected, forbid)] = PhraseMatcher(
+                expected + forbid,
+                ignore_case=self.ignore_case,
+                normalise_whitespace=self.normalise_whitespace,
+            )
+        return matcher
+
+    def grade(
+        self,
+        answer: str,
+        expected_contains: Sequence[str] = (),
+        forbid_phrases: Sequence[str] = (),
+    ) -> Dict[str, Any]:
+        """Score = weighted share of expected phrases found plus share of forbidden phrases avoided."""
+
+        expected = tuple(expected_contains)
+        forbid = tuple(dict.fromkeys([*forbid_phrases, *self.global_forbid_phrases]))
+        matcher = self._matcher(expected, forbid)
+        found = {matcher.phrases[i] for i in matcher.find(answer)}
+
+        failures: List[str] = []
+        missing = 0
+        for phrase in expected:
+            if phrase not in found:
+                failures.append(f"missing expected substring: {phrase!r}")
+                missing += 1
+        present = 0
+        for phrase in forbid:
+            if phrase in found:
+                failures.append(f"forbidden phrase present: {phrase!r}")
+                present += 1
+
+        score = (
+            self.expected_contains_weight * (1 - missing / max(1, len(expected)))
+            + self.forbid_phrases_weight * (1 - present / max(1, len(forbid)))
+        )
+        return {"score": max(0.0, min(1.0, score)), "failures": failures}
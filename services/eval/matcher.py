@@ -0,0 +1,133 @@
+"""Multi-phrase substring matching (Aho-Corasick).
+
+Grading checks every answer against the same phrase lists; compiling them
+into one automaton finds all phrases in a single pass over the answer, so
+the cost stops growing with the number of phrases. Short lists are cheaper
+to check with `in` (a C-speed scan per phrase), so below `SCAN_LIMIT`
+phrases the matcher does that instead; both give the same results.
+"""
+
+from __future__ import annotations
+
+import re
+from collections import deque
+from typing import Dict, FrozenSet, Iterable, List, Set
+
+
+# Below ~150 phrases per ~900-character answer, per-phrase `in` scans win
+# (tests/benchmarks/bench_grading.py).
+SCAN_LIMIT = 128
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalise(text: str, *, ignore_case: bool = False, normalise_whitespace: bool = False) -> str:
+    """Case-fold and/or collapse whitespace runs to one space.
+
+    Edges are collapsed, not stripped: a phrase like "pci " must still need
+    the space after it, so it does not match inside "pcidss".
+    """
+
+    if ignore_case:
+        text = text.casefold()
+    if normalise_whitespace:
+        text = _WHITESPACE_RE.sub(" ", text)
+    return text
+
+
+class PhraseMatcher:
+    """Compiled set of phrases; `find` reports which occur anywhere in a text.
+
+    With `ignore_case` both sides are case-folded, and with
+    `normalise_whitespace` runs of whitespace compare equal to one space.
+    """
+
+    def __init__(
+        self,
+        phrases: Iterable[str],
+        *,
+        ignore_case: bool = False,
+        normalise_whitespace: bool = False,
+        scan_limit: int = SCAN_LIMIT,
+    ) -> None:
+        self.ignore_case = ignore_case
+        self.normalise_whitespace = normalise_whitespace
+        self.phrases: List[str] = list(dict.fromkeys(phrases))
+        self._keys = [self._normalise(p) for p in self.phrases]
+        self._scan = len(self.phrases) <= scan_limit
+
+        # goto[state] maps a character to the next state; out[state] holds the
+        # indices of phrases ending at this state or any state on its fail chain.
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        out: List[Set[int]] = [set()]
+        self._always: Set[int] = set()  # phrases that normalise to "" match everything
+
+        for i, key in enumerate(self._keys):
+            if self._scan:
+                break
+            if not key:
+                self._always.add(i)
+                continue
+            state = 0
+            for ch in key:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    out.append(set())
+                state = nxt
+            out[state].add(i)
+
+        # Breadth-first, so fail targets (always shallower) are final before use.
+        goto, fail = self._goto, self._fail
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] |= out[fail[nxt]]
+
+        self._out: List[FrozenSet[int]] = [frozenset(o) for o in out]
+
+    def __len__(self) -> int:
+        return len(self.phrases)
+
+    def _normalise(self, text: str) -> str:
+        return normalise(text, ignore_case=self.ignore_case, normalise_whitespace=self.normalise_whitespace)
+
+    def find(self, text: str) -> Set[int]:
+        """Indices (into `phrases`) of every phrase occurring in `text`."""
+
+        text = self._normalise(text)
+        if self._scan:
+            return {i for i, key in enumerate(self._keys) if key in text}
+
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set(self._always)
+        state = 0
+        for ch in text:
+            while True:
+                nxt = goto[state].get(ch)
+                if nxt is not None:
+                    state = nxt
+                    break
+                if not state:
+                    break
+                state = fail[state]
+            if out[state]:
+                found |= out[state]
+                if len(found) == len(self.phrases):
+                    break
+        return found
+
+    def matches(self, text: str) -> List[str]:
+        """Phrases occurring in `text`, in the order they were given."""
+
+        return [self.phrases[i] for i in sorted(self.find(text))]
@@ -0,0 +1,570 @@
+"""Columnar copies of closed evidence days for analytics.
+
+`compact` converts each evidence log older than today into one directory per
+day, partitioned by event type. Every event field becomes a column (nested
+payload fields as dotted names such as `payload.latency_ms`), stored as numpy
+arrays that a query can load one by one: numbers and booleans as plain arrays,
+hashes and ids as raw bytes, repetitive strings dictionary-encoded and other
+strings zlib-compressed. The hash chain is carried over
+in `_prev_hash`, `_record_hash`, `_timestamp` and `_line`, so `verify` can
+rebuild every record and re-check the chain without the JSONL file.
+
+Layout under the root (default `EVIDENCE_COLUMNAR_DIR`, `data/columnar`):
+
+- `date=YYYY-MM-DD/_manifest.json` – source file, line count and chain ends;
+  written before the day directory is moved into place, so its presence
+  means the day is complete
+- `date=YYYY-MM-DD/event_type=<type>/_columns.json` – rows and column encodings
+- `date=YYYY-MM-DD/event_type=<type>/<column>.npy` (plus `<column>~*` side files)
+- `date=YYYY-MM-DD/_invalid.jsonl` – lines that were not well-formed records, verbatim
+
+    python -m services.evidence_logger.columnar compact
+    python -m services.evidence_logger.columnar query --type answer --since 2026-01-01 \\
+        --group-by week payload.model_name --agg count p95:payload.latency_ms
+    python -m services.evidence_logger.columnar verify --date 2026-01-01
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import zlib
+from datetime import date, datetime
+from hashlib import sha256
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+import numpy as np
+
+
+LOG_DIR = Path(os.getenv("EVIDENCE_LOG_DIR", "data/logs"))
+COLUMNAR_DIR = Path(os.getenv("EVIDENCE_COLUMNAR_DIR", "data/columnar"))
+
+ENVELOPE = ("_line", "_timestamp", "_prev_hash", "_record_hash")
+VIRTUAL = ("date", "week")
+
+_KEY_RE = re.compile(r"^[A-Za-z][A-Za-z0-9_]*$")
+_HEX_RE = re.compile(r"^[0-9a-f]+$")
+_UUID_RE = re.compile(r"^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$")
+_LOG_RE = re.compile(r"^evidence-(\d{4}-\d{2}-\d{2})\.jsonl$")
+
+# Validity codes, stored only for columns where some row has no value.
+MISSING, NULL, VALUE = 0, 1, 2
+_MISSING = object()
+
+
+# -- writing ----------------------------------------------------------------
+
+
+def _flatten(obj: Dict[str, Any], prefix: str, out: Dict[str, Any]) -> None:
+    for key, value in obj.items():
+        name = prefix + key
+        if isinstance(value, dict) and value and all(isinstance(k, str) and _KEY_RE.match(k) for k in value):
+            _flatten(value, name + ".", out)
+        else:
+            out[name] = value  # scalars, lists and awkward dicts (stored as JSON)
+
+
+def flatten_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Dotted column name -> leaf value; an event with unusual keys is kept whole as `_event`."""
+
+    if not all(isinstance(k, str) and _KEY_RE.match(k) for k in event):
+        return {"_event": event}
+    out: Dict[str, Any] = {}
+    _flatten(event, "", out)
+    return out
+
+
+def _encoding(present: List[Any]) -> str:
+    kinds = {type(v) for v in present}
+    if not kinds:
+        return "null"
+    if kinds == {bool}:
+        return "bool"
+    if kinds == {int} and all(-(2**63) <= v < 2**63 for v in present):
+        return "int64"
+    if kinds == {float}:
+        return "float64"
+    if kinds != {str}:
+        return "json"
+    width = len(present[0])
+    if 16 <= width <= 128 and width % 2 == 0 and all(len(v) == width and _HEX_RE.match(v) for v in present):
+        return "hex"
+    if all(_UUID_RE.match(v) for v in present):
+        return "uuid"
+    if len(set(present)) <= max(1, len(present) // 4):
+        return "dict"
+    return "str"
+
+
+def _write_strings(path: Path, name: str, strings: List[str]) -> None:
+    data = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(data) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in data], out=offsets[1:])
+    np.save(path / f"{name}~offsets.npy", offsets)
+    (path / f"{name}~data.zlib").write_bytes(zlib.compress(b"".join(data), 6))
+
+
+def write_column(path: Path, name: str, values: List[Any]) -> Dict[str, Any]:
+    """Write one column (`_MISSING` marks rows without the field); return its metadata."""
+
+    validity = np.array(
+        [MISSING if v is _MISSING else NULL if v is None else VALUE for v in values], dtype=np.int8
+    )
+    mask = validity == VALUE
+    present = [v for v in values if v is not _MISSING and v is not None]
+    kind = _encoding(present)
+    meta: Dict[str, Any] = {"encoding": kind}
+    if not mask.all():
+        np.save(path / f"{name}~valid.npy", validity)
+        meta["validity"] = True
+
+    if kind in ("bool", "int64", "float64"):
+        arr = np.zeros(len(values), dtype=kind)
+        arr[mask] = present
+        np.save(path / f"{name}.npy", arr)
+    elif kind in ("hex", "uuid"):
+        width = 16 if kind == "uuid" else len(present[0]) // 2
+        arr = np.zeros((len(values), width), dtype=np.uint8)
+        raw = b"".join(UUID(v).bytes if kind == "uuid" else bytes.fromhex(v) for v in present)
+        arr[mask] = np.frombuffer(raw, dtype=np.uint8).reshape(-1, width)
+        np.save(path / f"{name}.npy", arr)
+    elif kind == "dict":
+        dictionary = sorted(set(present))
+        lookup = {v: i for i, v in enumerate(dictionary)}
+        codes = np.full(len(values), -1, dtype=np.int32)
+        codes[mask] = [lookup[v] for v in present]
+        np.save(path / f"{name}.npy", codes)
+        (path / f"{name}~values.json").write_text(json.dumps(dictionary), encoding="utf-8")
+    elif kind in ("str", "json"):
+        if kind == "json":
+            present = [json.dumps(v, separators=(",", ":")) for v in present]
+        strings = iter(present)
+        _write_strings(path, name, [next(strings) if ok else "" for ok in mask])
+    return meta
+
+
+def write_partition(path: Path, records: List[Tuple[int, Dict[str, Any]]]) -> None:
+    """Write `(line number, envelope)` records of one event type as a column set."""
+
+    path.mkdir(parents=True)
+    rows = [flatten_event(envelope["event"]) for _, envelope in records]
+    names = sorted({name for row in rows for name in row})
+    columns = {
+        "_line": write_column(path, "_line", [line for line, _ in records]),
+        "_timestamp": write_column(path, "_timestamp", [e["timestamp"] for _, e in records]),
+        "_prev_hash": write_column(path, "_prev_hash", [e["prev_hash"] for _, e in records]),
+        "_record_hash": write_column(path, "_record_hash", [e["record_hash"] for _, e in records]),
+    }
+    for name in names:
+        columns[name] = write_column(path, name, [row.get(name, _MISSING) for row in rows])
+    (path / "_columns.json").write_text(json.dumps({"rows": len(records), "columns": columns}), encoding="utf-8")
+
+
+def _is_record(envelope: Any) -> bool:
+    return (
+        isinstance(envelope, dict)
+        and set(envelope) == {"timestamp", "prev_hash", "event", "record_hash"}
+        and isinstance(envelope["event"], dict)
+    )
+
+
+def _partition_name(event_type: Any) -> str:
+    return event_type if isinstance(event_type, str) and _KEY_RE.match(event_type) else "_other"
+
+
+def compact_day(source: Path, root: Path, day: str) -> Dict[str, Any]:
+    """Convert one day's log into `root/date=<day>`; return its manifest."""
+
+    final = root / f"date={day}"
+    tmp = root / f".tmp-date={day}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+
+    partitions: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+    invalid: List[str] = []
+    lines = 0
+    first_prev: Optional[str] = None
+    last_hash: Optional[str] = None
+    with source.open("r", encoding="utf-8") as f:
+        for lines, raw in enumerate(f, start=1):
+            try:
+                envelope = json.loads(raw)
+            except json.JSONDecodeError:
+                envelope = None
+            if not _is_record(envelope):
+                invalid.append(json.dumps({"line": lines, "raw": raw.rstrip("\n")}))
+                continue
+            if last_hash is None:
+                first_prev = envelope["prev_hash"]
+            last_hash = envelope["record_hash"]
+            partitions.setdefault(_partition_name(envelope["event"].get("event_type")), []).append((lines, envelope))
+
+    for name, records in sorted(partitions.items()):
+        write_partition(tmp / f"event_type={name}", records)
+    if invalid:
+        (tmp / "_invalid.jsonl").write_text("\n".join(invalid) + "\n", encoding="utf-8")
+
+    manifest = {
+        "date": day,
+        "source": source.name,
+        "source_bytes": source.stat().st_size,
+        "lines": lines,
+        "invalid_lines": len(invalid),
+        "first_prev_hash": first_prev,
+        "last_record_hash": last_hash,
+        "event_types": {name: len(records) for name, records in sorted(partitions.items())},
+    }
+    (tmp / "_manifest.json").write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    shutil.rmtree(final, ignore_errors=True)
+    os.replace(tmp, final)
+    return manifest
+
+
+def compact(log_dir: Path, root: Path, *, before: Optional[date] = None) -> List[Dict[str, Any]]:
+    """Compact every log for a day before `before` (default: today, UTC) not already compacted."""
+
+    before = before or datetime.utcnow().date()
+    root.mkdir(parents=True, exist_ok=True)
+    done = []
+    for source in sorted(Path(log_dir).glob("evidence-*.jsonl")):
+        m = _LOG_RE.match(source.name)
+        if not m or date.fromisoformat(m.group(1)) >= before:
+            continue  # today's log is still being appended to
+        if (root / f"date={m.group(1)}" / "_manifest.json").exists():
+            continue
+        done.append(compact_day(source, root, m.group(1)))
+    return done
+
+
+# -- reading ----------------------------------------------------------------
+
+
+class Partition:
+    """One `event_type=` directory of a compacted day."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.day = path.parent.name.split("=", 1)[1]
+        self.event_type = path.name.split("=", 1)[1]
+        meta = json.loads((path / "_columns.json").read_text(encoding="utf-8"))
+        self.rows: int = meta["rows"]
+        self.columns: Dict[str, Dict[str, Any]] = meta["columns"]
+
+    def read(self, name: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Return `(values, has_value)` for a column; absent columns have no values.
+
+        Numeric columns come back as numpy arrays (memory-mapped), everything
+        else as object arrays of Python values.
+        """
+
+        meta = self.columns.get(name)
+        if meta is None and name in VIRTUAL:
+            value = self.day if name == "date" else "{}-W{:02d}".format(*date.fromisoformat(self.day).isocalendar()[:2])
+            return np.full(self.rows, value, dtype=object), np.ones(self.rows, dtype=bool)
+        if meta is None:
+            return np.full(self.rows, None, dtype=object), np.zeros(self.rows, dtype=bool)
+
+        p = self.path
+        has_value = (
+            np.load(p / f"{name}~valid.npy") == VALUE if meta.get("validity") else np.ones(self.rows, dtype=bool)
+        )
+        kind = meta["encoding"]
+        if kind in ("bool", "int64", "float64"):
+            return np.load(p / f"{name}.npy", mmap_mode="r"), has_value
+        values = np.full(self.rows, None, dtype=object)
+        if kind == "hex":
+            arr = np.load(p / f"{name}.npy")
+            values[has_value] = [row.tobytes().hex() for row in arr[has_value]]
+        elif kind == "uuid":
+            arr = np.load(p / f"{name}.npy")
+            values[has_value] = [str(UUID(bytes=row.tobytes())) for row in arr[has_value]]
+        elif kind == "dict":
+            dictionary = np.array(json.loads((p / f"{name}~values.json").read_text(encoding="utf-8")) + [None], dtype=object)
+            values = dictionary[np.load(p / f"{name}.npy")]  # code -1 picks the trailing None
+        elif kind in ("str", "json"):
+            offsets = np.load(p / f"{name}~offsets.npy")
+            data = zlib.decompress((p / f"{name}~data.zlib").read_bytes())
+            decode = json.loads if kind == "json" else (lambda s: s)
+            for i in np.flatnonzero(has_value):
+                values[i] = decode(data[offsets[i] : offsets[i + 1]].decode("utf-8"))
+        return values, has_value
+
+    def validity(self, name: str) -> np.ndarray:
+        meta = self.columns[name]
+        if not meta.get("validity"):
+            return np.full(self.rows, VALUE, dtype=np.int8)
+        return np.load(self.path / f"{name}~valid.npy")
+
+
+def partitions(
+    root: Path,
+    *,
+    event_types: Optional[Sequence[str]] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+) -> Iterator[Partition]:
+    """Compacted partitions in date order, pruned by directory name before anything is read."""
+
+    for day_dir in sorted(Path(root).glob("date=*")):
+        day = day_dir.name.split("=", 1)[1]
+        if (since and day < since) or (until and day > until):
+            continue
+        for part_dir in sorted(day_dir.glob("event_type=*")):
+            if event_types and part_dir.name.split("=", 1)[1] not in event_types:
+                continue
+            yield Partition(part_dir)
+
+
+def iter_records(day_dir: Path) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Rebuild `(line number, envelope)` for every record of a compacted day, in log order."""
+
+    records: List[Tuple[int, Dict[str, Any]]] = []
+    for part_dir in sorted(day_dir.glob("event_type=*")):
+        part = Partition(part_dir)
+        events: List[Dict[str, Any]] = [{} for _ in range(part.rows)]
+        for name in part.columns:
+            if name in ENVELOPE:
+                continue
+            values, _ = part.read(name)
+            validity = part.validity(name)
+            for i in np.flatnonzero(validity != MISSING):
+                value = None if validity[i] == NULL else _python(values[i])
+                if name == "_event":
+                    events[i] = value
+                    continue
+                *parents, leaf = name.split(".")
+                node = events[i]
+                for key in parents:
+                    node = node.setdefault(key, {})
+                node[leaf] = value
+        lines, _ = part.read("_line")
+        timestamps, _ = part.read("_timestamp")
+        prev_hashes, _ = part.read("_prev_hash")
+        record_hashes, _ = part.read("_record_hash")
+        for i in range(part.rows):
+            envelope = {
+                "timestamp": timestamps[i],
+                "prev_hash": prev_hashes[i],
+                "event": events[i],
+                "record_hash": record_hashes[i],
+            }
+            records.append((int(lines[i]), envelope))
+    records.sort(key=lambda r: r[0])
+    return iter(records)
+
+
+def verify(root: Path, day: str) -> int:
+    """Re-check the hash chain of a compacted day; return the number of records verified."""
+
+    day_dir = Path(root) / f"date={day}"
+    manifest = json.loads((day_dir / "_manifest.json").read_text(encoding="utf-8"))
+    prev_hash = manifest["first_prev_hash"]
+    count = 0
+    for line, record in iter_records(day_dir):
+        if record["prev_hash"] != prev_hash:
+            raise ValueError(f"hash chain broken at line {line}")
+        payload = json.dumps(
+            {k: record[k] for k in ("event", "prev_hash", "timestamp")}, sort_keys=True, separators=(",", ":")
+        ).encode("utf-8")
+        if sha256(payload).hexdigest() != record["record_hash"]:
+            raise ValueError(f"record hash mismatch at line {line}")
+        prev_hash = record["record_hash"]
+        count += 1
+    if prev_hash != manifest["last_record_hash"]:
+        raise ValueError("chain does not end at the manifest's last record hash")
+    return count
+
+
+# -- querying ---------------------------------------------------------------
+
+_WHERE_RE = re.compile(r"^([A-Za-z_][\w.]*)\s*(!=|>=|<=|=|>|<)\s*(.*)$")
+_OPS = {
+    "=": np.equal,
+    "!=": np.not_equal,
+    ">=": np.greater_equal,
+    "<=": np.less_equal,
+    ">": np.greater,
+    "<": np.less,
+}
+
+
+def parse_where(expr: str) -> Tuple[str, str, Any]:
+    m = _WHERE_RE.match(expr)
+    if not m:
+        raise ValueError(f"cannot parse filter {expr!r}; expected e.g. payload.cached=false")
+    column, op, raw = m.groups()
+    try:
+        value = json.loads(raw)
+    except json.JSONDecodeError:
+        value = raw
+    return column, op, value
+
+
+def _aggregate(func: str, values: np.ndarray) -> Any:
+    if func == "count":
+        return int(len(values))
+    if not len(values):
+        return None
+    values = values.astype(np.float64)
+    if func == "sum":
+        return float(values.sum())
+    if func == "mean":
+        return round(float(values.mean()), 4)
+    if func == "min":
+        return float(values.min())
+    if func == "max":
+        return float(values.max())
+    if func.startswith("p") and func[1:].isdigit():
+        return round(float(np.percentile(values, int(func[1:]))), 3)
+    raise ValueError(f"unknown aggregate {func!r}")
+
+
+def query(
+    parts: Iterable[Partition],
+    *,
+    select: Sequence[str] = (),
+    where: Sequence[Tuple[str, str, Any]] = (),
+    group_by: Sequence[str] = (),
+    aggs: Sequence[str] = (),
+) -> List[Dict[str, Any]]:
+    """Filter, then either project `select` columns or aggregate per `group_by` key.
+
+    Only the columns named in the arguments are read from each partition.
+    `aggs` are `count` or `<func>:<column>` with func one of sum, mean, min,
+    max or a percentile such as p95; rows without a value are left out of
+    that aggregate.
+    """
+
+    agg_specs = [(a, None) if a == "count" else tuple(a.split(":", 1)) for a in aggs]
+    value_columns = [c for _, c in agg_specs if c]
+    wanted = list(dict.fromkeys([*select, *group_by, *value_columns]))
+
+    chunks: Dict[str, List[np.ndarray]] = {c: [] for c in wanted}
+    present: Dict[str, List[np.ndarray]] = {c: [] for c in wanted}
+    for part in parts:
+        keep = np.ones(part.rows, dtype=bool)
+        for column, op, value in where:
+            values, has_value = part.read(column)
+            with np.errstate(invalid="ignore"):
+                try:
+                    match = _OPS[op](values[has_value], value)
+                except TypeError:
+                    match = np.zeros(int(has_value.sum()), dtype=bool)
+            hit = np.zeros(part.rows, dtype=bool)
+            hit[has_value] = np.asarray(match, dtype=bool)
+            keep &= hit
+            if not keep.any():
+                break
+        if not keep.any():
+            continue
+        for column in wanted:
+            values, has_value = part.read(column)
+            chunks[column].append(np.asarray(values[keep]))
+            present[column].append(has_value[keep])
+
+    columns = {c: np.concatenate(chunks[c]) if chunks[c] else np.array([], dtype=object) for c in wanted}
+    has = {c: np.concatenate(present[c]) if present[c] else np.array([], dtype=bool) for c in wanted}
+
+    if not aggs:
+        n = len(columns[select[0]]) if select else 0
+        return [{c: _python(columns[c][i]) for c in select} for i in range(n)]
+
+    n = len(next(iter(columns.values()))) if columns else 0
+    codes = np.zeros(n, dtype=np.int64)
+    labels: List[List[Any]] = []
+    for column in group_by:
+        uniques, inverse = _factorize(columns[column])
+        codes = codes * len(uniques) + inverse
+        labels.append(uniques)
+    group_codes, group_of = np.unique(codes, return_inverse=True)
+    order = np.argsort(group_of, kind="stable")
+    bounds = np.searchsorted(group_of[order], np.arange(len(group_codes) + 1))
+
+    results = []
+    for g, code in enumerate(group_codes.tolist()):
+        idx = order[bounds[g] : bounds[g + 1]]
+        key = []
+        for uniques in reversed(labels):
+            code, i = divmod(code, len(uniques))
+            key.append(uniques[i])
+        row: Dict[str, Any] = {c: _python(v) for c, v in zip(group_by, reversed(key))}
+        for spec, (func, column) in zip(aggs, agg_specs):
+            if column is None:
+                row[spec] = len(idx)
+            else:
+                row[spec] = _aggregate(func, columns[column][idx[has[column][idx]]])
+        results.append(row)
+    return results
+
+
+def _factorize(values: np.ndarray) -> Tuple[List[Any], np.ndarray]:
+    """Distinct values (sorted where comparable) and each row's index into them."""
+
+    try:
+        uniques, inverse = np.unique(values, return_inverse=True)
+        return uniques.tolist(), inverse.reshape(-1)
+    except TypeError:  # e.g. strings mixed with None
+        lookup: Dict[Any, int] = {}
+        inverse = np.array([lookup.setdefault(v, len(lookup)) for v in values.tolist()], dtype=np.int64)
+        return list(lookup), inverse
+
+
+def _python(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+# -- CLI --------------------------------------------------------------------
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Compact evidence logs into columnar files and query them.")
+    parser.add_argument("--root", type=Path, default=COLUMNAR_DIR, help="Columnar output directory")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("compact", help="Convert closed evidence days")
+    p.add_argument("--log-dir", type=Path, default=LOG_DIR)
+    p.add_argument("--before", type=date.fromisoformat, help="Only days before this date (default: today, UTC)")
+
+    p = sub.add_parser("query", help="Project, filter and aggregate columns")
+    p.add_argument("--type", dest="types", nargs="+", help="Event types to read (default: all)")
+    p.add_argument("--since", help="First day, YYYY-MM-DD")
+    p.add_argument("--until", help="Last day, YYYY-MM-DD")
+    p.add_argument("--select", nargs="+", default=[], help="Columns to print per row")
+    p.add_argument("--where", nargs="+", default=[], help="Filters such as payload.cached=false or payload.latency_ms>500")
+    p.add_argument("--group-by", nargs="+", default=[], help="Grouping columns; `date` and `week` are also available")
+    p.add_argument("--agg", nargs="+", default=[], help="count, or func:column (sum, mean, min, max, p50, p95, ...)")
+    p.add_argument("--limit", type=int, help="Print at most this many rows")
+
+    p = sub.add_parser("verify", help="Re-check the hash chain of a compacted day")
+    p.add_argument("--date", required=True)
+    args = parser.parse_args(argv)
+
+    if args.command == "compact":
+        for manifest in compact(args.log_dir, args.root, before=args.before):
+            print(json.dumps(manifest))
+    elif args.command == "query":
+        if not args.select and not args.agg:
+            parser.error("query needs --select or --agg")
+        try:
+            where = [parse_where(w) for w in args.where]
+            parts = partitions(args.root, event_types=args.types, since=args.since, until=args.until)
+            rows = query(parts, select=args.select, where=where, group_by=args.group_by, aggs=args.agg)
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+        for row in rows[: args.limit]:
+            sys.stdout.write(json.dumps(row, default=str) + "\n")
+    else:
+        try:
+            print(json.dumps({"date": args.date, "verified": verify(args.root, args.date)}))
+        except ValueError as exc:
+            raise SystemExit(f"{args.date}: {exc}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 from datetime import datetime
@@ -10,11 +11,25 @@ from typing import Any, Dict, List, Optional
 from fastapi import FastAPI, HTTPException
 from pydantic import BaseModel, Field
 
+from services.common.logging import get_logger
+from services.common.metrics import counter, histogram, instrument_app
+from services.common.rollups import RollupStore
+from services.common.tracing import TracingMiddleware
+
 
 LOG_DIR = Path(os.getenv("EVIDENCE_LOG_DIR", "data/logs"))
 LOG_DIR.mkdir(parents=True, exist_ok=True)
+ROLLUPS = RollupStore(Path(os.getenv("EVIDENCE_ROLLUP_DIR", "data/rollups")))
+
+logger = get_logger(__name__, service="evidence-logger")
 
 app = FastAPI(title="Local AI Factory - Evidence Logger")
+app.add_middleware(TracingMiddleware, service="evidence-logger")
+instrument_app(app)
+
+EVENTS_APPENDED = counter("factory_evidence_events_total", "Evidence events appended, by event type.", ["event_type"])
+APPEND_SECONDS = histogram("factory_evidence_append_seconds", "Time to hash-chain and append one batch.")
+ROLLUP_ERRORS = counter("factory_evidence_rollup_errors_total", "Batches whose hourly rollup update failed.")
 
 
 class EvidenceRecord(BaseModel):
@@ -119,8 +134,19 @@ async def log_events(batch: EvidenceBatch) -> Dict[str, Any]:
 
     now = datetime.utcnow()
 
-    for rec in batch.events:
-        _append_event(rec.data, ts=now)
+    with APPEND_SECONDS.time():
+        for rec in batch.events:
+            _append_event(rec.data, ts=now)
+            EVENTS_APPENDED.inc(event_type=rec.data.get("event_type", "unknown"))
+
+    # Rollups are derived data: a failure here must never lose the append, and the
+    # next successful catch-up (or the brief generator's) picks the lines up.
+    # It reads and rewrites files, so it runs off the event loop.
+    try:
+        await asyncio.to_thread(ROLLUPS.catch_up, LOG_DIR, files=[_log_path_for_date(now)])
+    except Exception:
+        ROLLUP_ERRORS.inc()
+        logger.exception("Failed to update evidence rollups")
 
     return {"status": "ok", "count": len(batch.events)}
 
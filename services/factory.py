@@ -0,0 +1,95 @@
+"""`factory`: one entry point for the batch tools.
+
+    python -m services.factory brief --hours 24
+    python -m services.factory --timings ingest
+
+Each subcommand lives in its own module and is imported only when it runs,
+so listing the commands or running a cheap one does not pay for pydantic,
+httpx, yaml or numpy. Arguments after the command name are passed to that
+module's `main(argv)` untouched; `factory <command> --help` shows them.
+
+`--timings` writes the import and run time of the command, and the
+third-party packages it pulled in, to stderr as JSON. For a per-module
+breakdown use `python -X importtime -m services.factory ...`.
+
+This module must import nothing beyond the standard library: a bare
+`python -m services.factory` is the cold-start budget documented in the
+runbook and checked by `tests/benchmarks/bench_startup.py`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+# command -> (module with `main(argv)`, one-line help)
+COMMANDS: Dict[str, Tuple[str, str]] = {
+    "ingest": ("services.ingestion.main", "Log an ingestion event for every file in the inbox"),
+    "index": ("services.indexer.main", "Index files into the vector and lexical indexes"),
+    "brief": ("services.briefs.briefs.main", "Write a brief from the hourly evidence rollups"),
+    "eval": ("tests.evaluation.run_eval", "Run an evaluation suite against the RAG API"),
+    "grade": ("services.eval.bulk_grade", "Grade answer events from the evidence logs"),
+    "evidence": ("services.evidence_logger.columnar", "Compact evidence logs into columnar files and query them"),
+}
+
+
+def _parser() -> argparse.ArgumentParser:
+    width = max(len(name) for name in COMMANDS)
+    listing = "\n".join(f"  {name:<{width}}  {help_}" for name, (_, help_) in COMMANDS.items())
+    parser = argparse.ArgumentParser(
+        prog="factory",
+        description="Local AI Factory batch tools.",
+        epilog=f"commands:\n{listing}",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--timings", action="store_true", help="Report import and run time to stderr")
+    parser.add_argument("command", nargs="?", choices=sorted(COMMANDS), metavar="command", help="One of the commands below")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments for the command")
+    return parser
+
+
+def _top_level(modules: Dict[str, object]) -> set:
+    return {name.partition(".")[0] for name in modules}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = _parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return
+
+    module_name, _ = COMMANDS[args.command]
+    before = _top_level(sys.modules)
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    imported = time.perf_counter()
+
+    # Let the command's own argparse usage read "factory <command>".
+    prog, sys.argv[0] = sys.argv[0], f"factory {args.command}"
+    try:
+        module.main(args.args)
+    finally:
+        sys.argv[0] = prog
+        if args.timings:
+            import json
+
+            report = {
+                "command": args.command,
+                "import_ms": round((imported - start) * 1000, 1),
+                "run_ms": round((time.perf_counter() - imported) * 1000, 1),
+                "packages": sorted(
+                    name
+                    for name in _top_level(sys.modules) - before - {"services", "tests"}
+                    if name not in sys.stdlib_module_names and not name.startswith("_")
+                ),
+            }
+            sys.stderr.write(json.dumps(report) + "\n")
+
+
+if __name__ == "__main__":
+    main()
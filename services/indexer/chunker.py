@@ -3,36 +3,69 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Iterable, List
 
+from services.common.tokens import count_tokens
+
 
 @dataclass
 class Chunk:
     text: str
     document_id: str
     index: int
+    # Leading characters repeated from the end of the previous chunk.
+    overlap_chars: int = 0
+
+
+def _overlap_tail(paragraphs: List[str], overlap_tokens: int, max_chars: int) -> List[str]:
+    """Trailing paragraphs worth at most `overlap_tokens` tokens / `max_chars` chars.
+
+    The first paragraph is never carried, so a chunk is never repeated whole.
+    """
+
+    tail: List[str] = []
+    tokens = 0
+    chars = 0
+    for p in reversed(paragraphs[1:]):
+        tokens += count_tokens(p)
+        chars += len(p) + 2
+        if tokens > overlap_tokens or chars > max_chars:
+            break
+        tail.insert(0, p)
+    return tail
 
 
-def chunk_text(text: str, *, document_id: str = "", max_chars: int = 4000, min_chars: int = 200) -> Iterable[Chunk]:
+def chunk_text(
+    text: str,
+    *,
+    document_id: str = "",
+    max_chars: int = 4000,
+    min_chars: int = 200,
+    overlap_tokens: int = 0,
+) -> Iterable[Chunk]:
     """Very simple size-based chunker placeholder.
 
     Real implementation should be header-aware and token-based; this version
-    ensures you have a usable interface for early RAG experiments.
+    ensures you have a usable interface for early RAG experiments. With
+    `overlap_tokens`, whole trailing paragraphs of each chunk are repeated
+    at the start of the next one; `Chunk.overlap_chars` records how much.
     """
 
     paragraphs: List[str] = [p.strip() for p in text.split("\n\n") if p.strip()]
     buf: List[str] = []
     buf_len = 0
     idx = 0
+    overlap_chars = 0
 
     for p in paragraphs:
         if buf_len + len(p) + 2 > max_chars and buf_len >= min_chars:
-            yield Chunk(text="\n\n".join(buf), document_id=document_id, index=idx)
+            yield Chunk(text="\n\n".join(buf), document_id=document_id, index=idx, overlap_chars=overlap_chars)
             idx += 1
-            buf = [p]
-            buf_len = len(p)
+            carry = _overlap_tail(buf, overlap_tokens, max_chars - len(p) - 2) if overlap_tokens else []
+            overlap_chars = len("\n\n".join(carry)) + 2 if carry else 0
+            buf = carry + [p]
+            buf_len = overlap_chars + len(p)
         else:
             buf.append(p)
             buf_len += len(p) + 2
 
     if buf:
-        yield Chunk(text="\n\n".join(buf), document_id=document_id, index=idx)
-      
+        yield Chunk(text="\n\n".join(buf), document_id=document_id, index=idx, overlap_chars=overlap_chars)
@@ -1,16 +1,70 @@
 from __future__ import annotations
 
+import hashlib
+import math
 from typing import List
 
 import httpx
 
+from services.common.config import model_name
+from services.common.lexical_index import tokenize
+from services.common.settings import get_settings
+from services.common.tracing import span, trace_headers
+
 
 class EmbeddingClient:
-    def __init__(self, base_url: str = "http://host.docker.internal:11434") -> None:
+    """Embeddings via Ollama's `/api/embed` endpoint (one request per batch)."""
+
+    def __init__(self, base_url: str = "http://host.docker.internal:11434", *, timeout: float = 60.0) -> None:
         self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
 
     def embed(self, texts: List[str], model: str) -> List[List[float]]:
-        # Placeholder for Ollama or other embedding provider.
-        # Real implementation will depend on the model API you choose.
-        raise NotImplementedError("EmbeddingClient.embed must be implemented for real RAG")
-      
+        if not texts:
+            return []
+        with span("embed", model=model, texts=len(texts)), httpx.Client(timeout=self.timeout) as client:
+            resp = client.post(
+                f"{self.base_url}/api/embed", json={"model": model, "input": texts}, headers=trace_headers()
+            )
+            resp.raise_for_status()
+            return resp.json()["embeddings"]
+
+
+class HashingEmbedder:
+    """Deterministic feature-hashing embedder for offline use, CI and benchmarks.
+
+    It captures lexical overlap only, but has the same interface as
+    `EmbeddingClient` and needs no model server.
+    """
+
+    def __init__(self, dim: int = 256) -> None:
+        self.dim = dim
+
+    def embed(self, texts: List[str], model: str = "hashing") -> List[List[float]]:
+        return [self._embed_one(t) for t in texts]
+
+    def _embed_one(self, text: str) -> List[float]:
+        vec = [0.0] * self.dim
+        for tok in tokenize(text):
+            digest = hashlib.blake2b(tok.encode("utf-8"), digest_size=8).digest()
+            h = int.from_bytes(digest, "little")
+            vec[h % self.dim] += 1.0 if (h >> 63) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+
+def get_embedder():
+    """Return the embedder selected by `FACTORY_EMBEDDING_BACKEND`."""
+
+    s = get_settings()
+    if s.embedding_backend == "hashing":
+        return HashingEmbedder()
+    return EmbeddingClient(s.ollama_url)
+
+
+def embedding_model_name() -> str:
+    """Name recorded with index entries for the active embedding backend."""
+
+    if get_settings().embedding_backend == "hashing":
+        return "hashing"
+    return model_name("embedding_model")
@@ -1,23 +1,184 @@
 from __future__ import annotations
 
+import argparse
+import os
 from pathlib import Path
+from typing import List, Optional, Tuple
 
+import httpx
+import yaml
+
+from services.common.config import load_config
 from services.common.events import IndexEvent, IndexPayload, IngestionEvent, make_event
+from services.common.lexical_index import LexicalIndex
+from services.common.settings import get_settings
+from services.common.tokens import count_tokens
+from services.common.tracing import span, trace_headers
+from services.common.vector_index import ChunkRecord, VectorIndex, chunk_id_for
+from services.indexer.chunker import chunk_text
+from services.indexer.embedder import embedding_model_name, get_embedder
+
+
+def open_indexes(root: Optional[Path] = None) -> Tuple[VectorIndex, LexicalIndex]:
+    """Open the vector and lexical indexes that live side by side under `root`."""
+
+    root = Path(root or get_settings().index_dir)
+    return VectorIndex(root / "vectors"), LexicalIndex(root / "lexical")
+
+
+def front_matter_tags(text: str) -> List[str]:
+    """Return `tags` from a leading YAML front-matter block, if any."""
+
+    if not text.startswith("---\n"):
+        return []
+    end = text.find("\n---", 4)
+    if end == -1:
+        return []
+    try:
+        meta = yaml.safe_load(text[4:end]) or {}
+    except yaml.YAMLError:
+        return []
+    tags = meta.get("tags") if isinstance(meta, dict) else None
+    if isinstance(tags, str):
+        tags = [tags]
+    return [str(t) for t in tags or []]
+
+
+def process_ingestion_event(
+    ev: IngestionEvent,
+    *,
+    embedder=None,
+    vectors: Optional[VectorIndex] = None,
+    lexical: Optional[LexicalIndex] = None,
+    force: bool = False,
+) -> Optional[IndexEvent]:
+    """Chunk, embed and index the ingested file, replacing any previous version.
+
+    The vector and lexical indexes are updated together so hybrid retrieval
+    always sees the same set of chunks in both. A file whose sha256 matches
+    the indexed copy is skipped and returns None (unless `force`), so its
+    document version, cached answers and eval fingerprints stay valid.
+    """
+
+    if vectors is None or lexical is None:
+        vectors, lexical = open_indexes()
+    document_id = ev.payload.file_path
+    if not force and vectors.document_sha256(document_id) == ev.payload.sha256:
+        return None
+    embedder = embedder or get_embedder()
+    embedding_model = embedding_model_name()
+    chunking = load_config("rag").get("chunking", {})
+
+    num_chunks = 0
+    try:
+        text = Path(document_id).read_text(encoding="utf-8")
+        chunks = list(
+            chunk_text(
+                text,
+                document_id=document_id,
+                max_chars=chunking.get("max_chunk_chars", 4000),
+                min_chars=chunking.get("min_chunk_chars", 200),
+                overlap_tokens=chunking.get("overlap_tokens", 0),
+            )
+        )
+        metadata = {
+            "mime_type": ev.payload.mime_type,
+            "sha256": ev.payload.sha256,
+            "source": ev.payload.source_host,
+            "tags": front_matter_tags(text),
+            "ingested_at": ev.timestamp.isoformat(),
+        }
+        records = [
+            ChunkRecord(
+                chunk_id=chunk_id_for(document_id, c.index),
+                document_id=document_id,
+                index=c.index,
+                text=c.text,
+                metadata=dict(metadata),
+                token_count=count_tokens(c.text),
+                overlap_chars=c.overlap_chars,
+                overlap_tokens=count_tokens(c.text[: c.overlap_chars]) if c.overlap_chars else 0,
+            )
+            for c in chunks
+        ]
+        embeddings = embedder.embed([r.text for r in records], embedding_model)
 
+        vectors.upsert_document(document_id, records, embeddings)
+        lexical.delete_prefix(f"{document_id}#")
+        for rec in records:
+            lexical.add(rec.chunk_id, rec.text)
+        lexical.commit()
+        num_chunks = len(records)
+    except Exception as exc:  # noqa: BLE001
+        payload = IndexPayload(
+            document_id=document_id,
+            num_chunks=num_chunks,
+            embedding_model=embedding_model,
+            status="error",
+            error_message=str(exc),
+        )
+        return IndexEvent(event_type="index", service="indexer", payload=payload)
 
-def process_ingestion_event(ev: IngestionEvent) -> IndexEvent:
-    # Placeholder: in real implementation you would read the file, chunk, embed, and persist.
     payload = IndexPayload(
-        document_id=ev.payload.file_path,
-        num_chunks=0,
-        embedding_model="nomic-embed-text",
+        document_id=document_id,
+        num_chunks=num_chunks,
+        embedding_model=embedding_model,
         status="success",
         error_message=None,
     )
     return IndexEvent(event_type="index", service="indexer", payload=payload)
 
 
+def send_events(events: List[IndexEvent], evidence_logger_url: str) -> None:
+    if not events:
+        return
+
+    batch = {"events": [{"data": make_event(ev, service="indexer")} for ev in events]}
+
+    with httpx.Client(timeout=10.0) as client:
+        resp = client.post(evidence_logger_url, json=batch, headers=trace_headers())
+        resp.raise_for_status()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    from services.ingestion.main import build_ingestion_event, discover_files
+
+    parser = argparse.ArgumentParser(description="Index files into the vector and lexical indexes.")
+    parser.add_argument("paths", nargs="*", help="Files to index (default: everything in the inbox)")
+    parser.add_argument(
+        "--evidence-logger-url",
+        default=os.getenv("FACTORY_EVIDENCE_LOGGER_URL", "http://evidence-logger:9000/events"),
+    )
+    parser.add_argument(
+        "--rag-cache-url",
+        default=os.getenv("FACTORY_RAG_CACHE_URL", ""),
+        help="RAG API /rag/cache/invalidate endpoint to notify of re-indexed documents (optional)",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="Re-index files even when their content is unchanged (e.g. new model)"
+    )
+    args = parser.parse_args(argv)
+
+    paths = [Path(p) for p in args.paths] or discover_files()
+    with span("index-run", service="indexer", files=len(paths)):
+        vectors, lexical = open_indexes()
+        embedder = get_embedder()
+        events = []
+        for p in paths:
+            event = process_ingestion_event(
+                build_ingestion_event(p), embedder=embedder, vectors=vectors, lexical=lexical, force=args.force
+            )
+            if event is not None:
+                events.append(event)
+        send_events(events, args.evidence_logger_url)
+        if args.rag_cache_url:
+            # Best effort: the RAG API also checks cited document versions on
+            # every cache hit, so a missed notification only delays eviction.
+            try:
+                send_events(events, args.rag_cache_url)
+            except httpx.HTTPError:
+                pass
+
+
 if __name__ == "__main__":
-    # Placeholder entrypoint for manual testing later.
-    print("Indexer stub - no runtime behavior yet.")
-  
+    main()
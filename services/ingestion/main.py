@@ -1,17 +1,19 @@
 from __future__ import annotations
 
+import argparse
 import hashlib
 import os
+from functools import lru_cache
 from pathlib import Path
-from typing import List
+from typing import List, Optional
 
-import httpx
 from pydantic_settings import BaseSettings
 
 from services.common.events import (
+    EventEncoder,
     IngestionEvent,
     IngestionPayload,
-    make_event,
+    batch_body,
 )
 
 
@@ -32,7 +34,9 @@ class Settings(BaseSettings):
         env_prefix = "FACTORY_"
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    return Settings()
 
 
 def _sha256_file(path: Path) -> str:
@@ -44,47 +48,62 @@ def _sha256_file(path: Path) -> str:
 
 
 def discover_files() -> List[Path]:
-    settings.inbox_dir.mkdir(parents=True, exist_ok=True)
+    inbox_dir = get_settings().inbox_dir
+    inbox_dir.mkdir(parents=True, exist_ok=True)
     return [
         p
-        for p in settings.inbox_dir.iterdir()
+        for p in inbox_dir.iterdir()
         if p.is_file() and p.suffix.lower() in {".md", ".txt"}
     ]
 
 
-def build_ingestion_event(path: Path) -> IngestionEvent:
+def build_ingestion_payload(path: Path) -> IngestionPayload:
     stat = path.stat()
-    payload = IngestionPayload(
+    return IngestionPayload(
         file_path=str(path),
         size_bytes=stat.st_size,
         mime_type="text/markdown" if path.suffix.lower() == ".md" else "text/plain",
         sha256=_sha256_file(path),
         source_host=os.uname().nodename,
     )
+
+
+def build_ingestion_event(path: Path) -> IngestionEvent:
     return IngestionEvent(
         event_type="ingestion",
-        service=settings.service_name,
-        payload=payload,
+        service=get_settings().service_name,
+        payload=build_ingestion_payload(path),
     )
 
 
-def send_events(events: List[IngestionEvent]) -> None:
+def send_events(events: List[bytes]) -> None:
+    """Post events already encoded with `EventEncoder` to the Evidence Logger."""
+
     if not events:
         return
-
-    batch = {"events": [{"data": make_event(ev, service=settings.service_name)} for ev in events]}
+    import httpx  # only runs that found files pay for the client
 
     with httpx.Client(timeout=10.0) as client:
-        resp = client.post(settings.evidence_logger_url, json=batch)
+        resp = client.post(
+            get_settings().evidence_logger_url,
+            content=batch_body(events),
+            headers={"content-type": "application/json"},
+        )
         resp.raise_for_status()
 
 
 def run_once() -> None:
     files = discover_files()
-    events = [build_ingestion_event(p) for p in files]
-    send_events(events)
+    encoder = EventEncoder(IngestionEvent, service=get_settings().service_name)
+    send_events(encoder.encode_many(build_ingestion_payload(p) for p in files))
 
 
-if __name__ == "__main__":
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Log an ingestion event for every file in the inbox.")
+    parser.parse_args(argv)
     run_once()
+
+
+if __name__ == "__main__":
+    main()
     
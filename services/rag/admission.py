@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Literal, Optional, Tuple, TypeVar
+
+from services.common.metrics import counter, histogram
+
+
+T = TypeVar("T")
+
+Priority = Literal["interactive", "eval", "brief"]
+
+# Lower rank is admitted first.
+PRIORITY_RANK: Dict[str, int] = {"interactive": 0, "eval": 1, "brief": 2}
+
+QUEUE_WAIT = histogram("factory_rag_admission_wait_seconds", "Time spent queued for a generation slot.", ["priority"])
+REJECTED = counter(
+    "factory_rag_admission_rejected_total",
+    "Requests refused a generation slot (full = rejected on arrival, shed = displaced while queued).",
+    ["priority", "reason"],
+)
+
+
+class QueueFull(Exception):
+    """Raised when a request cannot be queued; `retry_after` is in seconds."""
+
+    def __init__(self, retry_after: int) -> None:
+        super().__init__(f"admission queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass(order=True)
+class _Waiter:
+    rank: int
+    seq: int
+    future: asyncio.Future = field(compare=False)
+    priority: str = field(compare=False)
+    enqueued_at: float = field(compare=False)
+
+
+class Lease:
+    """A granted slot, released exactly once whichever path ends the request."""
+
+    def __init__(self, controller: "AdmissionController", waited: float) -> None:
+        self.controller = controller
+        self.waited = waited
+        self.acquired_at = controller.clock()
+        self.released = False
+
+    def release(self) -> float:
+        """Give the slot back and return how long it was held; later calls only return the time."""
+
+        held = self.controller.clock() - self.acquired_at
+        if not self.released:
+            self.released = True
+            self.controller.release(held)
+        return held
+
+
+@dataclass
+class AdmissionStats:
+    admitted: int = 0
+    rejected: int = 0
+    shed: int = 0
+    wait_seconds_total: float = 0.0
+    wait_seconds_max: float = 0.0
+
+
+class AdmissionController:
+    """Priority queue in front of the generation model.
+
+    At most `max_concurrency` holders run at once. Others wait in priority
+    order (interactive, then eval, then brief; FIFO within a class). When
+    `max_queue` requests are already waiting, a new request displaces the
+    newest waiter of a strictly lower priority, or is rejected with
+    `QueueFull` so callers can shed load quickly.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 2,
+        max_queue: int = 32,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.clock = clock
+        self.stats = AdmissionStats()
+        self.active = 0
+        self._queue: List[_Waiter] = []
+        self._seq = itertools.count()
+        # Smoothed time a holder keeps its slot; drives Retry-After.
+        self._service_seconds = 1.0
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any]) -> "AdmissionController":
+        return cls(max_concurrency=cfg.get("max_concurrency", 2), max_queue=cfg.get("max_queue", 32))
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def depth_by_priority(self) -> Dict[str, int]:
+        depth = {p: 0 for p in PRIORITY_RANK}
+        for w in self._queue:
+            depth[w.priority] += 1
+        return depth
+
+    def retry_after(self) -> int:
+        backlog = (self.depth + 1) * self._service_seconds / max(self.max_concurrency, 1)
+        return max(1, math.ceil(backlog))
+
+    async def acquire(self, priority: str = "interactive") -> float:
+        """Wait for a slot and return the seconds spent queued."""
+
+        rank = PRIORITY_RANK[priority]
+        if self.active < self.max_concurrency and not self._queue:
+            self.active += 1
+            self._admitted(priority, 0.0)
+            return 0.0
+
+        if len(self._queue) >= self.max_queue:
+            worst = max(self._queue, default=None)
+            if worst is None or worst.rank <= rank:
+                self.stats.rejected += 1
+                REJECTED.inc(priority=priority, reason="full")
+                raise QueueFull(self.retry_after())
+            self._queue.remove(worst)
+            heapq.heapify(self._queue)
+            # Counted here only; the displaced waiter's QueueFull is not a second rejection.
+            self.stats.shed += 1
+            REJECTED.inc(priority=worst.priority, reason="shed")
+            worst.future.set_exception(QueueFull(self.retry_after()))
+
+        waiter = _Waiter(rank, next(self._seq), asyncio.get_running_loop().create_future(), priority, self.clock())
+        heapq.heappush(self._queue, waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # The slot was handed over just as we were cancelled.
+                self.release()
+            elif waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+            raise
+
+        waited = self.clock() - waiter.enqueued_at
+        self._admitted(priority, waited)
+        return waited
+
+    def release(self, held_seconds: Optional[float] = None) -> None:
+        if held_seconds is not None:
+            self._service_seconds = 0.8 * self._service_seconds + 0.2 * held_seconds
+        while self._queue:
+            waiter = heapq.heappop(self._queue)
+            if not waiter.future.done():
+                # Hand the slot straight to the next waiter; `active` is unchanged.
+                waiter.future.set_result(None)
+                return
+        self.active -= 1
+
+    async def lease(self, priority: str = "interactive") -> Lease:
+        """`acquire` for holders whose slot outlives one block, such as a streamed response."""
+
+        return Lease(self, await self.acquire(priority))
+
+    @asynccontextmanager
+    async def slot(self, priority: str = "interactive") -> AsyncIterator[float]:
+        lease = await self.lease(priority)
+        try:
+            yield lease.waited
+        finally:
+            lease.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        s = self.stats
+        return {
+            "in_flight": self.active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.depth,
+            "queue_depth_by_priority": self.depth_by_priority(),
+            "max_queue": self.max_queue,
+            "admitted": s.admitted,
+            "rejected": s.rejected,
+            "shed": s.shed,
+            "wait_ms_avg": round(1000 * s.wait_seconds_total / s.admitted, 1) if s.admitted else 0.0,
+            "wait_ms_max": round(1000 * s.wait_seconds_max, 1),
+        }
+
+    def _admitted(self, priority: str, waited: float) -> None:
+        QUEUE_WAIT.labels(priority=priority).observe(waited)
+        self.stats.admitted += 1
+        self.stats.wait_seconds_total += waited
+        self.stats.wait_seconds_max = max(self.stats.wait_seconds_max, waited)
+
+
+class SingleFlight:
+    """Share one in-flight call among concurrent callers with the same key.
+
+    The call runs as its own task, so a caller that disconnects does not
+    cancel the work for the others.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> Tuple[T, bool]:
+        """Return `(result, shared)`; `shared` is True when joining an existing call."""
+
+        task = self._flights.get(key)
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
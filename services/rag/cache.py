@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+
+_WS_RE = re.compile(r"\s+")
+
+
+def normalise_question(question: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+
+    return _WS_RE.sub(" ", question).strip().lower().rstrip("?!. ")
+
+
+def _digest(data: Any) -> str:
+    raw = json.dumps(data, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedAnswer:
+    answer: str
+    citations: List[Dict[str, Any]]
+    meta: Dict[str, Any]
+    # Document versions the answer was generated from; a hit is only served
+    # while every cited document is still at the same version.
+    doc_versions: Dict[str, Optional[int]] = field(default_factory=dict)
+    embedding: Optional[np.ndarray] = None
+    scope: str = ""
+    key: str = ""
+    created_at: float = 0.0
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+
+
+class AnswerCache:
+    """Bounded LRU + TTL cache of generated answers.
+
+    Entries are keyed on the normalised question plus a *scope* (filters,
+    retrieval settings, model and index version). Within a scope, an
+    optional near-duplicate lookup matches question embeddings whose cosine
+    similarity reaches `semantic_threshold`. Entries are dropped when an
+    index change touches one of the documents they cite.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+        semantic_threshold: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.semantic_threshold = semantic_threshold
+        self.clock = clock
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._by_doc: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any]) -> "AnswerCache":
+        return cls(
+            max_entries=cfg.get("max_entries", 1024),
+            ttl_seconds=cfg.get("ttl_seconds", 3600),
+            semantic_threshold=cfg.get("semantic_threshold"),
+        )
+
+    @staticmethod
+    def scope_for(**parts: Any) -> str:
+        """Hash of everything besides the question that changes the answer."""
+
+        return _digest(parts)
+
+    @staticmethod
+    def key_for(question: str, scope: str) -> str:
+        return _digest({"q": normalise_question(question), "scope": scope})
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CachedAnswer]:
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry
+
+    def find_similar(self, embedding: Sequence[float], scope: str) -> Optional[CachedAnswer]:
+        """Best entry in `scope` whose question embedding clears the threshold."""
+
+        if self.semantic_threshold is None:
+            return None
+        q = np.asarray(embedding, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        with self._lock:
+            best_key, best_score = None, self.semantic_threshold
+            for key in list(self._entries):
+                entry = self._live(key)
+                if entry is None or entry.scope != scope or entry.embedding is None:
+                    continue
+                score = float(entry.embedding @ q)
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            self.stats.semantic_hits += 1
+            return self._entries[best_key]
+
+    def put(self, key: str, entry: CachedAnswer) -> None:
+        if entry.embedding is not None:
+            emb = np.asarray(entry.embedding, dtype=np.float32)
+            entry.embedding = emb / (np.linalg.norm(emb) or 1.0)
+        entry.key = key
+        entry.created_at = self.clock()
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = entry
+            for doc_id in entry.doc_versions:
+                self._by_doc.setdefault(doc_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats.evictions += 1
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def invalidate_documents(self, doc_ids: Iterable[str]) -> int:
+        """Drop every entry citing one of `doc_ids`; returns how many were dropped."""
+
+        dropped = 0
+        with self._lock:
+            for doc_id in doc_ids:
+                for key in list(self._by_doc.get(doc_id, ())):
+                    if self._remove(key):
+                        dropped += 1
+            self.stats.invalidations += dropped
+        return dropped
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_doc.clear()
+
+    def _live(self, key: str) -> Optional[CachedAnswer]:
+        entry = self._entries.get(key)
+        if entry is not None and self.clock() - entry.created_at > self.ttl_seconds:
+            self._remove(key)
+            self.stats.evictions += 1
+            return None
+        return entry
+
+    def _remove(self, key: str) -> bool:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        for doc_id in entry.doc_versions:
+            keys = self._by_doc.get(doc_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_doc[doc_id]
+        return True
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Literal, Sequence, Set, Tuple
+
+import numpy as np
+
+from services.common.tokens import count_tokens
+from services.rag.retrieval import RetrievedChunk
+
+
+PackingStrategy = Literal["greedy", "optimal"]
+
+# Tokens spent on the "[n]" label line in front of each context block.
+LABEL_TOKENS = 4
+
+USER_TEMPLATE = "Context:\n{context}\n\nQuestion: {question}"
+CITE_INSTRUCTION = "\n\nCite the context blocks you rely on by their [n] labels."
+
+
+@dataclass
+class PackedContext:
+    """Chunks selected for the prompt, in prompt order, with overlap trimmed.
+
+    Documents come in order of their best chunk's score, and each
+    document's chunks in document order, so a trimmed chunk always directly
+    follows the chunk it overlaps.
+    """
+
+    chunks: List[RetrievedChunk] = field(default_factory=list)
+    texts: List[str] = field(default_factory=list)
+    tokens: int = 0
+    budget: int = 0
+    duplicates: int = 0
+    over_budget: int = 0
+
+
+def _key(chunk: RetrievedChunk) -> Tuple[str, int]:
+    return chunk.doc_id, chunk.index
+
+
+def _dedupe(chunks: Sequence[RetrievedChunk]) -> Tuple[List[RetrievedChunk], int]:
+    """Drop chunks whose text is identical to a better-scored one."""
+
+    seen: Set[str] = set()
+    kept: List[RetrievedChunk] = []
+    for c in sorted(chunks, key=lambda c: -c.score):
+        if c.text in seen:
+            continue
+        seen.add(c.text)
+        kept.append(c)
+    return kept, len(chunks) - len(kept)
+
+
+def _packed_cost(chunk: RetrievedChunk, selected: Dict[Tuple[str, int], RetrievedChunk]) -> int:
+    cost = chunk.token_count + LABEL_TOKENS
+    if (chunk.doc_id, chunk.index - 1) in selected:
+        cost -= chunk.overlap_tokens
+    return cost
+
+
+def _marginal_cost(chunk: RetrievedChunk, selected: Dict[Tuple[str, int], RetrievedChunk]) -> int:
+    """Tokens added by `chunk` given what is already packed.
+
+    A chunk's overlapping prefix is free when its predecessor is packed, and
+    likewise its successor's prefix becomes free once it is packed.
+    """
+
+    cost = chunk.token_count + LABEL_TOKENS
+    if (chunk.doc_id, chunk.index - 1) in selected:
+        cost -= chunk.overlap_tokens
+    nxt = selected.get((chunk.doc_id, chunk.index + 1))
+    if nxt is not None:
+        cost -= nxt.overlap_tokens
+    return cost
+
+
+def _greedy(candidates: List[RetrievedChunk], budget: int, selected: Dict[Tuple[str, int], RetrievedChunk]) -> int:
+    used = sum(_packed_cost(c, selected) for c in selected.values())
+    for c in candidates:
+        if _key(c) in selected:
+            continue
+        cost = _marginal_cost(c, selected)
+        if used + cost <= budget:
+            selected[_key(c)] = c
+            used += cost
+    return used
+
+
+def _knapsack(candidates: List[RetrievedChunk], budget: int) -> Dict[Tuple[str, int], RetrievedChunk]:
+    """0/1 knapsack maximising total score under full (untrimmed) token costs."""
+
+    weights = [c.token_count + LABEL_TOKENS for c in candidates]
+    best = np.zeros(budget + 1)
+    take = np.zeros((len(candidates), budget + 1), dtype=bool)
+    for i, (c, w) in enumerate(zip(candidates, weights)):
+        if w > budget:
+            continue
+        with_item = best[: budget + 1 - w] + c.score
+        improved = with_item > best[w:]
+        take[i, w:] = improved
+        best[w:] = np.where(improved, with_item, best[w:])
+
+    selected: Dict[Tuple[str, int], RetrievedChunk] = {}
+    cap = budget
+    for i in range(len(candidates) - 1, -1, -1):
+        if take[i, cap]:
+            selected[_key(candidates[i])] = candidates[i]
+            cap -= weights[i]
+    return selected
+
+
+def pack_context(
+    chunks: Sequence[RetrievedChunk],
+    *,
+    budget: int,
+    strategy: PackingStrategy = "greedy",
+) -> PackedContext:
+    """Select chunks that fit in `budget` tokens using precomputed token counts.
+
+    `greedy` takes chunks by descending score while they fit; `optimal`
+    solves the 0/1 knapsack for maximum total score and then tops up with
+    tokens freed by overlap trimming. Adjacent chunks of the same document
+    share their overlapping text only once.
+    """
+
+    candidates, duplicates = _dedupe(chunks)
+    budget = max(budget, 0)
+
+    if strategy == "optimal":
+        selected = _knapsack(candidates, budget)
+    else:
+        selected = {}
+    used = _greedy(candidates, budget, selected)
+
+    kept = [c for c in candidates if _key(c) in selected]
+    packed = PackedContext(budget=budget, tokens=used, duplicates=duplicates, over_budget=len(candidates) - len(kept))
+    doc_rank: Dict[str, int] = {}
+    for c in kept:
+        doc_rank.setdefault(c.doc_id, len(doc_rank))
+    for c in sorted(kept, key=lambda c: (doc_rank[c.doc_id], c.index)):
+        text = c.text
+        if c.overlap_chars and (c.doc_id, c.index - 1) in selected:
+            text = text[c.overlap_chars :]
+        packed.chunks.append(c)
+        packed.texts.append(text)
+    return packed
+
+
+def context_budget(question: str, rag_cfg: Dict[str, Any]) -> int:
+    """Tokens left for context blocks after the system prompt and question."""
+
+    retrieval = rag_cfg.get("retrieval", {}) or {}
+    prompt = rag_cfg.get("prompt", {}) or {}
+    fixed = count_tokens(prompt.get("system_role", "")) + count_tokens(USER_TEMPLATE + CITE_INSTRUCTION)
+    return retrieval.get("max_context_tokens", 2800) - fixed - count_tokens(question)
+
+
+def build_prompt(question: str, packed: PackedContext, rag_cfg: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Chat messages for the generation model from the `prompt` section of `config/rag.yaml`."""
+
+    prompt = rag_cfg.get("prompt", {}) or {}
+    context = "\n\n".join(f"[{i}]\n{text}" for i, text in enumerate(packed.texts, start=1))
+    user = USER_TEMPLATE.format(context=context or "(no context found)", question=question)
+    if prompt.get("require_citations", True):
+        user += CITE_INSTRUCTION
+    return [
+        {"role": "system", "content": prompt.get("system_role", "").strip()},
+        {"role": "user", "content": user},
+    ]
+
+
+def prompt_hash(rag_cfg: Dict[str, Any]) -> str:
+    """Short digest of everything `build_prompt` adds around the context and question."""
+
+    prompt = rag_cfg.get("prompt", {}) or {}
+    template = USER_TEMPLATE + (CITE_INSTRUCTION if prompt.get("require_citations", True) else "")
+    material = "\0".join([prompt.get("system_role", "").strip(), template])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+def assemble_context(
+    question: str,
+    chunks: Sequence[RetrievedChunk],
+    rag_cfg: Dict[str, Any],
+) -> Tuple[PackedContext, List[Dict[str, str]]]:
+    strategy = (rag_cfg.get("retrieval", {}) or {}).get("packing_strategy", "greedy")
+    packed = pack_context(chunks, budget=context_budget(question, rag_cfg), strategy=strategy)
+    return packed, build_prompt(question, packed, rag_cfg)
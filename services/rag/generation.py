@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import json
+from typing import AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from services.common.config import model_name
+from services.common.settings import get_settings
+from services.common.tracing import trace_headers
+
+
+Messages = List[Dict[str, str]]
+
+STUB_ANSWER = (
+    "This is a stubbed RAG answer. The real implementation will retrieve "
+    "supporting context from the vector store and generate an evidence-"
+    "backed response."
+)
+
+
+class StubGenerator:
+    """Returns the fixed Phase 4 answer, streamed word by word."""
+
+    model_name = "stub-model"
+    backend = "stub"
+
+    async def stream(self, messages: Messages, *, max_tokens: int) -> AsyncIterator[str]:
+        words = STUB_ANSWER.split(" ")
+        for i, word in enumerate(words):
+            yield word if i == len(words) - 1 else word + " "
+
+    async def generate(self, messages: Messages, *, max_tokens: int) -> str:
+        return STUB_ANSWER
+
+
+class OllamaGenerator:
+    """Chat completions via Ollama's `/api/chat`, streamed as NDJSON."""
+
+    backend = "ollama"
+
+    def __init__(
+        self,
+        base_url: str,
+        model: str,
+        *,
+        timeout: float = 60.0,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.model_name = model
+        self.timeout = timeout
+        self.transport = transport
+
+    def _client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url, timeout=self.timeout, transport=self.transport, headers=trace_headers()
+        )
+
+    def _body(self, messages: Messages, *, max_tokens: int, stream: bool) -> Dict[str, object]:
+        return {
+            "model": self.model_name,
+            "messages": messages,
+            "stream": stream,
+            "options": {"num_predict": max_tokens},
+        }
+
+    async def stream(self, messages: Messages, *, max_tokens: int) -> AsyncIterator[str]:
+        async with self._client() as client:
+            async with client.stream("POST", "/api/chat", json=self._body(messages, max_tokens=max_tokens, stream=True)) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line.strip():
+                        continue
+                    chunk = json.loads(line)
+                    if chunk.get("error"):
+                        raise RuntimeError(chunk["error"])
+                    text = chunk.get("message", {}).get("content", "")
+                    if text:
+                        yield text
+                    if chunk.get("done"):
+                        return
+
+    async def generate(self, messages: Messages, *, max_tokens: int) -> str:
+        async with self._client() as client:
+            resp = await client.post("/api/chat", json=self._body(messages, max_tokens=max_tokens, stream=False))
+            resp.raise_for_status()
+            return resp.json()["message"]["content"]
+
+
+def get_generator():
+    """Return the generator selected by `FACTORY_GENERATION_BACKEND` (stub | ollama)."""
+
+    s = get_settings()
+    if s.generation_backend == "ollama":
+        return OllamaGenerator(s.ollama_url, model_name("chat_model"))
+    return StubGenerator()
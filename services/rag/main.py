@@ -1,19 +1,52 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Any, Dict, List, Optional
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import httpx
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, BaseSettings, Field
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+from pydantic import BaseModel, Field
+from pydantic_settings import BaseSettings
 
 from services.common.events import (
     AnswerEvent,
     AnswerPayload,
+    IndexEvent,
     QueryEvent,
     QueryPayload,
     make_event,
 )
+from services.common.config import load_config
+from services.common.metrics import (
+    collect_stages,
+    counter,
+    gauge,
+    instrument_app,
+    record_stage,
+    stage,
+    stages_ms,
+)
+from services.common.tracing import TracingMiddleware, trace_headers
+from services.rag.admission import AdmissionController, Lease, Priority, QueueFull, SingleFlight
+from services.rag.cache import AnswerCache, CachedAnswer
+from services.rag.context import PackedContext, assemble_context, prompt_hash
+from services.rag.generation import Messages, get_generator
+from services.rag.retrieval import (
+    BatchQuery,
+    RetrievalMode,
+    RetrievedChunk,
+    build_filter,
+    document_versions,
+    embed_question,
+    index_version,
+    retrieve,
+    retrieve_batch,
+)
 
 
 class Settings(BaseSettings):
@@ -28,18 +61,39 @@ class Settings(BaseSettings):
 
 
 settings = Settings()
-app = FastAPI(title="Local AI Factory - RAG API (Stub)")
+generator = get_generator()
+answer_cache = AnswerCache.from_config(load_config("rag").get("cache", {}) or {})
+admission = AdmissionController.from_config(load_config("rag").get("admission", {}) or {})
+flights = SingleFlight()
+app = FastAPI(title="Local AI Factory - RAG API")
+app.add_middleware(TracingMiddleware, service=settings.service_name)
+instrument_app(app)
+
+CACHE_LOOKUPS = counter("factory_rag_cache_lookups_total", "Answer cache lookups by result.", ["result"])
+COALESCED = counter("factory_rag_coalesced_total", "Requests that joined an identical in-flight request.")
+gauge("factory_rag_cache_entries", "Answers held in the answer cache.").set_function(lambda: len(answer_cache))
+gauge("factory_rag_admission_in_flight", "Generations holding an admission slot.").set_function(
+    lambda: admission.active
+)
+gauge("factory_rag_admission_queue_depth", "Requests waiting for a generation slot.", ["priority"]).set_function(
+    lambda: {(p,): n for p, n in admission.depth_by_priority().items()}
+)
 
 
 class RAGQueryRequest(BaseModel):
     question: str
     filters: Optional[Dict[str, Any]] = None
+    top_k: Optional[int] = Field(default=None, ge=1, le=100)
+    retrieval_mode: RetrievalMode = "hybrid"
+    # Admission class: interactive requests are served before eval and brief runs.
+    priority: Priority = "interactive"
 
 
 class Citation(BaseModel):
     doc_id: str
     chunk_id: str
     score: float
+    doc_version: Optional[int] = None  # index version of the document the chunk was read from
 
 
 class RAGQueryResponse(BaseModel):
@@ -48,10 +102,35 @@ class RAGQueryResponse(BaseModel):
     meta: Dict[str, Any] = {}
 
 
-def _emit_events(question: str, answer: str, citations: List[Citation], *, latency_ms: int) -> None:
-    """Emit QueryEvent and AnswerEvent to the Evidence Logger."""
+class RAGBatchRequest(BaseModel):
+    queries: List[RAGQueryRequest] = Field(min_length=1, max_length=1000)
+
+
+class RAGBatchItem(BaseModel):
+    status: int = 200
+    result: Optional[RAGQueryResponse] = None
+    error: Optional[str] = None
+
 
-    query_payload = QueryPayload(question=question, filters=None, user_id=None, query_embedding_id=None)
+class RAGBatchResponse(BaseModel):
+    results: List[RAGBatchItem]
+    meta: Dict[str, Any] = {}
+
+
+def _answer_events(
+    question: str,
+    answer: str,
+    citations: List[Citation],
+    *,
+    latency_ms: int,
+    filters: Optional[Dict[str, Any]] = None,
+    ttft_ms: Optional[int] = None,
+    cached: bool = False,
+    stage_ms: Optional[Dict[str, float]] = None,
+) -> List[Dict[str, Any]]:
+    """Build the QueryEvent / AnswerEvent pair for one answered question."""
+
+    query_payload = QueryPayload(question=question, filters=filters, user_id=None, query_embedding_id=None)
     query_event = QueryEvent(event_type="query", service=settings.service_name, payload=query_payload)
 
     answer_payload = AnswerPayload(
@@ -59,67 +138,652 @@ def _emit_events(question: str, answer: str, citations: List[Citation], *, laten
         answer=answer,
         citations=[c.model_dump() for c in citations],
         latency_ms=latency_ms,
-        model_name="stub-model",
+        model_name=generator.model_name,
         abstained=False,
+        ttft_ms=ttft_ms,
+        cached=cached,
+        stage_ms=stage_ms or {},
     )
     answer_event = AnswerEvent(event_type="answer", service=settings.service_name, payload=answer_payload)
 
-    batch = {
-        "events": [
-            {"data": make_event(query_event, service=settings.service_name)},
-            {"data": make_event(answer_event, service=settings.service_name)},
-        ]
-    }
+    return [
+        {"data": make_event(query_event, service=settings.service_name)},
+        {"data": make_event(answer_event, service=settings.service_name)},
+    ]
 
+
+def _post_events(events: List[Dict[str, Any]]) -> None:
     with httpx.Client(timeout=5.0) as client:
-        resp = client.post(settings.evidence_logger_url, json=batch)
+        resp = client.post(settings.evidence_logger_url, json={"events": events}, headers=trace_headers())
         resp.raise_for_status()
 
 
-@app.post("/rag/query", response_model=RAGQueryResponse)
-async def rag_query(req: RAGQueryRequest) -> RAGQueryResponse:
-    """Stub RAG endpoint.
+def _emit_events(question: str, answer: str, citations: List[Citation], **kwargs: Any) -> None:
+    """Emit QueryEvent and AnswerEvent to the Evidence Logger."""
 
-    For Phase 4, returns a static answer with dummy citations but enforces the
-    final contract and emits evidence events.
-    """
+    _post_events(_answer_events(question, answer, citations, **kwargs))
+
+
+class InvalidationBatch(BaseModel):
+    events: List[Dict[str, Any]]
+
+
+@dataclass
+class CacheLookup:
+    key: str
+    scope: str
+    enabled: bool = True
+    hit: Optional[CachedAnswer] = None
+    embedding: Optional[List[float]] = None
+
+
+@dataclass
+class Generated:
+    packed: PackedContext
+    answer: str
+    versions: Dict[str, Optional[int]]
+    queue_wait_ms: int
+    stages: Dict[str, float] = field(default_factory=dict)
+
+
+def _elapsed_ms(start: float) -> int:
+    return int((time.perf_counter() - start) * 1000)
 
+
+def _validate(req: RAGQueryRequest) -> None:
     if not req.question.strip():
         raise HTTPException(status_code=400, detail="Question must not be empty")
+    try:
+        build_filter(req.filters, load_config("rag"))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid filters: {exc}") from exc
 
-    start = datetime.utcnow()
 
-    # Static answer for now; later phases will call real retrieval + LLM.
-    answer = (
-        "This is a stubbed RAG answer. The real implementation will retrieve "
-        "supporting context from the vector store and generate an evidence-" 
-        "backed response."
+def _cache_key(req: RAGQueryRequest, index: str) -> CacheLookup:
+    scope = AnswerCache.scope_for(
+        filters=req.filters or {},
+        top_k=req.top_k,
+        retrieval_mode=req.retrieval_mode,
+        model=generator.model_name,
+        prompt=prompt_hash(load_config("rag")),
+        index=index,
     )
-    citations = [
-        Citation(doc_id="stub-doc", chunk_id="stub-chunk", score=1.0),
-    ]
+    enabled = (load_config("rag").get("cache", {}) or {}).get("enabled", True)
+    return CacheLookup(key=AnswerCache.key_for(req.question, scope), scope=scope, enabled=enabled)
+
+
+def _is_current(hit: CachedAnswer, versions: Dict[str, Optional[int]]) -> bool:
+    return all(versions.get(doc_id) == version for doc_id, version in hit.doc_versions.items())
+
 
-    end = datetime.utcnow()
-    latency_ms = int((end - start).total_seconds() * 1000)
+async def _cache_lookup(req: RAGQueryRequest) -> CacheLookup:
+    """Key `req` and find a reusable answer for it in the answer cache.
+
+    A hit is only returned while every document it cites is still at the
+    version the answer was generated from, so updates made by an indexer
+    that never called `/rag/cache/invalidate` are still caught. The key is
+    also used to coalesce identical in-flight requests.
+    """
+
+    lookup = _cache_key(req, await asyncio.to_thread(index_version))
+    if not lookup.enabled:
+        return lookup
+
+    result = "hit"
+    with stage("cache"):
+        hit = answer_cache.get(lookup.key)
+    if hit is None and answer_cache.semantic_threshold is not None:
+        try:
+            lookup.embedding = await embed_question(req.question)
+        except Exception:  # noqa: BLE001 - a cache lookup must never fail the query
+            CACHE_LOOKUPS.inc(result="miss")
+            return lookup
+        with stage("cache"):
+            hit = answer_cache.find_similar(lookup.embedding, lookup.scope)
+        result = "semantic_hit"
+    if hit is not None and not _is_current(hit, await asyncio.to_thread(document_versions, list(hit.doc_versions))):
+        answer_cache.discard(hit.key)
+        hit, result = None, "stale"
+    CACHE_LOOKUPS.inc(result=result if hit is not None or result == "stale" else "miss")
+    lookup.hit = hit
+    return lookup
+
+
+async def _cache_lookup_batch(reqs: Dict[int, RAGQueryRequest]) -> Dict[int, CacheLookup]:
+    """Exact-match `_cache_lookup` for many requests against one read of the index versions."""
+
+    index = await asyncio.to_thread(index_version)
+    lookups = {i: _cache_key(req, index) for i, req in reqs.items()}
+    found: Dict[int, CachedAnswer] = {}
+    with stage("cache"):
+        for i, lookup in lookups.items():
+            hit = answer_cache.get(lookup.key) if lookup.enabled else None
+            if hit is not None:
+                found[i] = hit
+            elif lookup.enabled:
+                CACHE_LOOKUPS.inc(result="miss")
+    if not found:
+        return lookups
+
+    doc_ids = sorted({doc_id for hit in found.values() for doc_id in hit.doc_versions})
+    versions = await asyncio.to_thread(document_versions, doc_ids)
+    for i, hit in found.items():
+        if _is_current(hit, versions):
+            lookups[i].hit = hit
+            CACHE_LOOKUPS.inc(result="hit")
+        else:
+            answer_cache.discard(hit.key)
+            CACHE_LOOKUPS.inc(result="stale")
+    return lookups
+
+
+def _cache_store(
+    lookup: CacheLookup,
+    answer: str,
+    citations: List[Citation],
+    meta: Dict[str, Any],
+    versions: Dict[str, Optional[int]],
+) -> None:
+    # Uncited answers are not tied to any document, so nothing would ever
+    # invalidate them when relevant documents arrive; do not cache them.
+    if not lookup.enabled or not citations:
+        return
+    answer_cache.put(
+        lookup.key,
+        CachedAnswer(
+            answer=answer,
+            citations=[c.model_dump() for c in citations],
+            meta=meta,
+            doc_versions=versions,
+            embedding=lookup.embedding,
+            scope=lookup.scope,
+        ),
+    )
+
+
+def _serve_cached(
+    req: RAGQueryRequest,
+    hit: CachedAnswer,
+    *,
+    latency_ms: int,
+    stages: Dict[str, float],
+) -> RAGQueryResponse:
+    """Log the cache hit as a regular query/answer pair and build the response."""
+
+    citations = [Citation(**c) for c in hit.citations]
+    stage_ms = stages_ms(stages)
+    with stage("emit"):
+        _emit_events(
+            req.question,
+            hit.answer,
+            citations,
+            latency_ms=latency_ms,
+            filters=req.filters,
+            cached=True,
+            stage_ms=stage_ms,
+        )
+    meta = {**hit.meta, "latency_ms": latency_ms, "cached": True, "stage_ms": stages_ms(stages)}
+    return RAGQueryResponse(answer=hit.answer, citations=citations, meta=meta)
+
+
+async def _prepare(
+    req: RAGQueryRequest,
+    lookup: CacheLookup,
+) -> Tuple[PackedContext, Messages, Dict[str, Optional[int]]]:
+    """Retrieve and pack the prompt context.
+
+    Also returns the versions of the packed documents, taken before
+    generation so a cached answer is never stamped with a newer version.
+    """
 
-    # Fire-and-forget; if logging fails, surface a 502 to callers so we do not
-    # silently lose evidence.
     try:
-        _emit_events(req.question, answer, citations, latency_ms=latency_ms)
-    except Exception as exc:  # noqa: BLE001
-        raise HTTPException(status_code=502, detail=f"Failed to log evidence: {exc}") from exc
+        chunks = await retrieve(
+            req.question,
+            top_k=req.top_k,
+            mode=req.retrieval_mode,
+            filters=req.filters,
+            query_embedding=lookup.embedding,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid filters: {exc}") from exc
 
-    return RAGQueryResponse(
-        answer=answer,
-        citations=citations,
+    with stage("pack"):
+        packed, messages = assemble_context(req.question, chunks, load_config("rag"))
+    versions = await _packed_versions(packed)
+    return packed, messages, versions
+
+
+async def _packed_versions(packed: PackedContext) -> Dict[str, Optional[int]]:
+    """Current versions of the packed documents, read off the event loop (it may reload the index)."""
+
+    if not packed.chunks:
+        return {}
+    return await asyncio.to_thread(document_versions, sorted({c.doc_id for c in packed.chunks}))
+
+
+def _citations(packed: PackedContext, versions: Dict[str, Optional[int]]) -> List[Citation]:
+    return [
+        Citation(doc_id=c.doc_id, chunk_id=c.chunk_id, score=c.score, doc_version=versions.get(c.doc_id))
+        for c in packed.chunks
+    ]
+
+
+def _answer_limits() -> Tuple[int, int]:
+    cfg = load_config("rag")
+    max_tokens = (cfg.get("prompt", {}) or {}).get("answer_max_tokens", 512)
+    max_chars = (cfg.get("output", {}) or {}).get("max_answer_chars", 4000)
+    return max_tokens, max_chars
+
+
+def _queue_full(exc: QueueFull) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Generation queue is full, retry later",
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+async def _generate(req: RAGQueryRequest, lookup: CacheLookup) -> Generated:
+    """Retrieve, pack and generate under an admission slot.
+
+    The slot is taken before retrieval, so an overloaded server answers 429
+    without doing the retrieval work first. Stage timings are returned with
+    the result so that requests coalesced onto this call can report them too.
+    """
+
+    with collect_stages() as stages:
+        try:
+            lease = await admission.lease(req.priority)
+        except QueueFull as exc:
+            raise _queue_full(exc) from exc
+        try:
+            packed, messages, versions = await _prepare(req, lookup)
+            max_tokens, max_chars = _answer_limits()
+            with stage("generate"):
+                answer = await generator.generate(messages, max_tokens=max_tokens)
+        except HTTPException:
+            raise
+        except Exception as exc:  # noqa: BLE001
+            raise HTTPException(status_code=502, detail=f"Generation failed: {exc}") from exc
+        finally:
+            lease.release()
+    return Generated(
+        packed=packed,
+        answer=answer[:max_chars],
+        versions=versions,
+        queue_wait_ms=int(lease.waited * 1000),
+        stages=stages,
+    )
+
+
+def _meta(req: RAGQueryRequest, packed: PackedContext, *, latency_ms: int) -> Dict[str, Any]:
+    return {
+        "latency_ms": latency_ms,
+        "implementation": generator.backend,
+        "model_name": generator.model_name,
+        "prompt_hash": prompt_hash(load_config("rag")),
+        "retrieval_mode": req.retrieval_mode,
+        "context_tokens": packed.tokens,
+        "context_budget": packed.budget,
+        "cached": False,
+    }
+
+
+@app.post("/rag/query", response_model=RAGQueryResponse)
+async def rag_query(req: RAGQueryRequest) -> RAGQueryResponse:
+    """RAG endpoint.
+
+    Retrieves supporting chunks with hybrid BM25 + vector search, packs them
+    into the prompt and generates an answer with the configured backend.
+    Repeated questions are answered from the answer cache, and identical
+    concurrent questions share one generation. Generations pass through the
+    admission queue; when it is full the request fails fast with 429.
+    """
+
+    start = time.perf_counter()
+    _validate(req)
+
+    with collect_stages() as stages:
+        lookup = await _cache_lookup(req)
+        if lookup.hit is not None:
+            try:
+                return _serve_cached(req, lookup.hit, latency_ms=_elapsed_ms(start), stages=stages)
+            except Exception as exc:  # noqa: BLE001
+                raise HTTPException(status_code=502, detail=f"Failed to log evidence: {exc}") from exc
+
+        result, coalesced = await flights.do(lookup.key, lambda: _generate(req, lookup))
+        if coalesced:
+            COALESCED.inc()
+        for name, seconds in result.stages.items():
+            stages[name] = stages.get(name, 0.0) + seconds
+        answer = result.answer
+        citations = _citations(result.packed, result.versions)
+        latency_ms = _elapsed_ms(start)
+
+        # Fire-and-forget; if logging fails, surface a 502 to callers so we do not
+        # silently lose evidence.
+        try:
+            with stage("emit"):
+                _emit_events(
+                    req.question,
+                    answer,
+                    citations,
+                    latency_ms=latency_ms,
+                    filters=req.filters,
+                    stage_ms=stages_ms(stages),
+                )
+        except Exception as exc:  # noqa: BLE001
+            raise HTTPException(status_code=502, detail=f"Failed to log evidence: {exc}") from exc
+
+    meta = _meta(req, result.packed, latency_ms=latency_ms)
+    meta.update(coalesced=coalesced, queue_wait_ms=result.queue_wait_ms, stage_ms=stages_ms(stages))
+    if not coalesced:
+        _cache_store(lookup, answer, citations, meta, result.versions)
+    return RAGQueryResponse(answer=answer, citations=citations, meta=meta)
+
+
+@app.post("/rag/query:batch", response_model=RAGBatchResponse)
+async def rag_query_batch(batch: RAGBatchRequest) -> RAGBatchResponse:
+    """Answer many questions in one request.
+
+    All questions are embedded in one call and retrieved as a matrix
+    product; duplicate questions and cache hits are answered once, and
+    generations run at most `batch.max_concurrency` at a time through the
+    admission queue. Each item carries its own status (400, 429 or 502 on
+    failure). Evidence for every answered item is logged in one request to
+    the Evidence Logger; if that fails, the whole batch fails with 502.
+    """
+
+    start = time.perf_counter()
+    with collect_stages() as stages:
+        return await _answer_batch(batch, start, stages)
+
+
+async def _answer_batch(batch: RAGBatchRequest, start: float, stages: Dict[str, float]) -> RAGBatchResponse:
+    rag_cfg = load_config("rag")
+    items: List[RAGBatchItem] = [RAGBatchItem() for _ in batch.queries]
+    hits: Dict[int, CachedAnswer] = {}
+    pending: Dict[str, List[int]] = {}  # cache key -> items sharing one generation
+
+    valid: Dict[int, RAGQueryRequest] = {}
+    for i, req in enumerate(batch.queries):
+        try:
+            _validate(req)
+        except HTTPException as exc:
+            items[i] = RAGBatchItem(status=exc.status_code, error=exc.detail)
+            continue
+        valid[i] = req
+
+    lookups = await _cache_lookup_batch(valid)
+    for i, lookup in lookups.items():
+        if lookup.hit is not None:
+            hits[i] = lookup.hit
+        else:
+            pending.setdefault(lookup.key, []).append(i)
+
+    leaders = [members[0] for members in pending.values()]
+    found = await retrieve_batch(
+        [
+            BatchQuery(
+                question=batch.queries[i].question,
+                top_k=batch.queries[i].top_k,
+                mode=batch.queries[i].retrieval_mode,
+                filters=batch.queries[i].filters,
+            )
+            for i in leaders
+        ]
+    )
+
+    max_tokens, max_chars = _answer_limits()
+    limit = asyncio.Semaphore(max(1, (rag_cfg.get("batch", {}) or {}).get("max_concurrency", 4)))
+
+    async def answer_one(i: int, chunks: List[RetrievedChunk]) -> Optional[Generated]:
+        req = batch.queries[i]
+        with stage("pack"):
+            packed, messages = assemble_context(req.question, chunks, rag_cfg)
+        versions = await _packed_versions(packed)
+        async with limit:
+            try:
+                async with admission.slot(req.priority) as waited:
+                    with stage("generate"):
+                        answer = await generator.generate(messages, max_tokens=max_tokens)
+            except QueueFull as exc:
+                items[i] = RAGBatchItem(status=429, error=f"Generation queue is full, retry after {exc.retry_after}s")
+                return None
+            except Exception as exc:  # noqa: BLE001
+                items[i] = RAGBatchItem(status=502, error=f"Generation failed: {exc}")
+                return None
+        return Generated(packed=packed, answer=answer[:max_chars], versions=versions, queue_wait_ms=int(waited * 1000))
+
+    generated = await asyncio.gather(*(answer_one(i, chunks) for i, chunks in zip(leaders, found)))
+    latency_ms = _elapsed_ms(start)
+
+    events: List[Dict[str, Any]] = []
+    to_cache = []
+    for members, result in zip(pending.values(), generated):
+        for n, i in enumerate(members):
+            req = batch.queries[i]
+            if result is None:
+                items[i] = items[members[0]]
+                continue
+            citations = _citations(result.packed, result.versions)
+            meta = _meta(req, result.packed, latency_ms=latency_ms)
+            meta.update(coalesced=n > 0, queue_wait_ms=result.queue_wait_ms)
+            events += _answer_events(req.question, result.answer, citations, latency_ms=latency_ms, filters=req.filters)
+            items[i] = RAGBatchItem(result=RAGQueryResponse(answer=result.answer, citations=citations, meta=meta))
+            if n == 0:
+                to_cache.append((lookups[i], result.answer, citations, meta, result.versions))
+    for i, hit in hits.items():
+        req = batch.queries[i]
+        citations = [Citation(**c) for c in hit.citations]
+        events += _answer_events(
+            req.question, hit.answer, citations, latency_ms=latency_ms, filters=req.filters, cached=True
+        )
+        meta = {**hit.meta, "latency_ms": latency_ms, "cached": True}
+        items[i] = RAGBatchItem(result=RAGQueryResponse(answer=hit.answer, citations=citations, meta=meta))
+
+    if events:
+        try:
+            with stage("emit"):
+                await asyncio.to_thread(_post_events, events)
+        except Exception as exc:  # noqa: BLE001
+            raise HTTPException(status_code=502, detail=f"Failed to log evidence: {exc}") from exc
+    for args in to_cache:
+        _cache_store(*args)
+
+    return RAGBatchResponse(
+        results=items,
         meta={
             "latency_ms": latency_ms,
-            "implementation": "stub",
+            "questions": len(items),
+            "generations": len(leaders),
+            "cached": len(hits),
+            "failed": sum(1 for item in items if item.status != 200),
+            # Summed over the batch; concurrent generations overlap in wall time.
+            "stage_ms": stages_ms(stages),
         },
     )
 
 
+def _sse(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+
+
+class LeasedStreamingResponse(StreamingResponse):
+    """Streaming response that gives back its admission slot when it ends.
+
+    The body generator also releases the lease, but it never runs if the
+    client disconnects before the first chunk; releasing here covers that.
+    """
+
+    def __init__(self, content: AsyncIterator[bytes], *, lease: Lease, **kwargs: Any) -> None:
+        super().__init__(content, **kwargs)
+        self.lease = lease
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.lease.release()
+
+
+@app.post("/rag/query/stream")
+async def rag_query_stream(req: RAGQueryRequest) -> StreamingResponse:
+    """Streaming variant of `/rag/query` using server-sent events.
+
+    Emits one `token` event per generated fragment (`{"text": ...}`), then a
+    `done` event whose data is the same `RAGQueryResponse` as `/rag/query`,
+    with `meta.ttft_ms` added. Evidence is logged before `done` is sent; a
+    failure after streaming has started is reported as an `error` event.
+    A cached answer is sent as a single `token` event. The admission slot
+    is taken before retrieval and held until the stream ends; a full queue
+    is a plain 429 response.
+    """
+
+    start = time.perf_counter()
+    _validate(req)
+    with collect_stages() as stages:
+        lookup = await _cache_lookup(req)
+        if lookup.hit is not None:
+            return StreamingResponse(
+                _cached_events(req, lookup.hit, start, stages),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+        try:
+            lease = await admission.lease(req.priority)
+        except QueueFull as exc:
+            raise _queue_full(exc) from exc
+        try:
+            packed, messages, versions = await _prepare(req, lookup)
+        except BaseException:
+            lease.release()
+            raise
+    max_tokens, max_chars = _answer_limits()
+
+    async def events() -> AsyncIterator[bytes]:
+        parts: List[str] = []
+        ttft_ms: Optional[int] = None
+        generate_from = time.perf_counter()
+        try:
+            async for text in generator.stream(messages, max_tokens=max_tokens):
+                if ttft_ms is None:
+                    ttft_ms = _elapsed_ms(start)
+                parts.append(text)
+                yield _sse("token", {"text": text})
+        except Exception as exc:  # noqa: BLE001
+            yield _sse("error", {"detail": f"Generation failed: {exc}"})
+            return
+        finally:
+            lease.release()
+            stages["generate"] = time.perf_counter() - generate_from
+            record_stage("generate", stages["generate"])
+
+        answer = "".join(parts)[:max_chars]
+        citations = _citations(packed, versions)
+        latency_ms = _elapsed_ms(start)
+        emit_start = time.perf_counter()
+        try:
+            await asyncio.to_thread(
+                _emit_events,
+                req.question,
+                answer,
+                citations,
+                latency_ms=latency_ms,
+                filters=req.filters,
+                ttft_ms=ttft_ms,
+                stage_ms=stages_ms(stages),
+            )
+        except Exception as exc:  # noqa: BLE001
+            yield _sse("error", {"detail": f"Failed to log evidence: {exc}"})
+            return
+        stages["emit"] = time.perf_counter() - emit_start
+        record_stage("emit", stages["emit"])
+
+        meta = {
+            **_meta(req, packed, latency_ms=latency_ms),
+            "ttft_ms": ttft_ms,
+            "queue_wait_ms": int(lease.waited * 1000),
+            "stage_ms": stages_ms(stages),
+        }
+        _cache_store(lookup, answer, citations, meta, versions)
+        response = RAGQueryResponse(answer=answer, citations=citations, meta=meta)
+        yield _sse("done", response.model_dump())
+
+    return LeasedStreamingResponse(
+        events(),
+        lease=lease,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _cached_events(
+    req: RAGQueryRequest,
+    hit: CachedAnswer,
+    start: float,
+    stages: Dict[str, float],
+) -> AsyncIterator[bytes]:
+    latency_ms = _elapsed_ms(start)
+    yield _sse("token", {"text": hit.answer})
+    try:
+        response = await asyncio.to_thread(_serve_cached, req, hit, latency_ms=latency_ms, stages=stages)
+    except Exception as exc:  # noqa: BLE001
+        yield _sse("error", {"detail": f"Failed to log evidence: {exc}"})
+        return
+    response.meta["ttft_ms"] = latency_ms
+    yield _sse("done", response.model_dump())
+
+
+@app.post("/rag/cache/invalidate")
+async def invalidate_cache(batch: InvalidationBatch) -> Dict[str, Any]:
+    """Drop cached answers citing documents touched by the given `IndexEvent`s.
+
+    Accepts the same `{"events": [{"data": ...}]}` batch the indexer sends to
+    the Evidence Logger; events of other types are ignored.
+    """
+
+    doc_ids = set()
+    for item in batch.events:
+        data = item.get("data", {})
+        if data.get("event_type") != "index":
+            continue
+        try:
+            doc_ids.add(IndexEvent.model_validate(data).payload.document_id)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=f"Invalid index event: {exc}") from exc
+    return {"invalidated": answer_cache.invalidate_documents(doc_ids), "documents": len(doc_ids)}
+
+
+@app.get("/rag/cache")
+async def cache_stats() -> Dict[str, Any]:
+    return {"entries": len(answer_cache), **vars(answer_cache.stats)}
+
+
+@app.get("/rag/info")
+async def rag_info(doc_id: List[str] = Query(default=[])) -> Dict[str, Any]:
+    """What an answer currently depends on: model, prompt template and document versions.
+
+    Clients such as the eval runner compare this with what they recorded
+    alongside an earlier answer to tell whether asking again can change it.
+    """
+
+    return {
+        "model_name": generator.model_name,
+        "implementation": generator.backend,
+        "prompt_hash": prompt_hash(load_config("rag")),
+        "index_version": await asyncio.to_thread(index_version),
+        "document_versions": await asyncio.to_thread(document_versions, doc_id) if doc_id else {},
+    }
+
+
+@app.get("/rag/admission")
+async def admission_stats() -> Dict[str, Any]:
+    """Queue depth, in-flight generations and queue wait times."""
+
+    return {**admission.snapshot(), "coalesced": flights.coalesced, "in_flight_keys": len(flights)}
+
+
 @app.get("/healthz")
 async def healthcheck() -> Dict[str, Any]:
     return {"status": "ok"}
-  
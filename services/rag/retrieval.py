@@ -0,0 +1,398 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from functools import lru_cache
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Literal, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.common.config import load_config
+from services.common.lexical_index import LexicalIndex, LexicalSnapshot
+from services.common.metadata_index import MetadataFilter, RowBitmap, parse_since
+from services.common.metrics import stage
+from services.common.vector_index import VectorIndex, VectorSnapshot
+from services.indexer.embedder import embedding_model_name, get_embedder
+from services.indexer.main import open_indexes
+
+
+RetrievalMode = Literal["hybrid", "vector", "lexical"]
+
+RRF_K = 60
+
+
+@dataclass
+class RetrievedChunk:
+    chunk_id: str
+    doc_id: str
+    text: str
+    score: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    index: int = 0
+    token_count: int = 0
+    overlap_chars: int = 0
+    overlap_tokens: int = 0
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], *, k: int = RRF_K) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists with reciprocal-rank fusion.
+
+    Each list contributes `1 / (k + rank)` per id. Scores are normalised by
+    the best achievable score (rank 1 in every list), so they fall in (0, 1].
+    """
+
+    if not rankings:
+        return []
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    best = len(rankings) / (k + 1)
+    return sorted(((item, score / best) for item, score in fused.items()), key=lambda kv: -kv[1])
+
+
+FILTER_KEYS = {"tags", "mime_types", "sources", "doc_ids", "since", "max_doc_age_days"}
+
+
+def build_filter(filters: Optional[Dict[str, Any]], cfg: Dict[str, Any]) -> MetadataFilter:
+    """Combine request `filters` with the defaults in `config/rag.yaml`.
+
+    `filters.default_tags` and `filters.max_doc_age_days` apply unless the
+    request sets its own; `retrieval.allowed_mime_types` always constrains
+    the requested mime types. Raises ValueError on unknown filter keys.
+    """
+
+    filters = dict(filters or {})
+    unknown = set(filters) - FILTER_KEYS
+    if unknown:
+        raise ValueError(f"Unknown filter keys: {', '.join(sorted(unknown))}")
+
+    defaults = cfg.get("filters", {}) or {}
+    allowed_mime = (cfg.get("retrieval", {}) or {}).get("allowed_mime_types") or []
+    mime_types = list(filters.get("mime_types") or allowed_mime)
+    if allowed_mime:
+        mime_types = [m for m in mime_types if m in allowed_mime] or ["<none>"]
+
+    since = parse_since(filters.get("since"))
+    max_age = filters.get("max_doc_age_days", defaults.get("max_doc_age_days"))
+    if max_age is not None:
+        age_cutoff = (datetime.utcnow() - timedelta(days=int(max_age))).date()
+        since = max(since, age_cutoff) if since else age_cutoff
+
+    return MetadataFilter(
+        tags=list(filters.get("tags") or defaults.get("default_tags") or []),
+        mime_types=mime_types,
+        sources=list(filters.get("sources") or []),
+        doc_ids=list(filters.get("doc_ids") or []),
+        since=since,
+    )
+
+
+class Retriever:
+    """Hybrid lexical + vector retriever over the indexer's on-disk indexes.
+
+    BM25 search runs concurrently with embedding the question and scanning
+    the vectors; both candidate lists are merged with reciprocal-rank fusion.
+    """
+
+    def __init__(
+        self,
+        vectors: VectorIndex,
+        lexical: LexicalIndex,
+        embedder,
+        *,
+        embedding_model: str,
+        candidate_multiplier: int = 4,
+    ) -> None:
+        self.vectors = vectors
+        self.lexical = lexical
+        self.embedder = embedder
+        self.embedding_model = embedding_model
+        self.candidate_multiplier = candidate_multiplier
+        self._aligned: Optional[Tuple[VectorSnapshot, LexicalSnapshot, Dict[str, np.ndarray]]] = None
+
+    def refresh(self) -> None:
+        """Pick up index commits; blocking, so async callers run it in a thread."""
+
+        self.vectors.refresh()
+        self.lexical.refresh()
+
+    def _lexical_masks(
+        self, lexical: LexicalSnapshot, vectors: VectorSnapshot, rows: Optional[RowBitmap]
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """Per-segment BM25 masks for the vector rows in `rows`."""
+
+        if rows is None:
+            return None
+        aligned = self._aligned
+        if aligned is None or aligned[0] is not vectors or aligned[1] is not lexical:
+            # Chunk id -> row for every lexical ordinal, once per pair of snapshots.
+            aligned = self._aligned = (vectors, lexical, lexical.align(vectors.rows))
+        row_mask = rows.to_mask()
+        return {name: (seg_rows >= 0) & row_mask[seg_rows] for name, seg_rows in aligned[2].items()}
+
+    def _lexical_search(
+        self, lexical: LexicalSnapshot, question: str, n: int, masks: Optional[Dict[str, np.ndarray]]
+    ) -> List[str]:
+        with stage("search"):
+            return [chunk_id for chunk_id, _ in lexical.search(question, top_k=n, masks=masks)]
+
+    @property
+    def index_version(self) -> str:
+        """Embedding model and index epoch; changes only on a full rebuild.
+
+        May reload the index, so async callers read it in a thread.
+        """
+
+        self.vectors.refresh()
+        return f"{self.embedding_model}:{self.vectors.epoch}"
+
+    def embed_question(self, question: str) -> List[float]:
+        with stage("embed"):
+            return self.embedder.embed([question], self.embedding_model)[0]
+
+    def _vector_search(
+        self,
+        vectors: VectorSnapshot,
+        question: str,
+        n: int,
+        min_score: float,
+        rows: Optional[RowBitmap],
+        embedding: Optional[Sequence[float]] = None,
+    ) -> List[str]:
+        if embedding is None:
+            embedding = self.embed_question(question)
+        with stage("search"):
+            hits = vectors.search(embedding, top_k=n, min_score=min_score, rows=rows)
+            return [vectors.record(row).chunk_id for row, _ in hits]
+
+    async def retrieve(
+        self,
+        question: str,
+        *,
+        top_k: int,
+        min_score: float,
+        mode: RetrievalMode = "hybrid",
+        filters: Optional[MetadataFilter] = None,
+        query_embedding: Optional[Sequence[float]] = None,
+    ) -> List[RetrievedChunk]:
+        """Return up to `top_k` chunks for `question`, best first.
+
+        `min_score` is a cosine-similarity floor for vector candidates; lexical
+        candidates qualify by matching at least one query term. `filters` are
+        resolved to a row bitmap first and both searches only consider those
+        rows. A precomputed `query_embedding` skips embedding the question.
+        """
+
+        await asyncio.to_thread(self.refresh)
+        # One snapshot of each index for the whole request, however many
+        # reloads land while the searches run.
+        vectors, lexical = self.vectors.snapshot, self.lexical.snapshot
+        if not len(vectors):
+            return []
+
+        rows = vectors.filter_rows(filters)
+        if rows is not None and not len(rows):
+            return []
+
+        n = top_k * self.candidate_multiplier
+        searches = []
+        if mode in ("hybrid", "lexical"):
+
+            def lexical_one() -> List[str]:
+                return self._lexical_search(lexical, question, n, self._lexical_masks(lexical, vectors, rows))
+
+            searches.append(asyncio.to_thread(lexical_one))
+        if mode in ("hybrid", "vector"):
+            searches.append(
+                asyncio.to_thread(self._vector_search, vectors, question, n, min_score, rows, query_embedding)
+            )
+        rankings = await asyncio.gather(*searches)
+        return self._fuse(vectors, rankings, top_k)
+
+    async def retrieve_batch(
+        self,
+        questions: Sequence[str],
+        *,
+        top_k: int,
+        min_score: float,
+        mode: RetrievalMode = "hybrid",
+        filters: Optional[MetadataFilter] = None,
+        query_embeddings: Optional[Sequence[Sequence[float]]] = None,
+    ) -> List[List[RetrievedChunk]]:
+        """`retrieve` for many questions sharing the same settings.
+
+        Questions are embedded in one call (unless `query_embeddings` are
+        given) and scored against the vectors as one matrix product; BM25
+        runs per question in a worker thread alongside.
+        """
+
+        await asyncio.to_thread(self.refresh)
+        vectors, lexical = self.vectors.snapshot, self.lexical.snapshot
+        if not questions or not len(vectors):
+            return [[] for _ in questions]
+
+        rows = vectors.filter_rows(filters)
+        if rows is not None and not len(rows):
+            return [[] for _ in questions]
+
+        n = top_k * self.candidate_multiplier
+        no_hits: List[List[str]] = [[] for _ in questions]
+
+        def lexical_all() -> List[List[str]]:
+            masks = self._lexical_masks(lexical, vectors, rows)
+            return [self._lexical_search(lexical, q, n, masks) for q in questions]
+
+        def vector_all() -> List[List[str]]:
+            embeddings = query_embeddings
+            if embeddings is None:
+                with stage("embed"):
+                    embeddings = self.embedder.embed(list(questions), self.embedding_model)
+            with stage("search"):
+                hits = vectors.search_batch(embeddings, top_k=n, min_score=min_score, rows=rows)
+                return [[vectors.record(row).chunk_id for row, _ in per_q] for per_q in hits]
+
+        lexical_rankings, vector_rankings = await asyncio.gather(
+            asyncio.to_thread(lexical_all) if mode in ("hybrid", "lexical") else asyncio.sleep(0, no_hits),
+            asyncio.to_thread(vector_all) if mode in ("hybrid", "vector") else asyncio.sleep(0, no_hits),
+        )
+        results = []
+        for lex, vec in zip(lexical_rankings, vector_rankings):
+            rankings = [r for r, used in ((lex, mode != "vector"), (vec, mode != "lexical")) if used]
+            results.append(self._fuse(vectors, rankings, top_k))
+        return results
+
+    def _fuse(self, vectors: VectorSnapshot, rankings: Sequence[Sequence[str]], top_k: int) -> List[RetrievedChunk]:
+        results: List[RetrievedChunk] = []
+        for chunk_id, score in reciprocal_rank_fusion(rankings):
+            rec = vectors.get(chunk_id)
+            if rec is None:
+                # Lexical and vector indexes are committed separately; skip a
+                # chunk that is mid-update rather than citing stale text.
+                continue
+            results.append(
+                RetrievedChunk(
+                    chunk_id=chunk_id,
+                    doc_id=rec.document_id,
+                    text=rec.text,
+                    score=round(score, 4),
+                    metadata=rec.metadata,
+                    index=rec.index,
+                    token_count=rec.token_count,
+                    overlap_chars=rec.overlap_chars,
+                    overlap_tokens=rec.overlap_tokens,
+                )
+            )
+            if len(results) == top_k:
+                break
+        return results
+
+
+@lru_cache(maxsize=1)
+def get_retriever() -> Retriever:
+    vectors, lexical = open_indexes()
+    return Retriever(vectors, lexical, get_embedder(), embedding_model=embedding_model_name())
+
+
+@dataclass
+class BatchQuery:
+    question: str
+    top_k: Optional[int] = None
+    mode: RetrievalMode = "hybrid"
+    filters: Optional[Dict[str, Any]] = None
+
+
+async def retrieve_batch(queries: Sequence[BatchQuery], *, min_score: Optional[float] = None) -> List[List[RetrievedChunk]]:
+    """Retrieve for many queries, embedding every question in a single call.
+
+    Queries with the same `top_k`, mode and filters are searched together as
+    one matrix product. Raises ValueError for malformed `filters`.
+    """
+
+    rag_cfg = load_config("rag")
+    cfg = rag_cfg.get("retrieval", {})
+    retriever = get_retriever()
+    await asyncio.to_thread(retriever.refresh)
+    if not len(retriever.vectors):
+        return [[] for _ in queries]
+
+    default_top_k = cfg.get("top_k", 8)
+    floor = min_score if min_score is not None else cfg.get("min_score", 0.0)
+    flts = [build_filter(q.filters, rag_cfg) for q in queries]
+
+    needs_vectors = [i for i, q in enumerate(queries) if q.mode != "lexical"]
+    embeddings: Dict[int, List[float]] = {}
+    if needs_vectors:
+
+        def embed_all() -> List[List[float]]:
+            with stage("embed"):
+                return retriever.embedder.embed([queries[i].question for i in needs_vectors], retriever.embedding_model)
+
+        vecs = await asyncio.to_thread(embed_all)
+        embeddings = dict(zip(needs_vectors, vecs))
+
+    groups: Dict[Tuple[Any, ...], List[int]] = {}
+    for i, q in enumerate(queries):
+        key = (q.top_k or default_top_k, q.mode, repr(flts[i]))
+        groups.setdefault(key, []).append(i)
+
+    async def run(members: List[int]) -> List[List[RetrievedChunk]]:
+        first = queries[members[0]]
+        return await retriever.retrieve_batch(
+            [queries[i].question for i in members],
+            top_k=first.top_k or default_top_k,
+            min_score=floor,
+            mode=first.mode,
+            filters=flts[members[0]],
+            query_embeddings=[embeddings[i] for i in members] if first.mode != "lexical" else None,
+        )
+
+    results: List[List[RetrievedChunk]] = [[] for _ in queries]
+    for members, chunks in zip(groups.values(), await asyncio.gather(*(run(m) for m in groups.values()))):
+        for i, found in zip(members, chunks):
+            results[i] = found
+    return results
+
+
+async def retrieve(
+    question: str,
+    *,
+    top_k: Optional[int] = None,
+    min_score: Optional[float] = None,
+    mode: RetrievalMode = "hybrid",
+    filters: Optional[Dict[str, Any]] = None,
+    query_embedding: Optional[Sequence[float]] = None,
+) -> List[RetrievedChunk]:
+    """Retrieve chunks using `retrieval.top_k` / `retrieval.min_score` from `config/rag.yaml` as defaults.
+
+    Raises ValueError for malformed `filters`.
+    """
+
+    rag_cfg = load_config("rag")
+    cfg = rag_cfg.get("retrieval", {})
+    return await get_retriever().retrieve(
+        question,
+        top_k=top_k if top_k is not None else cfg.get("top_k", 8),
+        min_score=min_score if min_score is not None else cfg.get("min_score", 0.0),
+        mode=mode,
+        filters=build_filter(filters, rag_cfg),
+        query_embedding=query_embedding,
+    )
+
+
+def index_version() -> str:
+    return get_retriever().index_version
+
+
+def document_versions(doc_ids: Sequence[str]) -> Dict[str, Optional[int]]:
+    """Current index version of each document (None once deleted)."""
+
+    index = get_retriever().vectors
+    index.refresh()
+    vectors = index.snapshot
+    return {doc_id: vectors.document_version(doc_id) for doc_id in doc_ids}
+
+
+async def embed_question(question: str) -> List[float]:
+    return await asyncio.to_thread(get_retriever().embed_question, question)
@@ -0,0 +1,316 @@
+"""Live evidence for the UI: one log tailer fanned out to SSE subscribers.
+
+`EvidenceTailer` follows the newest `evidence-YYYY-MM-DD.jsonl` in the log
+directory, woken by inotify on Linux or by polling elsewhere, and moves on to
+the next day's file once the current one has been read to the end. Each new
+record is parsed once and offered to every subscriber whose filters match.
+Subscribers have bounded buffers; one that falls behind is cut off with an
+`overflow` event carrying the cursor to resume from, so a slow browser tab
+never holds up the others or grows memory.
+
+Every record's SSE id is a cursor, `<YYYY-MM-DD>:<byte offset after the
+record>`, so an `EventSource` that reconnects with `Last-Event-ID` picks up
+where it stopped. Records between the cursor and the live tail are read
+from disk for that subscriber alone.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import ctypes
+import ctypes.util
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
+
+from services.common.metrics import counter
+
+
+Cursor = Tuple[str, int]  # (day, byte offset just after a record)
+
+KEEPALIVE_SECONDS = 15.0
+READ_CHUNK = 1 << 20
+BACKLOG_BATCH = 500
+
+_CURSOR_RE = re.compile(r"^(\d{4}-\d{2}-\d{2}):(\d+)$")
+_LOG_RE = re.compile(r"^evidence-(\d{4}-\d{2}-\d{2})\.jsonl$")
+
+SUBSCRIBERS_DROPPED = counter(
+    "factory_ui_stream_subscribers_dropped_total", "Evidence stream subscribers cut off for falling behind."
+)
+
+
+def format_cursor(cursor: Cursor) -> str:
+    return f"{cursor[0]}:{cursor[1]}"
+
+
+def parse_cursor(value: str) -> Cursor:
+    m = _CURSOR_RE.match(value.strip())
+    if not m:
+        raise ValueError(f"invalid cursor {value!r}; expected YYYY-MM-DD:<offset>")
+    return m.group(1), int(m.group(2))
+
+
+def log_days(log_dir: Path) -> List[str]:
+    return sorted(m.group(1) for p in Path(log_dir).glob("evidence-*.jsonl") if (m := _LOG_RE.match(p.name)))
+
+
+def _log_path(log_dir: Path, day: str) -> Path:
+    return Path(log_dir) / f"evidence-{day}.jsonl"
+
+
+def read_lines(path: Path, offset: int, max_bytes: int = READ_CHUNK) -> Tuple[List[Tuple[int, bytes]], int]:
+    """Complete lines after `offset` as `(end offset, line)`, and the offset after the last one."""
+
+    try:
+        with path.open("rb") as f:
+            f.seek(offset)
+            data = f.read(max_bytes)
+            while b"\n" not in data and len(data) == max_bytes:  # one line longer than the chunk
+                more = f.read(max_bytes)
+                data += more
+                if not more:
+                    break
+    except FileNotFoundError:
+        return [], offset
+    end = data.rfind(b"\n") + 1  # a trailing partial line is left for the next read
+    lines: List[Tuple[int, bytes]] = []
+    pos = 0
+    while pos < end:
+        nl = data.index(b"\n", pos) + 1
+        lines.append((offset + nl, data[pos : nl - 1]))
+        pos = nl
+    return lines, offset + end
+
+
+def read_records(log_dir: Path, cursor: Cursor) -> Iterator[Tuple[Cursor, bytes]]:
+    """Lines after `cursor` up to the current end of the logs, across day files."""
+
+    for day in log_days(log_dir):
+        if day < cursor[0]:
+            continue
+        offset = cursor[1] if day == cursor[0] else 0
+        path = _log_path(log_dir, day)
+        while True:
+            lines, offset = read_lines(path, offset)
+            if not lines:
+                break
+            for end, line in lines:
+                yield (day, end), line
+
+
+def find_record(log_dir: Path, record_hash: str, *, days: int = 2) -> Optional[Cursor]:
+    """Cursor just after the record with `record_hash`, searching the newest `days` logs."""
+
+    needle = f'"record_hash":"{record_hash}"'.encode("utf-8")
+    for day in reversed(log_days(log_dir)[-days:]):
+        offset = 0
+        with _log_path(log_dir, day).open("rb") as f:
+            for line in f:
+                offset += len(line)
+                if needle in line:
+                    return day, offset
+    return None
+
+
+class _Inotify:
+    """Directory watch via the raw inotify syscalls (Linux only)."""
+
+    MASK = 0x2 | 0x8 | 0x80 | 0x100  # IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, directory: Path) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)  # AttributeError off Linux
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(str(directory)), self.MASK) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def drain(self) -> None:
+        try:
+            while os.read(self.fd, 64 * 1024):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+@dataclass(eq=False)
+class Subscriber:
+    filters: Dict[str, Set[str]]
+    queue: "asyncio.Queue[Tuple[Cursor, bytes]]"
+    start: Cursor
+    overflowed: bool = False
+
+    def matches(self, event: Dict[str, object]) -> bool:
+        return all(str(event.get(key)) in values for key, values in self.filters.items())
+
+
+class EvidenceTailer:
+    """Single reader of the evidence logs shared by every stream subscriber."""
+
+    def __init__(self, log_dir: Path, *, poll_interval: float = 0.5, use_inotify: bool = True) -> None:
+        self.log_dir = Path(log_dir)
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.subscribers: Set[Subscriber] = set()
+        self.position: Optional[Cursor] = None
+        self._read_lock = threading.Lock()  # one reader at a time advances `position`
+        self._task: Optional["asyncio.Task[None]"] = None
+        self._wake: Optional[asyncio.Event] = None
+
+    def subscribe(self, filters: Optional[Dict[str, Set[str]]] = None, *, buffer: int = 1000) -> Subscriber:
+        if self._task is None:
+            self.position = self._initial_position()
+        assert self.position is not None
+        sub = Subscriber(filters or {}, asyncio.Queue(maxsize=buffer), start=self.position)
+        self.subscribers.add(sub)
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        self.subscribers.discard(sub)
+        if not self.subscribers and self._wake is not None:
+            self._wake.set()  # let the tailer notice and stop
+
+    def _initial_position(self) -> Cursor:
+        days = log_days(self.log_dir)
+        if not days:
+            return datetime.utcnow().strftime("%Y-%m-%d"), 0
+        return days[-1], _log_path(self.log_dir, days[-1]).stat().st_size
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        watcher: Optional[_Inotify] = None
+        if self.use_inotify:
+            try:
+                watcher = _Inotify(self.log_dir)
+                loop.add_reader(watcher.fd, self._wake.set)
+            except (OSError, AttributeError, NotImplementedError):
+                if watcher is not None:
+                    watcher.close()
+                watcher = None  # not Linux, or out of watches: poll instead
+        try:
+            while self.subscribers:
+                await self._dispatch_new()
+                # With inotify the timeout is only a safety net for missed events.
+                timeout = self.poll_interval * 10 if watcher else self.poll_interval
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                if watcher:
+                    watcher.drain()
+        finally:
+            if watcher:
+                loop.remove_reader(watcher.fd)
+                watcher.close()
+            self._task = None
+            self._wake = None
+
+    async def _dispatch_new(self) -> None:
+        # File reads and directory listings run in a thread; only dispatch uses the loop.
+        while self.subscribers and (records := await asyncio.to_thread(self.read_new)):
+            for cursor, line in records:
+                self._dispatch(cursor, line)
+
+    def poll(self) -> None:
+        """Read and dispatch everything appended since the last call (blocking)."""
+
+        while records := self.read_new():
+            for cursor, line in records:
+                self._dispatch(cursor, line)
+
+    def read_new(self) -> List[Tuple[Cursor, bytes]]:
+        """The next chunk of records after `position`, following day rollover; [] when caught up."""
+
+        with self._read_lock:
+            assert self.position is not None
+            day, offset = self.position
+            while True:
+                lines, offset = read_lines(_log_path(self.log_dir, day), offset)
+                self.position = (day, offset)
+                if lines:
+                    return [((day, end), line) for end, line in lines]
+                later = [d for d in log_days(self.log_dir) if d > day]
+                if not later:
+                    return []
+                day, offset = later[0], 0  # the logger has moved on; the old file is finished
+
+    def _dispatch(self, cursor: Cursor, line: bytes) -> None:
+        try:
+            event = json.loads(line).get("event") or {}
+        except (ValueError, AttributeError):
+            return
+        frame: Optional[bytes] = None
+        for sub in list(self.subscribers):
+            if sub.overflowed or not sub.matches(event):
+                continue
+            if frame is None:
+                frame = sse_frame(cursor, line)
+            try:
+                sub.queue.put_nowait((cursor, frame))
+            except asyncio.QueueFull:
+                sub.overflowed = True
+                self.subscribers.discard(sub)
+                SUBSCRIBERS_DROPPED.inc()
+
+
+def sse_frame(cursor: Cursor, line: bytes) -> bytes:
+    return b"id: " + format_cursor(cursor).encode() + b"\nevent: evidence\ndata: " + line + b"\n\n"
+
+
+async def stream(
+    tailer: EvidenceTailer,
+    filters: Optional[Dict[str, Set[str]]] = None,
+    *,
+    resume: Optional[Cursor] = None,
+    buffer: int = 1000,
+) -> AsyncIterator[bytes]:
+    """SSE frames for one subscriber: the backlog after `resume`, then live records."""
+
+    sub = tailer.subscribe(filters, buffer=buffer)
+    last: Cursor = resume or sub.start
+    try:
+        if resume is not None:
+            backlog = read_records(tailer.log_dir, resume)
+            while True:
+                batch = await asyncio.to_thread(lambda: [r for _, r in zip(range(BACKLOG_BATCH), backlog)])
+                if not batch:
+                    break
+                for cursor, line in batch:
+                    try:
+                        event = json.loads(line).get("event") or {}
+                    except (ValueError, AttributeError):
+                        continue
+                    if sub.matches(event):
+                        yield sse_frame(cursor, line)
+                    last = cursor
+
+        while True:
+            if sub.overflowed and sub.queue.empty():
+                yield b"event: overflow\ndata: " + json.dumps({"resume": format_cursor(last)}).encode() + b"\n\n"
+                return
+            try:
+                cursor, frame = await asyncio.wait_for(sub.queue.get(), KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            if cursor <= last:
+                continue  # already sent from the backlog
+            yield frame
+            last = cursor
+    finally:
+        tailer.unsubscribe(sub)
@@ -1,11 +1,29 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse
 
+from services.common.metrics import gauge, instrument_app
+from services.common.tracing import TracingMiddleware
+from services.ui.evidence_stream import EvidenceTailer, find_record, parse_cursor, stream
+
+
+LOG_DIR = Path(os.getenv("EVIDENCE_LOG_DIR", "data/logs"))
+STREAM_BUFFER = int(os.getenv("UI_STREAM_BUFFER", "1000"))
 
 app = FastAPI(title="Local AI Factory - Minimal UI Stub")
+app.add_middleware(TracingMiddleware, service="ui")
+instrument_app(app)
+
+tailer = EvidenceTailer(LOG_DIR)
+gauge("factory_ui_stream_subscribers", "Open evidence stream subscriptions.").set_function(
+    lambda: len(tailer.subscribers)
+)
 
 
 @app.get("/healthz")
@@ -13,5 +31,46 @@ async def healthcheck() -> Dict[str, Any]:
     return {"status": "ok"}
 
 
+@app.get("/evidence/stream")
+async def evidence_stream(
+    request: Request,
+    event_type: Optional[str] = None,
+    service: Optional[str] = None,
+    trace_id: Optional[str] = None,
+    after: Optional[str] = None,
+    cursor: Optional[str] = None,
+) -> StreamingResponse:
+    """Live evidence records as server-sent events.
+
+    Filters take comma-separated values (`?event_type=query,answer`). Each
+    `evidence` event's id is a cursor; pass it back as `cursor` (or let the
+    browser send `Last-Event-ID`) to resume, or resume after a record with
+    `after=<record_hash>`. A subscriber that falls behind gets an `overflow`
+    event with the cursor to reconnect from.
+    """
+
+    filters = {
+        key: set(value.split(","))
+        for key, value in (("event_type", event_type), ("service", service), ("trace_id", trace_id))
+        if value
+    }
+    resume = None
+    if after:
+        resume = await asyncio.to_thread(find_record, LOG_DIR, after)
+        if resume is None:
+            raise HTTPException(status_code=404, detail="Record not found in recent evidence logs")
+    elif cursor or request.headers.get("last-event-id"):
+        try:
+            resume = parse_cursor(cursor or request.headers["last-event-id"])
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    return StreamingResponse(
+        stream(tailer, filters, resume=resume, buffer=STREAM_BUFFER),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 # Real implementation would provide HTML/JS for a simple dashboard and
 # delegate chat and query traffic to the rag-api service.
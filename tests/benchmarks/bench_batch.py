@@ -0,0 +1,96 @@
+"""Throughput of `/rag/query:batch` against a sequential `/rag/query` loop.
+
+Builds a synthetic index with the offline hashing embedder, then answers the
+same questions one request at a time and as a single batch through the RAG
+app in-process. Generation is the stub backend plus `--generation-ms` of
+simulated model time; evidence posting is disabled.
+
+    python -m tests.benchmarks.bench_batch --questions 500 --chunks 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+from tests.benchmarks.bench_retrieval import WORDS, build_corpus
+
+
+class SlowStubGenerator:
+    """Stub answers that take a fixed time, standing in for the model."""
+
+    model_name = "stub-model"
+    backend = "stub"
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+
+    async def generate(self, messages, *, max_tokens: int) -> str:
+        await asyncio.sleep(self.seconds)
+        return "stubbed answer"
+
+
+async def run(questions: List[str], args: argparse.Namespace) -> Dict[str, Any]:
+    from services.rag import main as rag
+    from services.rag.admission import AdmissionController
+
+    rag.generator = SlowStubGenerator(args.generation_ms / 1000)
+    rag.admission = AdmissionController(max_concurrency=args.concurrency, max_queue=len(questions))
+    rag._post_events = lambda events: None
+    rag._emit_events = lambda *a, **kw: None
+
+    transport = httpx.ASGITransport(app=rag.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://rag", timeout=None) as client:
+        t = time.perf_counter()
+        for q in questions:
+            (await client.post("/rag/query", json={"question": q})).raise_for_status()
+        sequential_s = time.perf_counter() - t
+
+        rag.answer_cache.clear()
+        t = time.perf_counter()
+        resp = await client.post("/rag/query:batch", json={"queries": [{"question": q} for q in questions]})
+        resp.raise_for_status()
+        batch_s = time.perf_counter() - t
+
+    failed = resp.json()["meta"]["failed"]
+    return {
+        "sequential": {"seconds": round(sequential_s, 3), "qps": round(len(questions) / sequential_s, 1)},
+        "batch": {"seconds": round(batch_s, 3), "qps": round(len(questions) / batch_s, 1), "failed": failed},
+        "speedup": round(sequential_s / batch_s, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=500)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--generation-ms", type=float, default=20.0)
+    parser.add_argument("--concurrency", type=int, default=4, help="admission.max_concurrency for the run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        identifiers = build_corpus(Path(tmp), args.chunks)
+        os.environ["FACTORY_INDEX_DIR"] = tmp
+        os.environ["FACTORY_EMBEDDING_BACKEND"] = "hashing"
+
+        rng = random.Random(13)
+        questions = [
+            f"Which {rng.choice(WORDS)} requirement does {rng.choice(identifiers)} describe?"
+            for _ in range(args.questions)
+        ]
+        report = asyncio.run(run(questions, args))
+
+    print(json.dumps({"questions": args.questions, "chunks": args.chunks, **report}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
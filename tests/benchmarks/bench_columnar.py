@@ -0,0 +1,181 @@
+"""Columnar evidence compaction: storage and scan time against raw JSONL.
+
+Writes a month of hash-chained synthetic evidence (queries, answers, index and
+evaluation events), compacts it with `services.evidence_logger.columnar`, and
+answers the same two questions both ways — p95 answer latency per model per
+week, and eval pass rate per test case:
+
+    python -m tests.benchmarks.bench_columnar --days 30 --answers-per-day 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from hashlib import sha256
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+
+from services.common.events import SCHEMA_VERSION
+from services.evidence_logger.columnar import compact, parse_where, partitions, query
+from tests.benchmarks.bench_retrieval import WORDS
+
+
+MODELS = ["llama3.1:8b", "qwen2.5:7b", "mistral:7b"]
+
+
+def _event(rng: random.Random, event_type: str, ts: datetime, payload: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "schema_version": SCHEMA_VERSION,
+        "event_id": str(uuid.UUID(int=rng.getrandbits(128), version=4)),
+        "event_type": event_type,
+        "service": "bench",
+        "timestamp": ts.isoformat(),
+        "trace_id": "%032x" % rng.getrandbits(128),
+        "payload": payload,
+    }
+
+
+def day_events(rng: random.Random, day: date, answers: int) -> List[Dict[str, Any]]:
+    start = datetime(day.year, day.month, day.day)
+    events = []
+    for i in range(answers):
+        ts = start + timedelta(seconds=86400 * i / answers)
+        question = " ".join(rng.choice(WORDS) for _ in range(8)) + "?"
+        events.append(_event(rng, "query", ts, {"question": question, "filters": None, "user_id": None}))
+        citations = [{"doc_id": f"doc-{rng.randrange(500)}", "chunk_id": f"c{rng.randrange(40)}", "score": 0.8}]
+        payload = {
+            "question": question,
+            "answer": " ".join(rng.choice(WORDS) for _ in range(60)),
+            "citations": citations,
+            "latency_ms": int(rng.lognormvariate(6.5, 0.5)),
+            "model_name": rng.choice(MODELS),
+            "abstained": rng.random() < 0.05,
+            "ttft_ms": None,
+            "cached": rng.random() < 0.2,
+            "stage_ms": {"embed": round(rng.uniform(5, 20), 2), "generate": round(rng.uniform(200, 900), 2)},
+        }
+        events.append(_event(rng, "answer", ts, payload))
+    for i in range(answers // 50):
+        payload = {"document_id": f"doc-{i}", "num_chunks": rng.randrange(1, 60), "embedding_model": "nomic"}
+        events.append(_event(rng, "index", start, {**payload, "status": "success", "error_message": None}))
+    for case in range(40):
+        passed = rng.random() < 0.9
+        payload = {
+            "evaluation_run_id": f"smoke-{day}",
+            "test_case_id": f"golden-{case}",
+            "score": 1.0 if passed else 0.5,
+            "passed": passed,
+            "failure_reasons": [] if passed else ["missing expected phrase"],
+            "reused_from": None,
+        }
+        events.append(_event(rng, "evaluation", start + timedelta(hours=3), payload))
+    return events
+
+
+def write_day(path: Path, events: List[Dict[str, Any]]) -> None:
+    """Write events the way the evidence logger does, hash chain included."""
+
+    prev_hash = None
+    with path.open("w", encoding="utf-8") as f:
+        for event in events:
+            env = {"timestamp": event["timestamp"], "prev_hash": prev_hash, "event": event}
+            env["record_hash"] = prev_hash = sha256(
+                json.dumps(env, sort_keys=True, separators=(",", ":")).encode("utf-8")
+            ).hexdigest()
+            f.write(json.dumps(env, separators=(",", ":")) + "\n")
+
+
+def _size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def scan_jsonl(log_dir: Path) -> Dict[str, Any]:
+    latency: Dict[Any, List[int]] = defaultdict(list)
+    evals: Dict[str, List[bool]] = defaultdict(list)
+    for path in sorted(log_dir.glob("evidence-*.jsonl")):
+        with path.open("r", encoding="utf-8") as f:
+            for line in f:
+                event = json.loads(line)["event"]
+                payload = event["payload"]
+                if event["event_type"] == "answer" and not payload["cached"]:
+                    week = "{}-W{:02d}".format(*datetime.fromisoformat(event["timestamp"]).isocalendar()[:2])
+                    latency[(week, payload["model_name"])].append(payload["latency_ms"])
+                elif event["event_type"] == "evaluation":
+                    evals[payload["test_case_id"]].append(payload["passed"])
+    return {
+        "latency": {k: float(np.percentile(v, 95)) for k, v in latency.items()},
+        "pass_rate": {k: sum(v) / len(v) for k, v in evals.items()},
+    }
+
+
+def scan_columnar(root: Path) -> Dict[str, Any]:
+    latency = query(
+        partitions(root, event_types=["answer"]),
+        where=[parse_where("payload.cached=false")],
+        group_by=["week", "payload.model_name"],
+        aggs=["p95:payload.latency_ms"],
+    )
+    evals = query(
+        partitions(root, event_types=["evaluation"]), group_by=["payload.test_case_id"], aggs=["mean:payload.passed"]
+    )
+    return {
+        "latency": {(r["week"], r["payload.model_name"]): r["p95:payload.latency_ms"] for r in latency},
+        "pass_rate": {r["payload.test_case_id"]: r["mean:payload.passed"] for r in evals},
+    }
+
+
+def _timed(fn, *args) -> tuple:
+    t = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--answers-per-day", type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(17)
+    with tempfile.TemporaryDirectory() as tmp:
+        logs, root = Path(tmp) / "logs", Path(tmp) / "columnar"
+        logs.mkdir()
+        first = date(2026, 1, 1)
+        records = 0
+        for d in range(args.days):
+            day = first + timedelta(days=d)
+            events = day_events(rng, day, args.answers_per_day)
+            records += len(events)
+            write_day(logs / f"evidence-{day}.jsonl", events)
+
+        _, compact_s = _timed(compact, logs, root)
+        raw, jsonl_s = _timed(scan_jsonl, logs)
+        col, columnar_s = _timed(scan_columnar, root)
+        expected = {**raw["latency"], **raw["pass_rate"]}
+        got = {**col["latency"], **col["pass_rate"]}
+        mismatched = [k for k, v in expected.items() if abs(got.get(k, -1) - v) > 1e-3]
+
+        report = {
+            "records": records,
+            "jsonl_mb": round(_size(logs) / 1e6, 1),
+            "columnar_mb": round(_size(root) / 1e6, 1),
+            "compact_seconds": round(compact_s, 2),
+            "query_seconds": {"jsonl": round(jsonl_s, 3), "columnar": round(columnar_s, 3)},
+            "speedup": round(jsonl_s / columnar_s, 1),
+            "groups": len(col["latency"]) + len(col["pass_rate"]),
+            "results_match": not mismatched and len(expected) == len(got),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Event construct+serialize throughput: pydantic models and `make_event` against `EventEncoder`.
+
+Each path produces the JSON bytes a bulk emitter posts to the Evidence Logger,
+for ingestion, answer and evaluation events:
+
+    python -m tests.benchmarks.bench_events --events 50000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, List, Tuple, Type
+
+from pydantic import BaseModel
+
+from services.common.events import (
+    AnswerEvent,
+    AnswerPayload,
+    BaseEvent,
+    EvaluationEvent,
+    EvaluationPayload,
+    EventEncoder,
+    IngestionEvent,
+    IngestionPayload,
+    make_event,
+)
+
+
+def payloads(kind: str, n: int) -> List[Dict[str, Any]]:
+    if kind == "ingestion":
+        return [
+            {"file_path": f"data/inbox/doc-{i}.md", "size_bytes": 1000 + i, "mime_type": "text/markdown", "sha256": f"{i:064x}"}
+            for i in range(n)
+        ]
+    if kind == "answer":
+        return [
+            {
+                "question": f"What does section {i} say?",
+                "answer": "The section describes the retention policy. " * 4,
+                "citations": [{"doc_id": f"doc-{i % 50}", "chunk_id": f"doc-{i % 50}#{i % 7}", "score": 0.8}],
+                "latency_ms": 400 + i % 300,
+                "model_name": "llama3.1:8b",
+                "stage_ms": {"embed": 12.5, "search": 3.1, "generate": 380.0},
+            }
+            for i in range(n)
+        ]
+    return [
+        {"evaluation_run_id": "smoke-1", "test_case_id": f"golden-{i}", "score": 1.0, "passed": True, "failure_reasons": []}
+        for i in range(n)
+    ]
+
+
+KINDS: Dict[str, Tuple[Type[BaseEvent], Type[BaseModel]]] = {
+    "ingestion": (IngestionEvent, IngestionPayload),
+    "answer": (AnswerEvent, AnswerPayload),
+    "evaluation": (EvaluationEvent, EvaluationPayload),
+}
+
+
+def _rate(fn: Callable[[], Any], n: int) -> float:
+    t = time.perf_counter()
+    fn()
+    return round(n / (time.perf_counter() - t))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=50000, help="Events per type and path")
+    args = parser.parse_args()
+
+    report = {}
+    for kind, (event_cls, payload_cls) in KINDS.items():
+        data = payloads(kind, args.events)
+        event_type = kind
+
+        def models() -> None:
+            for p in data:
+                ev = event_cls(event_type=event_type, service="bench", payload=payload_cls(**p))
+                json.dumps(make_event(ev, service="bench")).encode("utf-8")
+
+        encoder = EventEncoder(event_cls, service="bench")
+        models_rate = _rate(models, len(data))
+        encoder_rate = _rate(lambda: encoder.encode_many(data), len(data))
+        report[kind] = {
+            "model_make_event_per_s": models_rate,
+            "encoder_per_s": encoder_rate,
+            "speedup": round(encoder_rate / models_rate, 1),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Phrase-matching and bulk-grading throughput.
+
+Compares `PhraseMatcher` with one `in` scan per phrase over growing phrase
+lists, then grades a synthetic evidence log with `services.eval.bulk_grade`
+at several worker counts:
+
+    python -m tests.benchmarks.bench_grading --answers 50000 --phrases 10 100 1000 5000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from services.eval.bulk_grade import bulk_grade
+from services.eval.grading import Grading
+from services.eval.matcher import PhraseMatcher
+from tests.benchmarks.bench_retrieval import WORDS
+
+
+def synthetic_answer(rng: random.Random, words: int = 110) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def synthetic_phrases(rng: random.Random, n: int) -> List[str]:
+    return [f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(WORDS)} {i}" for i in range(n)]
+
+
+def bench_matching(answers: List[str], sizes: List[int], rng: random.Random) -> Dict[str, Any]:
+    report = {}
+    for n in sizes:
+        phrases = synthetic_phrases(rng, n)
+        matcher = PhraseMatcher(phrases)
+        t = time.perf_counter()
+        for a in answers:
+            matcher.find(a)
+        compiled = time.perf_counter() - t
+        t = time.perf_counter()
+        for a in answers:
+            [p for p in phrases if p in a]
+        scan = time.perf_counter() - t
+        report[str(n)] = {
+            "matcher_us": round(compiled / len(answers) * 1e6, 1),
+            "in_scan_us": round(scan / len(answers) * 1e6, 1),
+            "speedup": round(scan / compiled, 1),
+        }
+    return report
+
+
+def write_log(path: Path, n: int, rng: random.Random) -> None:
+    with path.open("w", encoding="utf-8") as f:
+        for i in range(n):
+            event = {
+                "event_type": "answer",
+                "event_id": str(i),
+                "payload": {"question": f"question {i % 50}", "answer": synthetic_answer(rng)},
+            }
+            f.write(json.dumps({"timestamp": "t", "prev_hash": None, "event": event, "record_hash": "x"}) + "\n")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--answers", type=int, default=50000, help="Answer events in the synthetic log")
+    parser.add_argument("--phrases", type=int, nargs="+", default=[10, 100, 1000, 5000])
+    parser.add_argument("--bulk-phrases", type=int, default=1000, help="Forbidden phrases for the bulk run")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    sample = [synthetic_answer(rng) for _ in range(min(args.answers, 2000))]
+    report: Dict[str, Any] = {"answer_chars": round(sum(map(len, sample)) / len(sample))}
+    report["matching"] = bench_matching(sample, args.phrases, rng)
+
+    grading = Grading(global_forbid_phrases=synthetic_phrases(rng, args.bulk_phrases))
+    with tempfile.TemporaryDirectory() as tmp:
+        log = Path(tmp) / "evidence-2026-01-01.jsonl"
+        write_log(log, args.answers, rng)
+        report["bulk"] = {}
+        for w in args.workers:
+            summary = bulk_grade([log], grading, {}, workers=w)
+            report["bulk"][f"workers={w}"] = {k: summary[k] for k in ("answers", "seconds", "answers_per_second")}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""Open-loop load generator for rag-api and the evidence logger.
+
+Replays a recorded trace at a fixed arrival rate, whether or not earlier
+requests have finished, so a slow server shows up as latency rather than a
+lower request rate. Latency is measured from each request's scheduled send
+time, which avoids coordinated omission. Traces are JSON lines of
+`/rag/query` bodies (`{"question": ...}`), evidence-log records or bare
+events. Query events become questions for rag-api, and any event can be
+replayed to the evidence logger.
+
+`--local` starts a throwaway stack with uvicorn: the evidence logger, rag-api,
+a fake Ollama (`tests/fakes/ollama.py`) with configurable model delays, a
+synthetic index, and a SQLite `FACTORY_DB_URL` in place of PostgreSQL.
+Its logs and rollups go to the temporary directory, never to `data/`. The
+synthetic trace repeats questions, so the report gives the share answered
+from the answer cache; `--no-cache` turns the cache off in the local stack.
+
+    python -m tests.benchmarks.bench_load --local --rate 20 --duration 30 --output load.json
+    python -m tests.benchmarks.bench_load --url http://localhost:8000 --trace data/logs/evidence-2026-01-01.jsonl
+    python -m tests.benchmarks.bench_load --local --baseline load.json   # compare with an earlier run
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+import httpx
+import yaml
+
+from services.common.events import QueryEvent, QueryPayload, make_event
+from tests.benchmarks.bench_retrieval import WORDS, build_corpus, percentiles
+
+
+ROOT = Path(__file__).resolve().parents[2]
+ENDPOINTS = {"rag": "/rag/query", "evidence": "/events"}
+
+
+# -- traces --------------------------------------------------------------------
+
+
+def load_trace(path: Path, target: str) -> List[Dict[str, Any]]:
+    """Request bodies for `target` from a trace file; records that don't apply are skipped."""
+
+    bodies: List[Dict[str, Any]] = []
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            event = record.get("event") if isinstance(record.get("event"), dict) else None
+            if event is None and "event_type" in record:
+                event = record
+            body = _body(target, record, event)
+            if body is not None:
+                bodies.append(body)
+    return bodies
+
+
+def _body(target: str, record: Dict[str, Any], event: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if target == "rag":
+        if event is not None:
+            if event.get("event_type") != "query":
+                return None
+            payload = event.get("payload") or {}
+            return {"question": payload.get("question", ""), "filters": payload.get("filters")}
+        if "question" in record:
+            keys = ("question", "top_k", "filters", "retrieval_mode", "priority")
+            return {k: record[k] for k in keys if k in record}
+        return None
+
+    if event is None:
+        if "question" not in record:
+            return None
+        query = QueryEvent(event_type="query", service="bench", payload=QueryPayload(question=record["question"]))
+        event = make_event(query, service="bench")
+    return {"events": [{"data": event}]}
+
+
+def synthetic_trace(identifiers: List[str], n: int, *, seed: int = 3) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    return [
+        {"question": f"Which {rng.choice(WORDS)} requirement does {rng.choice(identifiers)} describe?"}
+        for _ in range(n)
+    ]
+
+
+# -- open-loop runner ----------------------------------------------------------
+
+
+@dataclass
+class LoadResult:
+    sent: int = 0
+    dropped: int = 0  # not sent: --max-in-flight reached
+    latencies_ms: List[float] = field(default_factory=list)  # successful requests only
+    cached: int = 0  # successful responses with `meta.cached`
+    status: Counter = field(default_factory=Counter)
+    errors: Counter = field(default_factory=Counter)
+    max_lag_ms: float = 0.0
+    elapsed_s: float = 0.0
+
+
+async def run_load(
+    client: httpx.AsyncClient,
+    url: str,
+    bodies: List[Dict[str, Any]],
+    *,
+    rate: float,
+    duration: float,
+    poisson: bool = False,
+    max_in_flight: int = 1000,
+    timeout: float = 60.0,
+    seed: int = 1,
+) -> LoadResult:
+    """Send `rate * duration` requests on a fixed (or Poisson) schedule, cycling through `bodies`."""
+
+    loop = asyncio.get_running_loop()
+    rng = random.Random(seed)
+    result = LoadResult()
+    in_flight = 0
+    tasks = []
+
+    async def one(body: Dict[str, Any], scheduled: float) -> None:
+        nonlocal in_flight
+        try:
+            resp = await asyncio.wait_for(client.post(url, json=body), timeout=timeout)
+            result.status[resp.status_code] += 1
+            if resp.status_code < 400:
+                result.latencies_ms.append((loop.time() - scheduled) * 1000)
+                result.cached += _served_from_cache(resp)
+            else:
+                result.errors[f"http_{resp.status_code}"] += 1
+        except asyncio.TimeoutError:
+            result.errors["timeout"] += 1
+        except httpx.HTTPError as exc:
+            result.errors[type(exc).__name__] += 1
+        finally:
+            in_flight -= 1
+
+    start = loop.time()
+    offset = 0.0
+    for i in range(int(rate * duration)):
+        scheduled = start + offset
+        offset += rng.expovariate(rate) if poisson else 1.0 / rate
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        result.max_lag_ms = max(result.max_lag_ms, (loop.time() - scheduled) * 1000)
+        if in_flight >= max_in_flight:
+            result.dropped += 1
+            continue
+        in_flight += 1
+        result.sent += 1
+        tasks.append(asyncio.create_task(one(bodies[i % len(bodies)], scheduled)))
+
+    await asyncio.gather(*tasks)
+    result.elapsed_s = loop.time() - start
+    return result
+
+
+def _served_from_cache(resp: httpx.Response) -> bool:
+    try:
+        body = resp.json()
+    except ValueError:
+        return False
+    return isinstance(body, dict) and (body.get("meta") or {}).get("cached") is True
+
+
+def summarise(result: LoadResult) -> Dict[str, Any]:
+    attempted = result.sent + result.dropped
+    failed = sum(result.errors.values()) + result.dropped
+    latency: Dict[str, Any] = {}
+    if len(result.latencies_ms) >= 2:
+        latency = percentiles(result.latencies_ms)
+    if result.latencies_ms:
+        latency["max_ms"] = round(max(result.latencies_ms), 3)
+        latency["mean_ms"] = round(sum(result.latencies_ms) / len(result.latencies_ms), 3)
+    return {
+        "requests": attempted,
+        "succeeded": len(result.latencies_ms),
+        "dropped": result.dropped,
+        "error_rate": round(failed / attempted, 4) if attempted else 0.0,
+        "throughput_rps": round(len(result.latencies_ms) / result.elapsed_s, 2) if result.elapsed_s else 0.0,
+        "latency": latency,
+        "cache_hit_ratio": round(result.cached / len(result.latencies_ms), 4) if result.latencies_ms else 0.0,
+        "status": {str(k): v for k, v in sorted(result.status.items())},
+        "errors": dict(result.errors),
+        "max_schedule_lag_ms": round(result.max_lag_ms, 3),
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Relative change of the headline numbers against an earlier report."""
+
+    def pick(report: Dict[str, Any]) -> Dict[str, Optional[float]]:
+        s = report["summary"]
+        return {
+            "p50_ms": s["latency"].get("p50_ms"),
+            "p95_ms": s["latency"].get("p95_ms"),
+            "p99_ms": s["latency"].get("p99_ms"),
+            "throughput_rps": s["throughput_rps"],
+            "error_rate": s["error_rate"],
+        }
+
+    now, then = pick(current), pick(baseline)
+    out = {}
+    for key in now:
+        a, b = then[key], now[key]
+        change = round((b - a) / a * 100, 1) if a and b is not None else None
+        out[key] = {"baseline": a, "current": b, "change_pct": change}
+    return out
+
+
+# -- local stack ---------------------------------------------------------------
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+@contextmanager
+def local_stack(tmp: Path, args: argparse.Namespace) -> Iterator[Dict[str, Any]]:
+    """Evidence logger, rag-api and fake Ollama as uvicorn processes on free ports."""
+
+    identifiers = build_corpus(tmp / "index", args.chunks)
+    ports = {name: _free_port() for name in ("ollama", "evidence", "rag")}
+    env = {
+        **os.environ,
+        "PYTHONPATH": str(ROOT),
+        "FACTORY_INDEX_DIR": str(tmp / "index"),
+        "FACTORY_OLLAMA_HOST": "127.0.0.1",
+        "FACTORY_OLLAMA_PORT": str(ports["ollama"]),
+        "FACTORY_EMBEDDING_BACKEND": "ollama",
+        "FACTORY_GENERATION_BACKEND": "ollama",
+        "FACTORY_EVIDENCE_LOGGER_URL": f"http://127.0.0.1:{ports['evidence']}/events",
+        "FACTORY_DB_URL": f"sqlite:///{tmp / 'factory.db'}",
+        "EVIDENCE_LOG_DIR": str(tmp / "logs"),
+        "EVIDENCE_ROLLUP_DIR": str(tmp / "rollups"),
+        "FAKE_OLLAMA_FIRST_TOKEN_DELAY": str(args.model_first_token_ms / 1000),
+        "FAKE_OLLAMA_TOKEN_DELAY": str(args.model_token_ms / 1000),
+    }
+    if args.no_cache:
+        env["FACTORY_CONFIG_DIR"] = str(_config_without_cache(tmp / "config"))
+    apps = {
+        "ollama": ("tests.fakes.ollama:app", "/api/tags"),
+        "evidence": ("services.evidence_logger.main:app", "/healthz"),
+        "rag": ("services.rag.main:app", "/healthz"),
+    }
+    procs: List[subprocess.Popen] = []
+    try:
+        for name, (app, health) in apps.items():
+            cmd = [sys.executable, "-m", "uvicorn", app, "--port", str(ports[name]), "--log-level", "warning"]
+            proc = subprocess.Popen(cmd, cwd=ROOT, env=env)
+            procs.append(proc)
+            _wait_ready(f"http://127.0.0.1:{ports[name]}{health}", proc)
+        yield {
+            "identifiers": identifiers,
+            "urls": {name: f"http://127.0.0.1:{port}" for name, port in ports.items()},
+        }
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def _config_without_cache(path: Path) -> Path:
+    """A copy of `config/` with the answer cache disabled."""
+
+    shutil.copytree(ROOT / "config", path)
+    rag_path = path / "rag.yaml"
+    rag = yaml.safe_load(rag_path.read_text(encoding="utf-8")) or {}
+    rag["cache"] = {**(rag.get("cache") or {}), "enabled": False}
+    rag_path.write_text(yaml.safe_dump(rag, sort_keys=False), encoding="utf-8")
+    return path
+
+
+# -- CLI -----------------------------------------------------------------------
+
+
+async def _drive(url: str, bodies: List[Dict[str, Any]], args: argparse.Namespace) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+        if args.warmup:
+            await run_load(
+                client,
+                url,
+                bodies,
+                rate=args.rate,
+                duration=args.warmup,
+                poisson=args.poisson,
+                max_in_flight=args.max_in_flight,
+                timeout=args.timeout,
+            )
+        result = await run_load(
+            client,
+            url,
+            bodies,
+            rate=args.rate,
+            duration=args.duration,
+            poisson=args.poisson,
+            max_in_flight=args.max_in_flight,
+            timeout=args.timeout,
+        )
+    return summarise(result)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", choices=sorted(ENDPOINTS), default="rag")
+    parser.add_argument("--url", help="Base URL of the target service (not needed with --local)")
+    parser.add_argument("--local", action="store_true", help="Start a local stack with fake Ollama and SQLite")
+    parser.add_argument("--trace", type=Path, help="JSONL trace to replay (default with --local: synthetic questions)")
+    parser.add_argument("--rate", type=float, default=10.0, help="Requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--warmup", type=float, default=0.0, help="Seconds of unrecorded load first")
+    parser.add_argument("--poisson", action="store_true", help="Exponential inter-arrival times, not a fixed interval")
+    parser.add_argument("--max-in-flight", type=int, default=512)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds per request")
+    parser.add_argument("--chunks", type=int, default=5000, help="Synthetic index size with --local")
+    parser.add_argument("--model-first-token-ms", type=float, default=50.0, help="Fake Ollama delay with --local")
+    parser.add_argument("--model-token-ms", type=float, default=2.0, help="Fake Ollama per-token delay with --local")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the answer cache with --local")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here")
+    parser.add_argument("--baseline", type=Path, help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    if not args.local and not args.url:
+        parser.error("--url is required unless --local is given")
+    if not args.local and not args.trace:
+        parser.error("--trace is required unless --local is given")
+
+    with tempfile.TemporaryDirectory() as tmp, (
+        local_stack(Path(tmp), args) if args.local else _no_stack()
+    ) as stack:
+        base = args.url or stack["urls"][args.target]
+        if args.trace:
+            bodies = load_trace(args.trace, args.target)
+        else:
+            questions = synthetic_trace(stack["identifiers"], 1000)
+            bodies = [_body(args.target, q, None) for q in questions]
+        if not bodies:
+            raise SystemExit(f"no {args.target} requests in {args.trace}")
+        summary = asyncio.run(_drive(base + ENDPOINTS[args.target], bodies, args))
+
+    report: Dict[str, Any] = {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "config": {
+            "target": args.target,
+            "local": args.local,
+            "trace": str(args.trace) if args.trace else "synthetic",
+            "rate": args.rate,
+            "duration_s": args.duration,
+            "poisson": args.poisson,
+        },
+        "summary": summary,
+    }
+    if args.local:
+        report["config"].update(
+            model_first_token_ms=args.model_first_token_ms,
+            model_token_ms=args.model_token_ms,
+            answer_cache=not args.no_cache,
+        )
+    if args.baseline:
+        report["vs_baseline"] = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")))
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(text + "\n", encoding="utf-8")
+    print(text)
+
+
+@contextmanager
+def _no_stack() -> Iterator[Dict[str, Any]]:
+    yield {}
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Request latency under heavy logging: synchronous handler against the queued pipeline.
+
+Serves a FastAPI route that writes `--lines` INFO records per request and
+measures per-request latency through the ASGI transport with no logging, with
+the old synchronous `StreamHandler` (format and write on the event loop), and
+with `LogPipeline` (enqueue only). The sink can be slowed down per write to
+stand in for a congested stdout pipe:
+
+    python -m tests.benchmarks.bench_logging --requests 2000 --lines 20 --sink-delay-us 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import logging
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from fastapi import FastAPI
+
+from services.common.logging import LOG_RECORDS_DROPPED, JsonFormatter, LogPipeline, TraceIdFilter
+
+
+class SlowSink(io.TextIOBase):
+    """Discards text, blocking `delay` seconds per write (GIL released) like a full pipe would."""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.lines = 0
+
+    def write(self, s: str) -> int:
+        if self.delay:
+            time.sleep(self.delay)
+        self.lines += s.count("\n")
+        return len(s)
+
+
+def build_app(logger: logging.Logger, lines: int) -> FastAPI:
+    app = FastAPI()
+
+    async def handle() -> Dict[str, str]:
+        for i in range(lines):
+            logger.info("stage %d finished", i, extra={"request_id": "req-1"})
+        return {"status": "ok"}
+
+    app.add_api_route("/work", handle)
+    return app
+
+
+async def run(app: FastAPI, requests: int) -> List[float]:
+    latencies = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(requests):
+            start = time.perf_counter()
+            await client.get("/work")
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def summarise(latencies: List[float]) -> Dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "p50_ms": round(statistics.median(ordered), 3),
+        "p99_ms": round(ordered[int(len(ordered) * 0.99) - 1], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+    }
+
+
+def scenario(mode: str, args: argparse.Namespace, queue_size: Optional[int] = None) -> Dict[str, Any]:
+    sink = SlowSink(args.sink_delay_us / 1e6)
+    logger = logging.getLogger(f"bench.{mode}.{queue_size}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    pipeline = None
+    if mode == "sync":
+        handler: logging.Handler = logging.StreamHandler(sink)
+        handler.setFormatter(JsonFormatter(fields={"extra_keys": ["request_id"]}))
+        handler.addFilter(TraceIdFilter())
+        logger.addHandler(handler)
+    elif mode == "queue":
+        cfg = {"fields": {"extra_keys": ["request_id"]}, "queue": {"max_size": queue_size or 10000}}
+        pipeline = LogPipeline(cfg, stream=sink).start()
+        logger.addHandler(pipeline.handler)
+    else:
+        logger.disabled = True
+
+    dropped = LOG_RECORDS_DROPPED.labels(reason="overload")
+    before = dropped.value
+    latencies = asyncio.run(run(build_app(logger, args.lines), args.requests))
+    if pipeline is not None:
+        pipeline.stop()
+    return {**summarise(latencies), "lines_written": sink.lines, "dropped": int(dropped.value - before)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=20, help="Log records per request")
+    parser.add_argument("--sink-delay-us", type=float, default=50.0, help="Time the sink spends per write")
+    parser.add_argument("--small-queue", type=int, default=1000, help="Queue size for the overload scenario")
+    args = parser.parse_args()
+
+    report = {
+        "none": scenario("none", args),
+        "sync": scenario("sync", args),
+        "queue": scenario("queue", args),
+        f"queue_max_{args.small_queue}": scenario("queue", args, queue_size=args.small_queue),
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
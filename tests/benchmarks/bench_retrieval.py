@@ -0,0 +1,126 @@
+"""Query-latency benchmark for lexical, vector and hybrid retrieval.
+
+Queries go through `build_filter` with `config/rag.yaml`, as the RAG API
+does, so the default `allowed_mime_types` filter is part of every run. Chunks
+carry a `mime_type` (markdown or plain text, both allowed) and are tagged
+`team-<i % 100>`, so the `hybrid+filter` run measures a 1%-selective tag
+filter applied before the scan and `hybrid+unfiltered` the bare search.
+
+Builds a synthetic corpus in a temporary directory using the offline hashing
+embedder and prints latency percentiles per retrieval mode as JSON:
+
+    python -m tests.benchmarks.bench_retrieval --chunks 20000 --queries 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from services.common.config import load_config
+from services.common.lexical_index import LexicalIndex
+from services.common.vector_index import ChunkRecord, VectorIndex
+from services.indexer.embedder import HashingEmbedder
+from services.rag.retrieval import Retriever, build_filter
+
+
+WORDS = (
+    "access review policy control evidence audit vendor incident change risk "
+    "backup encryption password rotation network segment firewall logging "
+    "retention payment card cardholder scope quarterly annual exception"
+).split()
+
+MIME_TYPES = ("text/markdown", "text/plain")
+
+
+def build_corpus(root: Path, n_chunks: int, *, docs_per_batch: int = 500, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    embedder = HashingEmbedder()
+    vectors = VectorIndex(root / "vectors")
+    lexical = LexicalIndex(root / "lexical")
+    identifiers: List[str] = []
+    for start in range(0, n_chunks, docs_per_batch):
+        doc_id = f"doc-{start // docs_per_batch}"
+        records = []
+        for i in range(start, min(start + docs_per_batch, n_chunks)):
+            ident = f"POL-{i:05d}"
+            identifiers.append(ident)
+            text = " ".join(rng.choice(WORDS) for _ in range(120)) + f" Reference {ident}."
+            records.append(
+                ChunkRecord(
+                    chunk_id=f"{doc_id}#{i - start}",
+                    document_id=doc_id,
+                    index=i - start,
+                    text=text,
+                    metadata={"tags": [f"team-{i % 100}"], "mime_type": MIME_TYPES[i % len(MIME_TYPES)]},
+                )
+            )
+        vectors.upsert_document(doc_id, records, embedder.embed([r.text for r in records]))
+        for rec in records:
+            lexical.add(rec.chunk_id, rec.text)
+        lexical.commit()
+    return identifiers
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    qs = statistics.quantiles(samples, n=100)
+    return {"p50_ms": round(qs[49], 3), "p95_ms": round(qs[94], 3), "p99_ms": round(qs[98], 3)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        t0 = time.perf_counter()
+        identifiers = build_corpus(root, args.chunks)
+        build_s = time.perf_counter() - t0
+
+        vectors, lexical = VectorIndex(root / "vectors"), LexicalIndex(root / "lexical")
+        retriever = Retriever(vectors, lexical, HashingEmbedder(), embedding_model="hashing")
+        rng = random.Random(11)
+        questions = [
+            f"Which {rng.choice(WORDS)} requirement does {rng.choice(identifiers)} describe?"
+            for _ in range(args.queries)
+        ]
+
+        report: Dict[str, object] = {
+            "chunks": args.chunks,
+            "segments": len(lexical.segments),
+            "build_seconds": round(build_s, 2),
+        }
+        rag_cfg = load_config("rag")
+        defaults = build_filter(None, rag_cfg)
+        runs = [
+            ("lexical", "lexical", defaults),
+            ("vector", "vector", defaults),
+            ("hybrid", "hybrid", defaults),
+            ("hybrid+filter", "hybrid", build_filter({"tags": ["team-7"]}, rag_cfg)),
+            ("hybrid+unfiltered", "hybrid", None),
+        ]
+        for label, mode, flt in runs:
+            samples = []
+            returned = 0
+            for q in questions:
+                t = time.perf_counter()
+                results = asyncio.run(retriever.retrieve(q, top_k=args.top_k, min_score=0.0, mode=mode, filters=flt))
+                samples.append((time.perf_counter() - t) * 1000)
+                returned += len(results)
+            report[label] = {**percentiles(samples), "avg_results": round(returned / len(questions), 2)}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Cold start of the batch tools: the `factory` CLI against importing each tool directly.
+
+Every measurement is a fresh interpreter, timed from spawn to exit, so it
+includes interpreter start-up and site packages. The no-op run (`factory`
+with no command, which only lists the commands) is checked against
+`--budget-ms` and the script exits non-zero when it is over:
+
+    python -m tests.benchmarks.bench_startup --runs 10 --budget-ms 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+from services.factory import COMMANDS
+
+
+def cold_start_ms(cmd: List[str], runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(times), 1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="Interpreter launches per measurement")
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="Allowed median for the no-op run")
+    args = parser.parse_args()
+
+    py = sys.executable
+    report: Dict[str, object] = {
+        "interpreter_ms": cold_start_ms([py, "-c", "pass"], args.runs),
+        "factory_noop_ms": cold_start_ms([py, "-m", "services.factory"], args.runs),
+        "budget_ms": args.budget_ms,
+    }
+    report["commands"] = {
+        name: {
+            "factory_help_ms": cold_start_ms([py, "-m", "services.factory", name, "--help"], args.runs),
+            "import_module_ms": cold_start_ms([py, "-c", f"import {module}"], args.runs),
+        }
+        for name, (module, _) in COMMANDS.items()
+    }
+    report["within_budget"] = report["factory_noop_ms"] <= args.budget_ms
+    print(json.dumps(report, indent=2))
+    if not report["within_budget"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
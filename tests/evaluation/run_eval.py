@@ -1,15 +1,40 @@
+"""Evaluation runner for the RAG API.
+
+Runs a suite from `config/eval.yaml` against `POST /rag/query` with bounded
+concurrency, a per-attempt timeout and retries. Each result is appended to a
+JSONL run file as soon as it is graded, so a crashed run can be resumed with
+`--resume <run file>`; cases that already have a result are not asked again.
+
+Runs are incremental by default: a case whose fingerprint (question, model,
+prompt template hash and the versions of the documents it cited) matches the
+latest run of the suite reuses that result, re-graded, and is marked with
+`reused_from`. `--full` asks every case, e.g. for releases.
+
+    python -m tests.evaluation.run_eval --suite nightly --concurrency 8
+"""
+
 from __future__ import annotations
 
 import argparse
+import asyncio
+import hashlib
 import json
-from dataclasses import dataclass
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 
 import httpx
 import yaml
 
-from services.common.events import EvaluationEvent, EvaluationPayload, make_event
+from services.common.config import load_config
+from services.common.events import EvaluationEvent, EventEncoder, batch_body
+from services.eval.grading import Grading
+
+
+RETRIEVAL_MODES = ("vector", "lexical", "hybrid")
 
 
 @dataclass
@@ -18,6 +43,45 @@ class TestCase:
     question: str
     expected_contains: List[str]
     forbid_phrases: List[str]
+    expected_doc_ids: List[str] = field(default_factory=list)
+
+
+@dataclass
+class Suite:
+    name: str
+    questions_file: Path
+    max_cases: Optional[int] = None
+    score_threshold: float = 0.8
+    allow_failures: int = 0
+
+    @classmethod
+    def from_config(cls, name: str, cfg: Dict[str, Any]) -> "Suite":
+        suites = cfg.get("suites", {}) or {}
+        if name not in suites:
+            raise SystemExit(f"unknown suite {name!r}; configured: {', '.join(sorted(suites)) or 'none'}")
+        s = suites[name] or {}
+        return cls(
+            name=name,
+            questions_file=Path(s.get("questions_file", "tests/evaluation/questions.yaml")),
+            max_cases=s.get("max_cases"),
+            score_threshold=float(s.get("score_threshold", 0.8)),
+            allow_failures=int(s.get("allow_failures", 0)),
+        )
+
+
+@dataclass
+class RunOptions:
+    rag_url: str
+    concurrency: int = 4
+    timeout_seconds: float = 60.0
+    retries: int = 2
+    backoff_seconds: float = 1.0
+
+
+class RetryableStatus(Exception):
+    def __init__(self, status: int, retry_after: Optional[float]) -> None:
+        super().__init__(f"HTTP {status}")
+        self.retry_after = retry_after
 
 
 def load_cases(path: Path) -> List[TestCase]:
@@ -30,81 +94,419 @@ def load_cases(path: Path) -> List[TestCase]:
                 question=item["question"],
                 expected_contains=item.get("expected_contains", []),
                 forbid_phrases=item.get("forbid_phrases", []),
+                expected_doc_ids=item.get("expected_doc_ids", []),
             )
         )
     return cases
 
 
-def grade_answer(answer: str, case: TestCase) -> Dict[str, Any]:
-    score = 1.0
-    failures: List[str] = []
+def grade_answer(answer: str, case: TestCase, grading: Optional[Grading] = None) -> Dict[str, Any]:
+    return (grading or Grading()).grade(answer, case.expected_contains, case.forbid_phrases)
 
-    for expected in case.expected_contains:
-        if expected not in answer:
-            failures.append(f"missing expected substring: {expected!r}")
-            score -= 0.5 / max(1, len(case.expected_contains))
 
-    for phrase in case.forbid_phrases:
-        if phrase in answer:
-            failures.append(f"forbidden phrase present: {phrase!r}")
-            score -= 0.5 / max(1, len(case.forbid_phrases))
+def retrieval_metrics(cited_doc_ids: List[str], case: TestCase) -> Dict[str, float]:
+    """Hit rate and reciprocal rank of the first expected document among citations."""
 
-    score = max(0.0, min(1.0, score))
-    return {"score": score, "failures": failures}
+    for rank, doc_id in enumerate(cited_doc_ids, start=1):
+        if doc_id in case.expected_doc_ids:
+            return {"hit": 1.0, "rr": 1.0 / rank}
+    return {"hit": 0.0, "rr": 0.0}
 
 
-def main() -> None:
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--suite", default="smoke")
-    parser.add_argument("--questions", default="tests/evaluation/questions.yaml")
-    parser.add_argument("--rag-url", default="http://localhost:8000/rag/query")
-    parser.add_argument("--evidence-logger-url", default="http://localhost:9000/events")
-    args = parser.parse_args()
+def compare_retrieval(client: httpx.Client, rag_url: str, cases: List[TestCase]) -> Dict[str, Dict[str, float]]:
+    """Measure hit rate and MRR per retrieval mode over cases with `expected_doc_ids`."""
+
+    labelled = [c for c in cases if c.expected_doc_ids]
+    summary: Dict[str, Dict[str, float]] = {}
+    for mode in RETRIEVAL_MODES:
+        hits = rr = 0.0
+        for case in labelled:
+            resp = client.post(rag_url, json={"question": case.question, "retrieval_mode": mode, "priority": "eval"})
+            resp.raise_for_status()
+            m = retrieval_metrics([c["doc_id"] for c in resp.json().get("citations", [])], case)
+            hits += m["hit"]
+            rr += m["rr"]
+        n = max(1, len(labelled))
+        summary[mode] = {"cases": len(labelled), "hit_rate": hits / n, "mrr": rr / n}
+    return summary
+
+
+# -- run file ------------------------------------------------------------------
+
+
+class RunLog:
+    """Append-only JSONL record of one run: a `run` header, then one `result` line per graded case."""
+
+    def __init__(self, path: Path, header: Dict[str, Any], results: Dict[str, Dict[str, Any]]) -> None:
+        self.path = path
+        self.header = header
+        self.results = results
+
+    @property
+    def run_id(self) -> str:
+        return self.header["evaluation_run_id"]
+
+    @classmethod
+    def create(cls, path: Path, header: Dict[str, Any]) -> "RunLog":
+        path.parent.mkdir(parents=True, exist_ok=True)
+        log = cls(path, header, {})
+        log._append({"type": "run", **header})
+        return log
+
+    @classmethod
+    def load(cls, path: Path) -> "RunLog":
+        """Read a run file; a line cut short by a crash is dropped."""
+
+        header: Dict[str, Any] = {}
+        results: Dict[str, Dict[str, Any]] = {}
+        text = path.read_text(encoding="utf-8")
+        for line in text.splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            kind = record.pop("type", None)
+            if kind == "run":
+                header = record
+            elif kind == "result":
+                results[record["id"]] = record
+        if not header:
+            raise ValueError(f"{path} is not an evaluation run file")
+        return cls(path, header, results)
+
+    @classmethod
+    def resume(cls, path: Path) -> "RunLog":
+        log = cls.load(path)
+        if not path.read_text(encoding="utf-8").endswith("\n"):
+            with path.open("a", encoding="utf-8") as f:
+                f.write("\n")
+        return log
+
+    def completed(self) -> set:
+        return {case_id for case_id, r in self.results.items() if not r.get("error")}
+
+    def record(self, result: Dict[str, Any]) -> None:
+        self.results[result["id"]] = result
+        self._append({"type": "result", **result})
+
+    def finish(self, summary: Dict[str, Any]) -> None:
+        self._append({"type": "summary", **summary})
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def new_run_id(suite: str) -> str:
+    return f"{suite}-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}-{uuid.uuid4().hex[:8]}"
+
+
+def latest_run(output_dir: Path, suite: str, *, exclude: Optional[Path] = None) -> Optional[RunLog]:
+    """Most recently started run of `suite` in `output_dir`, other than `exclude`."""
+
+    runs = []
+    for path in output_dir.glob("*.jsonl"):
+        if exclude is not None and path.resolve() == exclude.resolve():
+            continue
+        try:
+            log = RunLog.load(path)
+        except (ValueError, KeyError):
+            continue
+        if log.header.get("suite") == suite:
+            runs.append(log)
+    return max(runs, key=lambda log: log.header.get("started_at", ""), default=None)
+
 
-    cases = load_cases(Path(args.questions))
+# -- incremental runs ----------------------------------------------------------
 
-    results: List[Dict[str, Any]] = []
 
-    with httpx.Client(timeout=15.0) as client:
-        for case in cases:
-            resp = client.post(args.rag_url, json={"question": case.question})
+def fingerprint(question: str, model_name: str, prompt_hash: str, doc_versions: Dict[str, Optional[int]]) -> str:
+    material = json.dumps([question, model_name, prompt_hash, sorted(doc_versions.items())], separators=(",", ":"))
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()[:16]
+
+
+async def reusable_results(
+    client: httpx.AsyncClient,
+    info_url: str,
+    cases: List[TestCase],
+    previous: RunLog,
+    *,
+    grading: Grading,
+    threshold: float,
+) -> Dict[str, Dict[str, Any]]:
+    """Results from `previous` whose case fingerprint is unchanged, re-graded against the current case.
+
+    Only answers that cited documents qualify: an uncited answer depends on
+    what retrieval finds, which no recorded version captures.
+    """
+
+    candidates = {}
+    for case in cases:
+        prev = previous.results.get(case.id)
+        if prev and not prev.get("error") and prev.get("fingerprint") and prev.get("doc_versions"):
+            candidates[case.id] = (case, prev)
+    if not candidates:
+        return {}
+
+    doc_ids = sorted({d for _, prev in candidates.values() for d in prev["doc_versions"]})
+    resp = await client.get(info_url, params={"doc_id": doc_ids}, timeout=15.0)
+    resp.raise_for_status()
+    info = resp.json()
+
+    reused = {}
+    for case_id, (case, prev) in candidates.items():
+        current = {d: info["document_versions"].get(d) for d in prev["doc_versions"]}
+        if fingerprint(case.question, info["model_name"], info["prompt_hash"], current) != prev["fingerprint"]:
+            continue
+        grade = grade_answer(prev["answer"], case, grading)
+        reused[case_id] = {
+            **prev,
+            "score": grade["score"],
+            "passed": grade["score"] >= threshold and not grade["failures"],
+            "failures": grade["failures"],
+            "reused_from": prev.get("reused_from") or previous.run_id,
+        }
+    return reused
+
+
+# -- execution -----------------------------------------------------------------
+
+
+async def ask(client: httpx.AsyncClient, case: TestCase, options: RunOptions) -> Dict[str, Any]:
+    """POST one question, retrying timeouts, transport errors, 429 and 5xx with backoff."""
+
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            resp = await asyncio.wait_for(
+                client.post(options.rag_url, json={"question": case.question, "priority": "eval"}),
+                timeout=options.timeout_seconds,
+            )
+            if resp.status_code == 429 or resp.status_code >= 500:
+                retry_after = resp.headers.get("Retry-After")
+                raise RetryableStatus(resp.status_code, float(retry_after) if retry_after else None)
             resp.raise_for_status()
-            body = resp.json()
-            answer = body.get("answer", "")
-            grade = grade_answer(answer, case)
-
-            passed = grade["score"] >= 0.8 and not grade["failures"]
-
-            results.append(
-                {
-                    "id": case.id,
-                    "score": grade["score"],
-                    "passed": passed,
-                    "failures": grade["failures"],
-                }
+            return {"body": resp.json(), "attempts": attempt}
+        except (asyncio.TimeoutError, httpx.TransportError, RetryableStatus) as exc:
+            if attempt > options.retries:
+                raise
+            delay = getattr(exc, "retry_after", None) or options.backoff_seconds * 2 ** (attempt - 1)
+            await asyncio.sleep(delay)
+
+
+async def evaluate_case(
+    client: httpx.AsyncClient,
+    case: TestCase,
+    *,
+    options: RunOptions,
+    grading: Grading,
+    threshold: float,
+) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        reply = await ask(client, case, options)
+    except (asyncio.TimeoutError, httpx.HTTPError, RetryableStatus) as exc:
+        error = f"{type(exc).__name__}: {exc}".rstrip(": ")
+        return {
+            "id": case.id,
+            "score": 0.0,
+            "passed": False,
+            "failures": [f"request failed: {error}"],
+            "error": error,
+            "latency_ms": int((time.perf_counter() - start) * 1000),
+        }
+
+    body = reply["body"]
+    answer = body.get("answer", "")
+    meta = body.get("meta", {}) or {}
+    doc_versions = {c["doc_id"]: c.get("doc_version") for c in body.get("citations", [])}
+    grade = grade_answer(answer, case, grading)
+    return {
+        "id": case.id,
+        "score": grade["score"],
+        "passed": grade["score"] >= threshold and not grade["failures"],
+        "failures": grade["failures"],
+        "attempts": reply["attempts"],
+        "latency_ms": int((time.perf_counter() - start) * 1000),
+        "answer": answer,
+        "model_name": meta.get("model_name"),
+        "prompt_hash": meta.get("prompt_hash"),
+        "doc_versions": doc_versions,
+        "fingerprint": fingerprint(
+            case.question, meta.get("model_name", ""), meta.get("prompt_hash", ""), doc_versions
+        ),
+    }
+
+
+async def run_cases(
+    cases: List[TestCase],
+    log: RunLog,
+    *,
+    client: httpx.AsyncClient,
+    options: RunOptions,
+    grading: Grading,
+    threshold: float,
+    reuse: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """Evaluate the cases `log` has no result for yet; return results for all cases in order.
+
+    Results in `reuse` are recorded as they are instead of asking again.
+    """
+
+    limit = asyncio.Semaphore(max(1, options.concurrency))
+    done = log.completed()
+    for case_id, result in (reuse or {}).items():
+        if case_id not in done:
+            log.record(result)
+            done.add(case_id)
+
+    async def one(case: TestCase) -> None:
+        async with limit:
+            result = await evaluate_case(client, case, options=options, grading=grading, threshold=threshold)
+        log.record(result)
+
+    await asyncio.gather(*(one(c) for c in cases if c.id not in done))
+    return [log.results[c.id] for c in cases]
+
+
+def summarise(results: List[Dict[str, Any]], suite: Suite) -> Dict[str, Any]:
+    failed = [r["id"] for r in results if not r["passed"]]
+    return {
+        "cases": len(results),
+        "passed": len(results) - len(failed),
+        "failed": failed,
+        "errors": sum(1 for r in results if r.get("error")),
+        "reused": sum(1 for r in results if r.get("reused_from")),
+        "mean_score": round(sum(r["score"] for r in results) / max(1, len(results)), 4),
+        "suite_passed": len(failed) <= suite.allow_failures,
+    }
+
+
+def evaluation_events(results: List[Dict[str, Any]], run_id: str) -> List[bytes]:
+    encoder = EventEncoder(EvaluationEvent, service="eval")
+    return encoder.encode_many(
+        {
+            "evaluation_run_id": run_id,
+            "test_case_id": r["id"],
+            "score": r["score"],
+            "passed": r["passed"],
+            "failure_reasons": r["failures"],
+            "reused_from": r.get("reused_from"),
+        }
+        for r in results
+    )
+
+
+async def run_suite(args: argparse.Namespace, cfg: Dict[str, Any]) -> Dict[str, Any]:
+    if args.resume:
+        log = RunLog.resume(Path(args.resume))
+        suite = Suite.from_config(log.header["suite"], cfg)
+    else:
+        suite = Suite.from_config(args.suite, cfg)
+        run_id = new_run_id(suite.name)
+        log = RunLog.create(
+            Path(args.output_dir) / f"{run_id}.jsonl",
+            {
+                "evaluation_run_id": run_id,
+                "suite": suite.name,
+                "rag_url": args.rag_url,
+                "full": args.full,
+                "questions": args.questions,
+                "started_at": datetime.now(timezone.utc).isoformat(),
+            },
+        )
+    # A resumed run keeps the settings it started with, not this invocation's.
+    rag_url = log.header.get("rag_url", args.rag_url)
+    full = log.header.get("full", args.full)
+    questions = log.header.get("questions", args.questions)
+
+    cases = load_cases(Path(questions or suite.questions_file))
+    if suite.max_cases is not None:
+        cases = cases[: suite.max_cases]
+
+    grading = Grading.from_config(cfg.get("grading", {}) or {})
+    options = RunOptions(
+        rag_url=rag_url,
+        concurrency=args.concurrency,
+        timeout_seconds=args.timeout,
+        retries=args.retries,
+    )
+    limits = httpx.Limits(max_connections=max(1, args.concurrency))
+    async with httpx.AsyncClient(timeout=None, limits=limits) as client:
+        reuse: Dict[str, Dict[str, Any]] = {}
+        previous = None if full else latest_run(log.path.parent, suite.name, exclude=log.path)
+        if previous is not None:
+            info_url = args.rag_info_url or rag_url.rsplit("/rag/", 1)[0] + "/rag/info"
+            reuse = await reusable_results(
+                client, info_url, cases, previous, grading=grading, threshold=suite.score_threshold
             )
 
-    # Emit EvaluationEvent batch
-    events = []
-    for r in results:
-        payload = EvaluationPayload(
-            evaluation_run_id="local-run",
-            test_case_id=r["id"],
-            score=r["score"],
-            passed=r["passed"],
-            failure_reasons=r["failures"],
+        results = await run_cases(
+            cases,
+            log,
+            client=client,
+            options=options,
+            grading=grading,
+            threshold=suite.score_threshold,
+            reuse=reuse,
         )
-        ev = EvaluationEvent(event_type="evaluation", service="eval", payload=payload)
-        events.append({"data": make_event(ev, service="eval")})
 
-    with httpx.Client(timeout=15.0) as client:
-        if events:
-            client.post(args.evidence_logger_url, json={"events": events}).raise_for_status()
+        events = evaluation_events(results, log.run_id)
+        if events and args.evidence_logger_url:
+            resp = await client.post(
+                args.evidence_logger_url,
+                content=batch_body(events),
+                headers={"content-type": "application/json"},
+                timeout=15.0,
+            )
+            resp.raise_for_status()
+
+    summary = {"evaluation_run_id": log.run_id, "suite": suite.name, "run_file": str(log.path), **summarise(results, suite)}
+    log.finish(summary)
+    return {**summary, "results": results}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    cfg = load_config("eval")
+    runner = cfg.get("runner", {}) or {}
+
+    parser = argparse.ArgumentParser(description="Run an evaluation suite against the RAG API.")
+    parser.add_argument("--suite", default=cfg.get("default_suite", "smoke"))
+    parser.add_argument("--questions", help="Override the suite's questions_file")
+    parser.add_argument("--rag-url", default="http://localhost:8000/rag/query")
+    parser.add_argument("--evidence-logger-url", default="http://localhost:9000/events")
+    parser.add_argument("--concurrency", type=int, default=int(runner.get("concurrency", 4)))
+    parser.add_argument("--timeout", type=float, default=float(runner.get("timeout_seconds", 60)), help="Seconds per attempt")
+    parser.add_argument("--retries", type=int, default=int(runner.get("retries", 2)))
+    parser.add_argument("--output-dir", default=runner.get("output_dir", "data/eval/runs"))
+    parser.add_argument("--resume", metavar="RUN_FILE", help="Continue an interrupted run from its JSONL file")
+    parser.add_argument("--full", action="store_true", help="Ask every case instead of reusing unchanged results")
+    parser.add_argument("--rag-info-url", help="RAG API /rag/info endpoint (default: next to --rag-url)")
+    parser.add_argument(
+        "--compare-retrieval",
+        action="store_true",
+        help="Report hit rate / MRR per retrieval mode for cases with expected_doc_ids",
+    )
+    args = parser.parse_args(argv)
+
+    if args.compare_retrieval:
+        suite = Suite.from_config(args.suite, cfg)
+        cases = load_cases(Path(args.questions or suite.questions_file))
+        with httpx.Client(timeout=15.0) as client:
+            summary = compare_retrieval(client, args.rag_url, cases)
+        summary["hybrid_gain_over_vector"] = {
+            "hit_rate": summary["hybrid"]["hit_rate"] - summary["vector"]["hit_rate"],
+            "mrr": summary["hybrid"]["mrr"] - summary["vector"]["mrr"],
+        }
+        print(json.dumps(summary, indent=2))
+        return
 
-    # Print a simple summary for CLI use
-    print(json.dumps(results, indent=2))
+    report = asyncio.run(run_suite(args, cfg))
+    print(json.dumps(report, indent=2))
+    if not report["suite_passed"]:
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
     main()
-  
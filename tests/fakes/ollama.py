@@ -0,0 +1,94 @@
+"""Local stand-in for the parts of Ollama's HTTP API the factory uses.
+
+Serves `/api/chat` (streamed NDJSON or a single JSON body), `/api/embed`
+(feature-hashing embeddings) and `/api/tags`. Use it in-process through
+`httpx.ASGITransport(app=create_app())`, or run it for load tests:
+
+    uvicorn tests.fakes.ollama:app --port 11434
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from services.indexer.embedder import HashingEmbedder
+
+
+DEFAULT_ANSWER = "Based on the provided context [1], the Local AI Factory answers from local evidence only."
+
+
+def create_app(
+    *,
+    answer: str = DEFAULT_ANSWER,
+    first_token_delay: float = 0.0,
+    token_delay: float = 0.0,
+) -> FastAPI:
+    """Build a fake Ollama app; delays are in seconds to mimic model latency."""
+
+    app = FastAPI(title="Fake Ollama")
+    embedder = HashingEmbedder()
+    app.state.requests = []
+
+    def _tokens(max_tokens: Optional[int]) -> List[str]:
+        words = answer.split(" ")
+        if max_tokens:
+            words = words[:max_tokens]
+        return [w if i == len(words) - 1 else w + " " for i, w in enumerate(words)]
+
+    def _chunk(model: str, content: str, done: bool) -> Dict[str, Any]:
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "message": {"role": "assistant", "content": content},
+            "done": done,
+        }
+
+    @app.post("/api/chat")
+    async def chat(body: Dict[str, Any]):
+        app.state.requests.append(body)
+        model = body.get("model", "fake")
+        tokens = _tokens((body.get("options") or {}).get("num_predict"))
+
+        if not body.get("stream", True):
+            await asyncio.sleep(first_token_delay + token_delay * len(tokens))
+            return JSONResponse(_chunk(model, "".join(tokens), True))
+
+        async def lines() -> AsyncIterator[bytes]:
+            started = time.perf_counter()
+            await asyncio.sleep(first_token_delay)
+            for tok in tokens:
+                yield (json.dumps(_chunk(model, tok, False)) + "\n").encode("utf-8")
+                await asyncio.sleep(token_delay)
+            final = _chunk(model, "", True)
+            final["total_duration"] = int((time.perf_counter() - started) * 1e9)
+            yield (json.dumps(final) + "\n").encode("utf-8")
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    @app.post("/api/embed")
+    async def embed(body: Dict[str, Any]):
+        app.state.requests.append(body)
+        inputs = body.get("input", [])
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        return {"model": body.get("model", "fake"), "embeddings": embedder.embed(inputs)}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": "llama3.1:8b"}, {"name": "nomic-embed-text"}]}
+
+    return app
+
+
+app = create_app(
+    first_token_delay=float(os.getenv("FAKE_OLLAMA_FIRST_TOKEN_DELAY", "0")),
+    token_delay=float(os.getenv("FAKE_OLLAMA_TOKEN_DELAY", "0")),
+)
@@ -0,0 +1,144 @@
+import asyncio
+from typing import List
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.rag import main
+from services.rag.admission import AdmissionController, QueueFull, SingleFlight
+
+
+def test_waiters_are_admitted_by_priority_then_arrival() -> None:
+    async def scenario() -> List[str]:
+        ctl = AdmissionController(max_concurrency=1, max_queue=8)
+        order: List[str] = []
+
+        async def job(name: str, priority: str) -> None:
+            async with ctl.slot(priority):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await ctl.acquire("interactive")
+        tasks = [
+            asyncio.create_task(job("brief", "brief")),
+            asyncio.create_task(job("eval-1", "eval")),
+            asyncio.create_task(job("user", "interactive")),
+            asyncio.create_task(job("eval-2", "eval")),
+        ]
+        await asyncio.sleep(0)
+        assert ctl.depth == 4
+        ctl.release()
+        await asyncio.gather(*tasks)
+        assert ctl.active == 0
+        return order
+
+    assert asyncio.run(scenario()) == ["user", "eval-1", "eval-2", "brief"]
+
+
+def test_full_queue_sheds_lower_priority_or_rejects() -> None:
+    async def scenario() -> None:
+        ctl = AdmissionController(max_concurrency=1, max_queue=1)
+        await ctl.acquire()
+        queued_eval = asyncio.create_task(ctl.acquire("eval"))
+        await asyncio.sleep(0)
+
+        queued_user = asyncio.create_task(ctl.acquire("interactive"))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFull):
+            await queued_eval
+
+        with pytest.raises(QueueFull) as excinfo:
+            await ctl.acquire("interactive")
+        assert excinfo.value.retry_after >= 1
+
+        ctl.release()
+        await queued_user
+        assert ctl.stats.shed == 1
+        assert ctl.stats.rejected == 1
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_leaves_the_queue() -> None:
+    async def scenario() -> None:
+        ctl = AdmissionController(max_concurrency=1, max_queue=4)
+        await ctl.acquire()
+        waiter = asyncio.create_task(ctl.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+        assert ctl.depth == 0
+        ctl.release()
+        assert ctl.active == 0
+
+    asyncio.run(scenario())
+
+
+def test_single_flight_shares_one_call() -> None:
+    async def scenario() -> None:
+        flights = SingleFlight()
+        calls = []
+
+        async def work() -> str:
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*(flights.do("k", work) for _ in range(5)))
+
+        assert len(calls) == 1
+        assert [r for r, _ in results] == ["answer"] * 5
+        assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+        assert len(flights) == 0
+
+    asyncio.run(scenario())
+
+
+def test_query_returns_429_with_retry_after_when_queue_is_full(monkeypatch) -> None:
+    retrieved = []
+
+    async def no_chunks(*args, **kwargs):
+        retrieved.append(args)
+        return []
+
+    monkeypatch.setattr(main, "admission", AdmissionController(max_concurrency=0, max_queue=0))
+    monkeypatch.setattr(main, "retrieve", no_chunks)
+    monkeypatch.setattr(main, "_emit_events", lambda *a, **kw: None)
+    client = TestClient(main.app)
+
+    resp = client.post("/rag/query", json={"question": "What is the factory?", "priority": "eval"})
+
+    assert resp.status_code == 429
+    assert int(resp.headers["Retry-After"]) >= 1
+    assert client.get("/rag/admission").json()["rejected"] == 1
+    assert retrieved == []  # rejected before doing any retrieval work
+
+
+def test_batch_answers_each_query_and_logs_evidence_once(monkeypatch) -> None:
+    from services.rag.cache import AnswerCache
+    from services.rag.retrieval import RetrievedChunk
+
+    posts: List[list] = []
+    retrieved: List[int] = []
+
+    async def fake_retrieve_batch(queries, **kwargs):
+        retrieved.append(len(queries))
+        return [[RetrievedChunk(chunk_id="a.md#0", doc_id="a.md", text=q.question, score=1.0, token_count=5)] for q in queries]
+
+    monkeypatch.setattr(main, "answer_cache", AnswerCache())
+    monkeypatch.setattr(main, "admission", AdmissionController(max_concurrency=2, max_queue=8))
+    monkeypatch.setattr(main, "retrieve_batch", fake_retrieve_batch)
+    monkeypatch.setattr(main, "index_version", lambda: "test:epoch")
+    monkeypatch.setattr(main, "document_versions", lambda ids: {d: 1 for d in ids})
+    monkeypatch.setattr(main, "_post_events", posts.append)
+    client = TestClient(main.app)
+
+    queries = [{"question": "q1"}, {"question": "Q1?"}, {"question": "q2"}, {"question": " "}]
+    body = client.post("/rag/query:batch", json={"queries": queries}).json()
+
+    assert [r["status"] for r in body["results"]] == [200, 200, 200, 400]
+    assert body["meta"]["generations"] == 2
+    assert retrieved == [2]
+    assert len(posts) == 1 and len(posts[0]) == 6
+    assert body["results"][1]["result"]["meta"]["coalesced"] is True
@@ -0,0 +1,143 @@
+from typing import Any, Dict, List
+
+import pytest
+from fastapi.testclient import TestClient
+
+from services.common.events import IndexEvent, IndexPayload, make_event
+from services.rag import main
+from services.rag.cache import AnswerCache, CachedAnswer
+from services.rag.retrieval import RetrievedChunk
+
+
+def _entry(doc: str = "doc.md", **kwargs: Any) -> CachedAnswer:
+    return CachedAnswer(answer=f"about {doc}", citations=[], meta={}, doc_versions={doc: 1}, **kwargs)
+
+
+def test_key_ignores_case_whitespace_and_trailing_punctuation() -> None:
+    scope = AnswerCache.scope_for(model="m", filters={})
+
+    assert AnswerCache.key_for("What is  the Factory?", scope) == AnswerCache.key_for("what is the factory", scope)
+    assert AnswerCache.key_for("what is the factory", scope) != AnswerCache.key_for(
+        "what is the factory", AnswerCache.scope_for(model="other", filters={})
+    )
+
+
+def test_lru_and_ttl_eviction() -> None:
+    now = [0.0]
+    cache = AnswerCache(max_entries=2, ttl_seconds=10, clock=lambda: now[0])
+    cache.put("a", _entry("a.md"))
+    cache.put("b", _entry("b.md"))
+    cache.get("a")
+    cache.put("c", _entry("c.md"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+    now[0] = 11.0
+    assert cache.get("a") is None
+    assert cache.stats.evictions == 2
+
+
+def test_semantic_hit_requires_threshold_and_same_scope() -> None:
+    cache = AnswerCache(semantic_threshold=0.9)
+    cache.put("k", _entry(embedding=[1.0, 0.0], scope="s1"))
+
+    assert cache.find_similar([0.99, 0.05], "s1") is not None
+    assert cache.find_similar([0.99, 0.05], "s2") is None
+    assert cache.find_similar([0.5, 0.5], "s1") is None
+
+
+def test_invalidate_documents_drops_only_citing_entries() -> None:
+    cache = AnswerCache()
+    cache.put("a", _entry("a.md"))
+    cache.put("b", _entry("b.md"))
+
+    assert cache.invalidate_documents(["a.md", "missing.md"]) == 1
+    assert cache.get("a") is None
+    assert cache.get("b") is not None
+
+
+@pytest.fixture
+def client(monkeypatch) -> TestClient:
+    calls = {"retrieve": 0}
+    versions: Dict[str, int] = {"policy.md": 1}
+    emitted: List[Dict[str, Any]] = []
+
+    async def one_chunk(*args, **kwargs):
+        calls["retrieve"] += 1
+        return [RetrievedChunk(chunk_id="policy.md#0", doc_id="policy.md", text="Policy text.", score=1.0, token_count=3)]
+
+    monkeypatch.setattr(main, "answer_cache", AnswerCache())
+    monkeypatch.setattr(main, "retrieve", one_chunk)
+    monkeypatch.setattr(main, "index_version", lambda: "test:epoch")
+    monkeypatch.setattr(main, "document_versions", lambda ids: {d: versions.get(d) for d in ids})
+    monkeypatch.setattr(main, "_emit_events", lambda *a, **kw: emitted.append({"args": a, **kw}))
+    test_client = TestClient(main.app)
+    test_client.calls = calls  # type: ignore[attr-defined]
+    test_client.versions = versions  # type: ignore[attr-defined]
+    test_client.emitted = emitted  # type: ignore[attr-defined]
+    return test_client
+
+
+def test_repeated_question_is_served_from_cache_and_still_logged(client: TestClient) -> None:
+    first = client.post("/rag/query", json={"question": "What is the policy?"}).json()
+    second = client.post("/rag/query", json={"question": "what is the policy"}).json()
+
+    assert client.calls["retrieve"] == 1  # type: ignore[attr-defined]
+    assert second["answer"] == first["answer"]
+    assert second["citations"] == first["citations"]
+    assert [first["meta"]["cached"], second["meta"]["cached"]] == [False, True]
+    assert [e.get("cached", False) for e in client.emitted] == [False, True]  # type: ignore[attr-defined]
+
+
+def test_index_event_invalidates_cached_answer(client: TestClient) -> None:
+    client.post("/rag/query", json={"question": "What is the policy?"})
+    event = IndexEvent(
+        event_type="index",
+        service="indexer",
+        payload=IndexPayload(document_id="policy.md", num_chunks=1, embedding_model="m", status="success"),
+    )
+
+    resp = client.post("/rag/cache/invalidate", json={"events": [{"data": make_event(event, service="indexer")}]})
+    client.post("/rag/query", json={"question": "What is the policy?"})
+
+    assert resp.json()["invalidated"] == 1
+    assert client.calls["retrieve"] == 2  # type: ignore[attr-defined]
+
+
+def test_reindexed_document_is_detected_without_invalidation_call(client: TestClient) -> None:
+    client.post("/rag/query", json={"question": "What is the policy?"})
+    client.versions["policy.md"] = 2  # type: ignore[attr-defined]
+
+    resp = client.post("/rag/query", json={"question": "What is the policy?"})
+
+    assert resp.json()["meta"]["cached"] is False
+    assert client.calls["retrieve"] == 2  # type: ignore[attr-defined]
+
+
+def test_batch_reads_versions_once_for_all_cache_lookups(client: TestClient, monkeypatch) -> None:
+    client.post("/rag/query", json={"question": "What is the policy?"})
+    reads = {"index": 0, "documents": 0}
+
+    def index_version() -> str:
+        reads["index"] += 1
+        return "test:epoch"
+
+    def document_versions(ids):
+        reads["documents"] += 1
+        return {d: client.versions.get(d) for d in ids}  # type: ignore[attr-defined]
+
+    async def retrieve_batch(queries, **kwargs):
+        return [[RetrievedChunk(chunk_id="policy.md#0", doc_id="policy.md", text="Policy.", score=1.0, token_count=2)]]
+
+    monkeypatch.setattr(main, "index_version", index_version)
+    monkeypatch.setattr(main, "document_versions", document_versions)
+    monkeypatch.setattr(main, "retrieve_batch", retrieve_batch)
+    monkeypatch.setattr(main, "_post_events", lambda events: None)
+    queries = [{"question": "What is the policy?"}, {"question": "what is the policy"}, {"question": "Who owns it?"}]
+
+    body = client.post("/rag/query:batch", json={"queries": queries}).json()
+
+    assert [r["result"]["meta"]["cached"] for r in body["results"]] == [True, True, False]
+    assert reads["index"] == 1
+    assert reads["documents"] == 2  # one for every cache hit, one for the single generation's citations
@@ -0,0 +1,88 @@
+import json
+from datetime import date
+from hashlib import sha256
+from pathlib import Path
+
+from services.common.events import AnswerEvent, AnswerPayload, EvaluationEvent, EvaluationPayload, make_event
+from services.evidence_logger.columnar import compact, iter_records, parse_where, partitions, query, verify
+
+
+def _write_log(path: Path, events: list) -> list:
+    prev_hash = None
+    envelopes = []
+    with path.open("w", encoding="utf-8") as f:
+        for i, event in enumerate(events):
+            env = {"timestamp": f"2026-01-05T10:00:{i:02d}", "prev_hash": prev_hash, "event": event}
+            canonical = json.dumps(env, sort_keys=True, separators=(",", ":")).encode("utf-8")
+            env["record_hash"] = prev_hash = sha256(canonical).hexdigest()
+            envelopes.append(env)
+            f.write(json.dumps(env, separators=(",", ":")) + "\n")
+    return envelopes
+
+
+def _answer(latency_ms: int, model: str, **extra) -> dict:
+    payload = AnswerPayload(question="q", answer="a", citations=[], latency_ms=latency_ms, model_name=model, **extra)
+    return make_event(AnswerEvent(event_type="answer", service="rag-api", payload=payload), service="rag-api")
+
+
+def _evaluation(case: str, passed: bool) -> dict:
+    payload = EvaluationPayload(evaluation_run_id="r1", test_case_id=case, score=float(passed), passed=passed)
+    return make_event(EvaluationEvent(event_type="evaluation", service="eval", payload=payload), service="eval")
+
+
+def test_compaction_round_trips_records_and_hash_chain(tmp_path) -> None:
+    logs, root = tmp_path / "logs", tmp_path / "columnar"
+    logs.mkdir()
+    events = [
+        _answer(120, "llama", stage_ms={"embed": 1.5}),
+        _evaluation("golden-1", True),
+        {"event_type": "custom", "odd key": [1, {"x": None}], "big": 2**70},
+        _answer(80, "qwen", ttft_ms=40, cached=True),
+    ]
+    envelopes = _write_log(logs / "evidence-2026-01-05.jsonl", events)
+    (logs / "evidence-2026-01-06.jsonl").write_text("")
+
+    manifests = compact(logs, root, before=date(2026, 1, 6))
+
+    assert [m["date"] for m in manifests] == ["2026-01-05"]
+    assert compact(logs, root, before=date(2026, 1, 6)) == []  # already compacted
+    assert [env for _, env in iter_records(root / "date=2026-01-05")] == envelopes
+    assert verify(root, "2026-01-05") == 4
+
+
+def test_query_projects_filters_and_aggregates(tmp_path) -> None:
+    logs, root = tmp_path / "logs", tmp_path / "columnar"
+    logs.mkdir()
+    events = [_answer(100 * i, "llama" if i % 2 else "qwen", cached=i == 3) for i in range(1, 7)]
+    events += [_evaluation("golden-1", True), _evaluation("golden-1", False), _evaluation("golden-2", True)]
+    _write_log(logs / "evidence-2026-01-05.jsonl", events)
+    compact(logs, root, before=date(2026, 1, 6))
+
+    rows = query(
+        partitions(root, event_types=["answer"]),
+        group_by=["week", "payload.model_name"],
+        aggs=["count", "p50:payload.latency_ms"],
+        where=[parse_where("payload.cached=false")],
+    )
+    assert rows == [
+        {"week": "2026-W02", "payload.model_name": "llama", "count": 2, "p50:payload.latency_ms": 300.0},
+        {"week": "2026-W02", "payload.model_name": "qwen", "count": 3, "p50:payload.latency_ms": 400.0},
+    ]
+
+    rows = query(
+        partitions(root),
+        group_by=["payload.test_case_id"],
+        aggs=["mean:payload.passed"],
+        where=[parse_where("event_type=evaluation")],
+    )
+    assert rows == [
+        {"payload.test_case_id": "golden-1", "mean:payload.passed": 0.5},
+        {"payload.test_case_id": "golden-2", "mean:payload.passed": 1.0},
+    ]
+
+    rows = query(
+        partitions(root, event_types=["answer"]),
+        select=["payload.latency_ms"],
+        where=[parse_where("payload.latency_ms>=500")],
+    )
+    assert rows == [{"payload.latency_ms": 500}, {"payload.latency_ms": 600}]
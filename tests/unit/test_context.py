@@ -0,0 +1,71 @@
+from services.common.tokens import count_tokens
+from services.rag.context import LABEL_TOKENS, build_prompt, pack_context
+from services.rag.retrieval import RetrievedChunk
+
+
+def _chunk(doc: str, index: int, text: str, score: float, overlap_chars: int = 0) -> RetrievedChunk:
+    return RetrievedChunk(
+        chunk_id=f"{doc}#{index}",
+        doc_id=doc,
+        text=text,
+        score=score,
+        index=index,
+        token_count=count_tokens(text),
+        overlap_chars=overlap_chars,
+        overlap_tokens=count_tokens(text[:overlap_chars]) if overlap_chars else 0,
+    )
+
+
+def test_greedy_packing_respects_budget() -> None:
+    chunks = [_chunk(f"d{i}", 0, f"d{i} " + "word " * 99, 1.0 - i / 10) for i in range(5)]
+
+    packed = pack_context(chunks, budget=250)
+
+    assert len(packed.chunks) == 2
+    assert packed.tokens <= 250
+    assert [c.doc_id for c in packed.chunks] == ["d0", "d1"]
+
+
+def test_overlap_between_adjacent_chunks_is_packed_once() -> None:
+    shared = "Shared paragraph about key rotation."
+    first = _chunk("doc", 0, "Intro paragraph.\n\n" + shared, 0.9)
+    second = _chunk("doc", 1, shared + "\n\nFollow-up paragraph.", 0.8, overlap_chars=len(shared) + 2)
+
+    packed = pack_context([first, second], budget=1000)
+
+    assert packed.texts[1] == "Follow-up paragraph."
+    assert packed.tokens == first.token_count + second.token_count - second.overlap_tokens + 2 * LABEL_TOKENS
+
+
+def test_trimmed_chunk_follows_the_chunk_it_overlaps() -> None:
+    shared = "Shared paragraph about key rotation."
+    first = _chunk("doc", 0, "Intro paragraph.\n\n" + shared, 0.5)
+    second = _chunk("doc", 1, shared + "\n\nFollow-up paragraph.", 0.9, overlap_chars=len(shared) + 2)
+    other = _chunk("other", 0, "Unrelated paragraph.", 0.7)
+
+    packed = pack_context([first, second, other], budget=1000)
+
+    assert [c.chunk_id for c in packed.chunks] == ["doc#0", "doc#1", "other#0"]
+    assert packed.texts[:2] == [first.text, "Follow-up paragraph."]
+
+
+def test_optimal_packing_beats_greedy_on_score() -> None:
+    big = _chunk("big", 0, "cat " * 90, 0.9)
+    small = [_chunk("s0", 0, "dog " * 45, 0.6), _chunk("s1", 0, "pig " * 45, 0.6)]
+
+    greedy = pack_context([big, *small], budget=100, strategy="greedy")
+    optimal = pack_context([big, *small], budget=100, strategy="optimal")
+
+    assert [c.doc_id for c in greedy.chunks] == ["big"]
+    assert sorted(c.doc_id for c in optimal.chunks) == ["s0", "s1"]
+
+
+def test_prompt_uses_system_role_template() -> None:
+    packed = pack_context([_chunk("d", 0, "Evidence text.", 1.0)], budget=100)
+    cfg = {"prompt": {"system_role": "You are the operator.\n", "require_citations": True}}
+
+    messages = build_prompt("What?", packed, cfg)
+
+    assert messages[0] == {"role": "system", "content": "You are the operator."}
+    assert "[1]\nEvidence text." in messages[1]["content"]
+    assert messages[1]["content"].rstrip().endswith("labels.")
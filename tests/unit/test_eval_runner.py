@@ -0,0 +1,140 @@
+import argparse
+import asyncio
+import json
+from collections import Counter
+
+import httpx
+
+from tests.evaluation import run_eval
+
+
+def _case(case_id: str, expected_contains=()) -> run_eval.TestCase:
+    return run_eval.TestCase(
+        id=case_id, question=f"question {case_id}", expected_contains=list(expected_contains), forbid_phrases=[]
+    )
+
+
+def test_grade_answer_applies_weights_and_global_phrases() -> None:
+    grading = run_eval.Grading(0.7, 0.3, global_forbid_phrases=["regardless of the documents"])
+    case = _case("c", expected_contains=["alpha", "beta"])
+
+    grade = run_eval.grade_answer("alpha, regardless of the documents", case, grading)
+
+    assert abs(grade["score"] - 0.35) < 1e-9
+    assert len(grade["failures"]) == 2
+
+
+def test_run_retries_records_incrementally_and_resumes(tmp_path) -> None:
+    calls: Counter = Counter()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        question = json.loads(request.content)["question"]
+        calls[question] += 1
+        if question == "question flaky" and calls[question] == 1:
+            return httpx.Response(503)
+        if question == "question down":
+            return httpx.Response(500)
+        return httpx.Response(200, json={"answer": "stubbed RAG answer"})
+
+    cases = [_case("ok", expected_contains=["stubbed"]), _case("flaky"), _case("down")]
+    options = run_eval.RunOptions(rag_url="http://rag/rag/query", retries=1, backoff_seconds=0)
+
+    async def run(log: run_eval.RunLog):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await run_eval.run_cases(
+                cases, log, client=client, options=options, grading=run_eval.Grading(), threshold=0.8
+            )
+
+    path = tmp_path / "run.jsonl"
+    log = run_eval.RunLog.create(path, {"evaluation_run_id": "smoke-1", "suite": "smoke"})
+    first = asyncio.run(run(log))
+
+    assert [r["passed"] for r in first] == [True, True, False]
+    assert first[1]["attempts"] == 2 and first[2]["error"]
+    assert len(path.read_text().splitlines()) == 4
+
+    with path.open("a") as f:
+        f.write('{"type":"result","id":"half')  # interrupted write
+    resumed = run_eval.RunLog.resume(path)
+    asyncio.run(run(resumed))
+
+    assert resumed.run_id == "smoke-1"
+    assert calls == {"question ok": 1, "question flaky": 2, "question down": 4}
+
+
+def test_incremental_run_reuses_only_unchanged_fingerprints(tmp_path) -> None:
+    versions = {"a.md": 1, "b.md": 1}
+    asked: Counter = Counter()
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/rag/info":
+            ids = request.url.params.get_list("doc_id")
+            info = {"model_name": "m", "prompt_hash": "p", "document_versions": {d: versions.get(d) for d in ids}}
+            return httpx.Response(200, json=info)
+        question = json.loads(request.content)["question"]
+        asked[question] += 1
+        doc = {"question a": "a.md", "question b": "b.md"}.get(question)
+        citations = [{"doc_id": doc, "chunk_id": f"{doc}#0", "score": 1.0, "doc_version": versions[doc]}] if doc else []
+        body = {"answer": "stubbed", "citations": citations, "meta": {"model_name": "m", "prompt_hash": "p"}}
+        return httpx.Response(200, json=body)
+
+    cases = [_case("a", ["stubbed"]), _case("b", ["stubbed"]), _case("uncited")]
+    options = run_eval.RunOptions(rag_url="http://rag/rag/query")
+
+    async def run(run_id: str, previous=None):
+        log = run_eval.RunLog.create(tmp_path / f"{run_id}.jsonl", {"evaluation_run_id": run_id, "suite": "smoke"})
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            reuse = {}
+            if previous is not None:
+                reuse = await run_eval.reusable_results(
+                    client, "http://rag/rag/info", cases, previous, grading=run_eval.Grading(), threshold=0.8
+                )
+            await run_eval.run_cases(
+                cases, log, client=client, options=options, grading=run_eval.Grading(), threshold=0.8, reuse=reuse
+            )
+        return log
+
+    first = asyncio.run(run("run-1"))
+    versions["b.md"] = 2
+    second = asyncio.run(run("run-2", previous=first))
+
+    assert asked == {"question a": 1, "question b": 2, "question uncited": 2}
+    assert second.results["a"]["reused_from"] == "run-1" and second.results["a"]["passed"]
+    assert "reused_from" not in second.results["b"]
+    assert run_eval.latest_run(tmp_path, "smoke", exclude=second.path).run_id == "run-1"
+
+
+def test_resume_uses_the_settings_from_the_run_header(tmp_path, monkeypatch) -> None:
+    questions = tmp_path / "questions.yaml"
+    questions.write_text('- {id: "only", question: "question only"}\n')
+    path = tmp_path / "run.jsonl"
+    header = {"evaluation_run_id": "smoke-1", "suite": "smoke", "rag_url": "http://orig/rag/query", "full": True}
+    run_eval.RunLog.create(path, {**header, "questions": str(questions)})
+    seen = {}
+
+    async def fake_run_cases(cases, log, *, options, **kwargs):
+        seen.update(cases=[c.id for c in cases], rag_url=options.rag_url, reuse=kwargs["reuse"])
+        return []
+
+    def no_previous_run(*args, **kwargs):
+        raise AssertionError("a full run does not look for results to reuse")
+
+    monkeypatch.setattr(run_eval, "run_cases", fake_run_cases)
+    monkeypatch.setattr(run_eval, "latest_run", no_previous_run)
+    args = argparse.Namespace(
+        resume=str(path),
+        suite="other",
+        questions=None,
+        rag_url="http://new/rag/query",
+        full=False,
+        rag_info_url=None,
+        evidence_logger_url=None,
+        concurrency=1,
+        timeout=1.0,
+        retries=0,
+        output_dir=str(tmp_path),
+    )
+
+    asyncio.run(run_eval.run_suite(args, {"suites": {"smoke": {}}}))
+
+    assert seen == {"cases": ["only"], "rag_url": "http://orig/rag/query", "reuse": {}}
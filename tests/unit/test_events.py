@@ -1,6 +1,9 @@
 import json
 from uuid import UUID
 
+import pytest
+from pydantic import ValidationError
+
 from services.common.events import (
     AnswerEvent,
     AnswerPayload,
@@ -9,12 +12,15 @@ from services.common.events import (
     DailyBriefPayload,
     EvaluationEvent,
     EvaluationPayload,
+    EventEncoder,
     IngestionEvent,
     IngestionPayload,
     IndexEvent,
     IndexPayload,
     QueryEvent,
     QueryPayload,
+    batch_body,
+    make_event,
 )
 
 
@@ -98,3 +104,24 @@ def test_evaluation_event_fields() -> None:
     assert isinstance(ev.event_id, UUID)
     assert ev.payload.passed is True
   
+
+
+def test_event_encoder_matches_make_event() -> None:
+    payload = AnswerPayload(question="Qué?", answer="a", citations=[{"doc_id": "d"}], latency_ms=5, model_name="m")
+    slow = make_event(AnswerEvent(event_type="answer", service="x", payload=payload), service="rag-api")
+
+    encoder = EventEncoder(AnswerEvent, service="rag-api")
+    fast = json.loads(encoder.encode(payload.model_dump()))
+
+    assert UUID(fast.pop("event_id")) and slow.pop("event_id")
+    assert fast.pop("timestamp") >= slow.pop("timestamp")
+    assert fast == slow
+    batch = [e["data"] for e in json.loads(batch_body(encoder.encode_many([payload] * 50)))["events"]]
+    assert all(e["payload"] == slow["payload"] for e in batch)
+    ids = [UUID(e["event_id"]) for e in batch]
+    assert len(set(ids)) == 50 and all(i.version == 4 and str(i) == e["event_id"] for i, e in zip(ids, batch))
+
+
+def test_event_encoder_validates_payload() -> None:
+    with pytest.raises(ValidationError):
+        EventEncoder(IngestionEvent, service="ingestion").encode({"file_path": "x", "size_bytes": "lots"})
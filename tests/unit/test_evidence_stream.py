@@ -0,0 +1,133 @@
+import asyncio
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from services.ui import evidence_stream
+from services.ui.evidence_stream import EvidenceTailer, find_record, format_cursor, stream
+
+
+def _append(log_dir: Path, day: str, *event_types: str) -> None:
+    with (log_dir / f"evidence-{day}.jsonl").open("a", encoding="utf-8") as f:
+        for event_type in event_types:
+            record = {"timestamp": day, "prev_hash": None, "event": {"event_type": event_type}, "record_hash": event_type}
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def _frames(chunks: List[bytes]) -> List[dict]:
+    out = []
+    for chunk in chunks:
+        fields = dict(line.split(": ", 1) for line in chunk.decode().strip().splitlines() if not line.startswith(":"))
+        out.append({"id": fields.get("id"), "event": fields.get("event"), "data": json.loads(fields["data"])})
+    return out
+
+
+async def _take(gen, n: int, timeout: float = 5.0) -> List[bytes]:
+    return [await asyncio.wait_for(gen.__anext__(), timeout) for _ in range(n)]
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_fans_out_live_records_with_filters_and_rollover(tmp_path, use_inotify) -> None:
+    _append(tmp_path, "2026-01-01", "old")
+
+    async def scenario():
+        tailer = EvidenceTailer(tmp_path, poll_interval=0.05, use_inotify=use_inotify)
+        everything = stream(tailer)
+        answers = stream(tailer, {"event_type": {"answer"}})
+        first_all = asyncio.ensure_future(_take(everything, 4))
+        first_answers = asyncio.ensure_future(_take(answers, 2))
+        await asyncio.sleep(0.1)
+        _append(tmp_path, "2026-01-01", "query", "answer")
+        await asyncio.sleep(0.1)
+        _append(tmp_path, "2026-01-02", "query", "answer")  # day rollover
+        results = await first_all, await first_answers
+        await everything.aclose()
+        await answers.aclose()
+        await asyncio.sleep(0.1)
+        return results, tailer
+
+    (all_chunks, answer_chunks), tailer = asyncio.run(scenario())
+
+    assert [f["data"]["event"]["event_type"] for f in _frames(all_chunks)] == ["query", "answer", "query", "answer"]
+    answers = _frames(answer_chunks)
+    assert [f["id"].split(":")[0] for f in answers] == ["2026-01-01", "2026-01-02"]
+    assert not tailer.subscribers
+
+
+def test_initial_position_without_logs_is_the_start_of_today(tmp_path, monkeypatch) -> None:
+    class Midnight(datetime):
+        @classmethod
+        def utcnow(cls) -> datetime:
+            return cls(2026, 3, 4, 0, 0, 1)
+
+    monkeypatch.setattr(evidence_stream, "datetime", Midnight)
+    tailer = EvidenceTailer(tmp_path)
+
+    tailer.position = tailer._initial_position()
+    assert tailer.position == ("2026-03-04", 0)
+
+    _append(tmp_path, "2026-03-04", "first")
+    records = tailer.read_new()
+    assert [json.loads(line)["record_hash"] for _, line in records] == ["first"]
+    assert tailer.read_new() == []
+    assert tailer._initial_position() == tailer.position
+
+
+def test_slow_subscriber_is_cut_off_with_resume_cursor(tmp_path) -> None:
+    _append(tmp_path, "2026-01-01", "old")
+
+    async def scenario():
+        tailer = EvidenceTailer(tmp_path, use_inotify=False)
+        slow = stream(tailer, buffer=2)
+        fast = stream(tailer)
+        # The slow subscriber's buffer holds two records, so the third cuts it off.
+        first_slow = asyncio.ensure_future(_take(slow, 1))
+        first_fast = asyncio.ensure_future(_take(fast, 5))
+        await asyncio.sleep(0.05)
+        _append(tmp_path, "2026-01-01", *[f"e{i}" for i in range(5)])
+        tailer.poll()
+        slow_chunks = await first_slow + await _take(slow, 2)
+        return slow_chunks, await first_fast
+
+    slow_chunks, fast_chunks = asyncio.run(scenario())
+
+    assert len(_frames(fast_chunks)) == 5
+    slow = _frames(slow_chunks)
+    assert [f["event"] for f in slow] == ["evidence", "evidence", "overflow"]
+    assert slow[-1]["data"]["resume"] == slow[-2]["id"]
+
+
+def test_resume_replays_backlog_then_goes_live(tmp_path) -> None:
+    _append(tmp_path, "2026-01-01", "a", "b", "c")
+    after_a = find_record(tmp_path, "a")
+    assert after_a is not None
+
+    async def scenario():
+        tailer = EvidenceTailer(tmp_path, poll_interval=0.05)
+        gen = stream(tailer, resume=after_a)
+        backlog = await _take(gen, 2)
+        _append(tmp_path, "2026-01-01", "d")
+        live = await _take(gen, 1)
+        await gen.aclose()
+        return backlog + live
+
+    frames = _frames(asyncio.run(scenario()))
+
+    assert [f["data"]["record_hash"] for f in frames] == ["b", "c", "d"]
+    assert frames[0]["id"] != format_cursor(after_a)
+
+
+def test_stream_endpoint_rejects_bad_resume_points(tmp_path, monkeypatch) -> None:
+    from fastapi.testclient import TestClient
+
+    from services.ui import main
+
+    _append(tmp_path, "2026-01-01", "a")
+    monkeypatch.setattr(main, "LOG_DIR", tmp_path)
+    client = TestClient(main.app)
+
+    assert client.get("/evidence/stream", params={"cursor": "yesterday"}).status_code == 400
+    assert client.get("/evidence/stream", params={"after": "missing"}).status_code == 404
@@ -0,0 +1,33 @@
+import json
+import subprocess
+import sys
+import types
+
+from services import factory
+
+
+def test_listing_commands_imports_no_heavy_dependencies() -> None:
+    code = (
+        "import sys; from services import factory; factory.main([]); "
+        "print(sorted(m for m in ('pydantic', 'httpx', 'yaml', 'numpy', 'fastapi') if m in sys.modules))"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+
+    assert "ingest" in out
+    assert out.strip().splitlines()[-1] == "[]"
+
+
+def test_command_is_imported_on_use_and_gets_its_arguments(monkeypatch, capsys) -> None:
+    calls = []
+    module = types.ModuleType("fake_command")
+    module.main = lambda argv: calls.append((argv, sys.argv[0]))
+    monkeypatch.setitem(sys.modules, "fake_command", module)
+    monkeypatch.setitem(factory.COMMANDS, "fake", ("fake_command", "A stand-in"))
+    argv0 = sys.argv[0]
+
+    factory.main(["--timings", "fake", "--hours", "3"])
+
+    assert calls == [(["--hours", "3"], "factory fake")]
+    assert sys.argv[0] == argv0
+    report = json.loads(capsys.readouterr().err)
+    assert report["command"] == "fake" and report["import_ms"] >= 0
@@ -0,0 +1,38 @@
+from pathlib import Path
+
+from services.indexer.embedder import HashingEmbedder
+from services.indexer.main import open_indexes, process_ingestion_event
+from services.ingestion.main import build_ingestion_event
+
+
+class CountingEmbedder(HashingEmbedder):
+    def __init__(self) -> None:
+        super().__init__()
+        self.calls = 0
+
+    def embed(self, texts, model="hashing"):
+        self.calls += 1
+        return super().embed(texts, model)
+
+
+def test_unchanged_files_are_not_reindexed(tmp_path: Path) -> None:
+    doc = tmp_path / "policy.md"
+    doc.write_text("Encryption keys rotate every ninety days.\n")
+    vectors, lexical = open_indexes(tmp_path / "index")
+    embedder = CountingEmbedder()
+
+    def index(**kwargs):
+        ev = build_ingestion_event(doc)
+        return process_ingestion_event(ev, embedder=embedder, vectors=vectors, lexical=lexical, **kwargs)
+
+    assert index().payload.status == "success"
+    version = vectors.document_version(str(doc))
+
+    assert index() is None
+    assert embedder.calls == 1 and vectors.document_version(str(doc)) == version
+
+    assert index(force=True) is not None
+    doc.write_text("Encryption keys rotate every thirty days.\n")
+    assert index() is not None
+    assert embedder.calls == 3 and vectors.document_version(str(doc)) > version
+    assert len(lexical) == 1
@@ -0,0 +1,57 @@
+from pathlib import Path
+
+import numpy as np
+
+from services.common.lexical_index import LexicalIndex, tokenize
+
+
+def test_tokenize_keeps_identifiers_and_their_parts() -> None:
+    tokens = tokenize("See policy POL-2024-007 and ERR_CONN_RESET.")
+
+    assert "pol-2024-007" in tokens
+    assert "2024" in tokens
+    assert "err_conn_reset" in tokens
+    assert "conn" in tokens
+
+
+def test_exact_identifier_ranks_first(tmp_path: Path) -> None:
+    index = LexicalIndex(tmp_path)
+    index.add("a#0", "Password rotation is covered by policy POL-2024-007.")
+    index.add("b#0", "Policy documents are reviewed every year.")
+    index.add("c#0", "Error ERR-5521 means the upstream timed out.")
+    index.commit()
+
+    results = index.search("what does ERR-5521 mean?", top_k=3)
+
+    assert results[0][0] == "c#0"
+
+
+def test_upsert_and_merge_survive_reload(tmp_path: Path) -> None:
+    index = LexicalIndex(tmp_path, merge_factor=2)
+    for i in range(8):
+        index.add(f"doc{i}#0", f"chunk number {i} about topic{i}")
+        index.commit()
+    index.add("doc3#0", "rewritten chunk about topic99")
+    index.commit()
+
+    assert len(index.segments) < 8
+
+    reader = LexicalIndex(tmp_path)
+    assert len(reader) == 8
+    assert reader.search("topic3") == []
+    assert reader.search("topic99")[0][0] == "doc3#0"
+
+
+def test_allowed_ids_and_masks_are_intersected(tmp_path: Path) -> None:
+    index = LexicalIndex(tmp_path)
+    for name in ("a", "b", "c"):
+        index.add(f"{name}#0", f"key rotation policy {name}")
+    index.commit()
+    snapshot = index.snapshot
+    rows = {"a#0": 0, "b#0": 1, "c#0": 2}
+    row_mask = np.array([True, True, False])  # e.g. a metadata filter over the vector rows
+    masks = {name: (seg_rows >= 0) & row_mask[seg_rows] for name, seg_rows in snapshot.align(rows).items()}
+
+    results = snapshot.search("rotation", allowed=["b#0", "c#0"], masks=masks)
+
+    assert [doc_id for doc_id, _ in results] == ["b#0"]
@@ -0,0 +1,46 @@
+import asyncio
+import json
+
+import httpx
+
+from tests.benchmarks.bench_load import load_trace, run_load, summarise
+
+
+def test_trace_records_become_bodies_per_target(tmp_path) -> None:
+    trace = tmp_path / "trace.jsonl"
+    records = [
+        {"question": "What is PCI scope?", "top_k": 4},
+        {"timestamp": "t", "event": {"event_type": "query", "payload": {"question": "From the log?"}}},
+        {"event_type": "answer", "payload": {"answer": "..."}},
+    ]
+    trace.write_text("\n".join(json.dumps(r) for r in records) + "\n")
+
+    rag = load_trace(trace, "rag")
+    evidence = load_trace(trace, "evidence")
+
+    assert [b["question"] for b in rag] == ["What is PCI scope?", "From the log?"]
+    assert rag[0]["top_k"] == 4
+    assert len(evidence) == 3
+    assert evidence[0]["events"][0]["data"]["event_type"] == "query"
+
+
+def test_open_loop_counts_errors_and_latency() -> None:
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        if len(calls) % 4 == 0:
+            return httpx.Response(429, json={})
+        return httpx.Response(200, json={"answer": "a", "meta": {"cached": len(calls) % 2 == 1}})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await run_load(client, "http://rag/rag/query", [{"question": "q"}], rate=200, duration=0.1)
+
+    summary = summarise(asyncio.run(run()))
+
+    assert summary["requests"] == 20 and len(calls) == 20
+    assert summary["status"] == {"200": 15, "429": 5}
+    assert summary["error_rate"] == 0.25
+    assert summary["latency"]["p50_ms"] >= 0
+    assert summary["cache_hit_ratio"] == round(10 / 15, 4)
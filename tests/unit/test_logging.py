@@ -0,0 +1,58 @@
+import io
+import json
+import logging
+
+from services.common.logging import LOG_RECORDS_DROPPED, DebugSampler, LogPipeline
+
+
+def _logger(name: str, pipeline: LogPipeline) -> logging.Logger:
+    logger = logging.getLogger(name)
+    logger.handlers = [pipeline.handler]
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    return logger
+
+
+def test_pipeline_writes_configured_fields_on_listener_thread() -> None:
+    out = io.StringIO()
+    cfg = {"fields": {"message_key": "message", "extra_keys": ["request_id"]}, "include_timestamp": False}
+    pipeline = LogPipeline(cfg, stream=out).start()
+    logger = _logger("test.pipeline.fields", pipeline)
+
+    logger.info("answered %s", "q1", extra={"request_id": "r-1", "ignored": True})
+    pipeline.stop()
+
+    assert json.loads(out.getvalue()) == {"level": "INFO", "message": "answered q1", "request_id": "r-1"}
+
+
+def test_full_queue_drops_and_counts_instead_of_blocking() -> None:
+    out = io.StringIO()
+    pipeline = LogPipeline({"queue": {"max_size": 2}}, stream=out)  # listener not started yet
+    logger = _logger("test.pipeline.overload", pipeline)
+    dropped = LOG_RECORDS_DROPPED.labels(reason="overload")
+    before = dropped.value
+
+    for i in range(5):
+        logger.warning("line %d", i)
+    pipeline.start().stop()
+
+    assert dropped.value - before == 3
+    assert [json.loads(line)["msg"] for line in out.getvalue().splitlines()] == ["line 0", "line 1"]
+
+
+def test_debug_sampler_limits_debug_records_per_logger() -> None:
+    sampler = DebugSampler(per_second=0.001, burst=3)
+
+    def record(name: str, level: int) -> logging.LogRecord:
+        return logging.LogRecord(name, level, __file__, 1, "m", None, None)
+
+    assert [sampler.filter(record("hot", logging.DEBUG)) for _ in range(5)] == [True, True, True, False, False]
+    assert sampler.filter(record("hot", logging.INFO))
+    assert sampler.filter(record("other", logging.DEBUG))
+
+
+def test_per_service_levels() -> None:
+    pipeline = LogPipeline({"level": "WARNING", "services": {"rag-api": {"level": "debug"}}})
+
+    assert pipeline.level_for("rag-api") == logging.DEBUG
+    assert pipeline.level_for("ui") == logging.WARNING
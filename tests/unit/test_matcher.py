@@ -0,0 +1,56 @@
+import json
+import random
+
+from services.eval.bulk_grade import bulk_grade
+from services.eval.grading import Grading
+from services.eval.matcher import PhraseMatcher
+
+
+def test_automaton_agrees_with_substring_checks() -> None:
+    rng = random.Random(5)
+    for _ in range(300):
+        phrases = ["".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 10))]
+        text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 40)))
+
+        matcher = PhraseMatcher(phrases, scan_limit=0)
+
+        assert matcher.matches(text) == [p for p in dict.fromkeys(phrases) if p in text]
+
+
+def test_case_and_whitespace_normalisation() -> None:
+    phrases = ["Verified  this in\nreal time", "direct access"]
+    text = "I VERIFIED this   in real time."
+
+    assert PhraseMatcher(phrases, scan_limit=0).matches(text) == []
+    assert PhraseMatcher(phrases, ignore_case=True, normalise_whitespace=True, scan_limit=0).matches(text) == [
+        "Verified  this in\nreal time"
+    ]
+
+
+def test_whitespace_normalisation_keeps_edge_spaces() -> None:
+    phrases = ["pci ", " dss"]
+
+    for scan_limit in (0, 128):
+        matcher = PhraseMatcher(phrases, normalise_whitespace=True, scan_limit=scan_limit)
+        assert matcher.matches("pcidss") == []
+        assert matcher.matches("pci\n\n  dss") == ["pci ", " dss"]
+
+
+def test_bulk_grade_flags_answers_from_evidence_logs(tmp_path) -> None:
+    answers = ["stubbed RAG answer", "I verified this in real time", "something else"]
+    with (tmp_path / "evidence-2026-01-01.jsonl").open("w") as f:
+        f.write(json.dumps({"event": {"event_type": "query", "payload": {"question": "q"}}}) + "\n")
+        for i, answer in enumerate(answers):
+            event = {"event_type": "answer", "event_id": str(i), "payload": {"question": "What  is it?", "answer": answer}}
+            f.write(json.dumps({"timestamp": "t", "event": event}) + "\n")
+    out = tmp_path / "flagged.jsonl"
+
+    grading = Grading(global_forbid_phrases=["I verified this in real time"])
+    cases = {"what is it?": ("golden-1", ["stubbed RAG answer"], [])}
+    with out.open("w") as f:
+        summary = bulk_grade([tmp_path / "evidence-2026-01-01.jsonl"], grading, cases, chunk_lines=2, out=f)
+
+    flagged = [json.loads(line) for line in out.read_text().splitlines()]
+    assert summary["answers"] == 3 and summary["flagged"] == 2
+    assert [r["event_id"] for r in flagged] == ["1", "2"]
+    assert all(r["case_id"] == "golden-1" for r in flagged)
@@ -0,0 +1,83 @@
+import asyncio
+import random
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+from services.common.metadata_index import MetadataFilter, MetadataIndex, RowBitmap
+
+
+def test_row_bitmap_set_operations_match_python_sets() -> None:
+    rng = random.Random(3)
+    universe = 5000
+    for density in (0.001, 0.05, 0.5):
+        a = {r for r in range(universe) if rng.random() < density}
+        b = {r for r in range(universe) if rng.random() < 0.2}
+        bm_a = RowBitmap.from_rows(np.array(sorted(a), dtype=np.int32), universe)
+        bm_b = RowBitmap.from_rows(np.array(sorted(b), dtype=np.int32), universe)
+
+        assert set((bm_a & bm_b).to_rows().tolist()) == a & b
+        assert set((bm_a | bm_b).to_rows().tolist()) == a | b
+        assert len(bm_a) == len(a)
+
+
+def test_sparse_sets_use_array_container() -> None:
+    bm = RowBitmap.from_rows(np.array([1, 500, 90000], dtype=np.int32), 100000)
+
+    assert bm.rows is not None
+    assert bm.nbytes == 12
+
+
+def test_filter_combines_fields_with_and_and_values_with_or() -> None:
+    index = MetadataIndex()
+    index.add(0, "a", {"tags": ["pci"], "mime_type": "text/markdown", "ingested_at": "2026-01-01T00:00:00"})
+    index.add(1, "b", {"tags": ["hr"], "mime_type": "text/markdown", "ingested_at": "2026-03-01T00:00:00"})
+    index.add(2, "c", {"tags": ["pci"], "mime_type": "text/plain", "ingested_at": "2026-03-02T00:00:00"})
+
+    rows = index.evaluate(MetadataFilter(tags=["pci", "hr"], mime_types=["text/markdown"]))
+    assert rows is not None and rows.to_rows().tolist() == [0, 1]
+
+    rows = index.evaluate(MetadataFilter(tags=["pci"], since=date(2026, 2, 1)))
+    assert rows is not None and rows.to_rows().tolist() == [2]
+
+    assert index.evaluate(MetadataFilter()) is None
+
+
+def test_selective_filter_still_returns_top_k(tmp_path: Path) -> None:
+    from services.common.lexical_index import LexicalIndex
+    from services.common.vector_index import ChunkRecord, VectorIndex
+    from services.indexer.embedder import HashingEmbedder
+    from services.rag.retrieval import Retriever
+
+    embedder = HashingEmbedder()
+    vectors = VectorIndex(tmp_path / "vectors")
+    lexical = LexicalIndex(tmp_path / "lexical")
+    for i in range(200):
+        text = f"Access review procedure step {i}."
+        rec = ChunkRecord(
+            chunk_id=f"doc{i}#0",
+            document_id=f"doc{i}",
+            index=0,
+            text=text,
+            metadata={"tags": ["rare"] if i % 50 == 0 else ["common"]},
+        )
+        vectors.upsert_document(rec.document_id, [rec], embedder.embed([text]))
+        lexical.add(rec.chunk_id, text)
+    lexical.commit()
+
+    retriever = Retriever(vectors, lexical, embedder, embedding_model="hashing")
+    results = asyncio.run(
+        retriever.retrieve("access review procedure", top_k=8, min_score=0.0, filters=MetadataFilter(tags=["rare"]))
+    )
+
+    assert sorted(r.doc_id for r in results) == ["doc0", "doc100", "doc150", "doc50"]
+
+    lexical_only = asyncio.run(
+        retriever.retrieve(
+            "access review procedure", top_k=8, min_score=0.0, mode="lexical", filters=MetadataFilter(tags=["rare"])
+        )
+    )
+    assert sorted(r.doc_id for r in lexical_only) == ["doc0", "doc100", "doc150", "doc50"]
+    # A filter that keeps every live row is dropped rather than applied.
+    assert vectors.filter_rows(MetadataFilter(tags=["rare", "common"])) is None
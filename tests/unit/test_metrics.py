@@ -0,0 +1,68 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from services.common.metrics import Counter, Histogram, Registry, collect_stages, stage
+
+
+def test_histogram_renders_cumulative_buckets() -> None:
+    registry = Registry()
+    hist = registry.get_or_create(Histogram, "t_seconds", "Test.", ["stage"], buckets=(0.1, 1.0))
+    for v in (0.05, 0.5, 0.5, 2.0):
+        hist.observe(v, stage="embed")
+
+    text = registry.render()
+
+    assert 't_seconds_bucket{stage="embed",le="0.1"} 1' in text
+    assert 't_seconds_bucket{stage="embed",le="1"} 3' in text
+    assert 't_seconds_bucket{stage="embed",le="+Inf"} 4' in text
+    assert 't_seconds_count{stage="embed"} 4' in text
+    assert 0.1 <= hist.labels(stage="embed").quantile(0.5) <= 1.0
+
+
+def test_counter_labels_and_reregistration() -> None:
+    registry = Registry()
+    c = registry.get_or_create(Counter, "t_total", "Test.", ["result"])
+    c.inc(result="hit")
+    c.inc(2, result="miss")
+
+    assert registry.get_or_create(Counter, "t_total", "Test.", ["result"]) is c
+    assert 't_total{result="miss"} 2' in registry.render()
+
+
+def test_stages_are_collected_across_threads() -> None:
+    def work() -> None:
+        with stage("search"):
+            pass
+
+    async def run() -> dict:
+        with collect_stages() as stages:
+            with stage("embed"):
+                pass
+            await asyncio.gather(asyncio.to_thread(work), asyncio.to_thread(work))
+        return stages
+
+    stages = asyncio.run(run())
+
+    assert set(stages) == {"embed", "search"}
+
+
+def test_rag_query_reports_stage_timings_and_metrics(monkeypatch) -> None:
+    from services.rag import main
+
+    async def no_chunks(*args, **kwargs):
+        return []
+
+    emitted = []
+    monkeypatch.setattr(main, "retrieve", no_chunks)
+    monkeypatch.setattr(main, "_emit_events", lambda *a, **kw: emitted.append(kw))
+    client = TestClient(main.app)
+
+    meta = client.post("/rag/query", json={"question": "What is the factory?"}).json()["meta"]
+    metrics = client.get("/metrics")
+
+    assert {"pack", "generate", "emit"} <= set(meta["stage_ms"])
+    assert "emit" not in emitted[0]["stage_ms"]
+    assert metrics.headers["content-type"].startswith("text/plain")
+    assert 'factory_stage_seconds_count{stage="generate"}' in metrics.text
+    assert 'factory_http_requests_total{method="POST",route="/rag/query",status="200"}' in metrics.text
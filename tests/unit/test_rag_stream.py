@@ -0,0 +1,96 @@
+import json
+from typing import Any, Dict, List
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from services.rag import main
+from services.rag.generation import OllamaGenerator
+from tests.fakes.ollama import DEFAULT_ANSWER, create_app
+
+
+def _parse_sse(body: str) -> List[Dict[str, Any]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append({"event": fields["event"], "data": json.loads(fields["data"])})
+    return events
+
+
+@pytest.fixture
+def client(monkeypatch) -> TestClient:
+    fake = create_app()
+    generator = OllamaGenerator("http://ollama", "llama3.1:8b", transport=httpx.ASGITransport(app=fake))
+    emitted: List[Dict[str, Any]] = []
+
+    async def no_chunks(*args, **kwargs):
+        return []
+
+    monkeypatch.setattr(main, "generator", generator)
+    monkeypatch.setattr(main, "retrieve", no_chunks)
+    monkeypatch.setattr(main, "_emit_events", lambda *a, **kw: emitted.append({"args": a, **kw}))
+    test_client = TestClient(main.app)
+    test_client.emitted = emitted  # type: ignore[attr-defined]
+    return test_client
+
+
+def test_stream_relays_tokens_then_final_contract(client: TestClient) -> None:
+    resp = client.post("/rag/query/stream", json={"question": "What is the factory?"})
+
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events = _parse_sse(resp.text)
+    tokens = [e["data"]["text"] for e in events if e["event"] == "token"]
+    done = events[-1]
+
+    assert "".join(tokens) == DEFAULT_ANSWER
+    assert done["event"] == "done"
+    assert done["data"]["answer"] == DEFAULT_ANSWER
+    assert "citations" in done["data"]
+    assert done["data"]["meta"]["ttft_ms"] is not None
+    assert done["data"]["meta"]["ttft_ms"] <= done["data"]["meta"]["latency_ms"]
+
+
+def test_stream_emits_answer_event_with_ttft(client: TestClient) -> None:
+    client.post("/rag/query/stream", json={"question": "What is the factory?"})
+
+    (call,) = client.emitted  # type: ignore[attr-defined]
+    assert call["args"][1] == DEFAULT_ANSWER
+    assert call["ttft_ms"] is not None
+
+
+def test_stream_rejects_empty_question_before_streaming(client: TestClient) -> None:
+    resp = client.post("/rag/query/stream", json={"question": "  "})
+
+    assert resp.status_code == 400
+
+
+def test_stream_slot_is_released_when_client_leaves_before_the_body() -> None:
+    import asyncio
+
+    from starlette.requests import ClientDisconnect
+
+    from services.rag.admission import AdmissionController
+
+    ctl = AdmissionController(max_concurrency=1, max_queue=0)
+
+    async def scenario() -> None:
+        lease = await ctl.lease()
+
+        async def body():
+            yield b"never sent"
+
+        async def send(message):
+            raise OSError("client went away")
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        response = main.LeasedStreamingResponse(body(), lease=lease)
+        with pytest.raises(ClientDisconnect):
+            await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+
+    asyncio.run(scenario())
+
+    assert ctl.active == 0
@@ -1,8 +1,100 @@
 # Placeholder tests for retrieval utilities once real RAG is implemented.
 
+import asyncio
+from pathlib import Path
+
 
 def test_retrieval_interface_exists() -> None:
     from services.rag import retrieval  # type: ignore
 
     assert hasattr(retrieval, "retrieve")
-  
+
+
+def test_reciprocal_rank_fusion_rewards_agreement() -> None:
+    from services.rag.retrieval import reciprocal_rank_fusion
+
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "d"]])
+
+    assert fused[0][0] == "b"
+    assert reciprocal_rank_fusion([["x"], ["x"]])[0][1] == 1.0
+
+
+def test_hybrid_retrieval_finds_identifier_and_respects_top_k(tmp_path: Path) -> None:
+    from services.common.lexical_index import LexicalIndex
+    from services.common.vector_index import ChunkRecord, VectorIndex
+    from services.indexer.embedder import HashingEmbedder
+    from services.rag.retrieval import Retriever
+
+    embedder = HashingEmbedder()
+    vectors = VectorIndex(tmp_path / "vectors")
+    lexical = LexicalIndex(tmp_path / "lexical")
+    texts = [f"General guidance paragraph {i} about access reviews." for i in range(20)]
+    texts.append("Incident code INC-7781 was caused by an expired certificate.")
+    for i, text in enumerate(texts):
+        rec = ChunkRecord(chunk_id=f"doc{i}#0", document_id=f"doc{i}", index=0, text=text)
+        vectors.upsert_document(rec.document_id, [rec], embedder.embed([text]))
+        lexical.add(rec.chunk_id, text)
+    lexical.commit()
+
+    retriever = Retriever(vectors, lexical, embedder, embedding_model="hashing")
+    results = asyncio.run(retriever.retrieve("what caused INC-7781?", top_k=3, min_score=0.0))
+
+    assert len(results) == 3
+    assert results[0].doc_id == "doc20"
+
+
+def test_batch_retrieval_matches_single_queries(tmp_path: Path) -> None:
+    from services.common.lexical_index import LexicalIndex
+    from services.common.vector_index import ChunkRecord, VectorIndex
+    from services.indexer.embedder import HashingEmbedder
+    from services.rag.retrieval import Retriever
+
+    embedder = HashingEmbedder()
+    vectors = VectorIndex(tmp_path / "vectors")
+    lexical = LexicalIndex(tmp_path / "lexical")
+    for i in range(30):
+        text = f"Runbook {i} covers service-{i % 7} restarts and ticket OPS-{100 + i}."
+        rec = ChunkRecord(chunk_id=f"doc{i}#0", document_id=f"doc{i}", index=0, text=text)
+        vectors.upsert_document(rec.document_id, [rec], embedder.embed([text]))
+        lexical.add(rec.chunk_id, text)
+    lexical.commit()
+    vectors.delete_document("doc3")
+
+    retriever = Retriever(vectors, lexical, embedder, embedding_model="hashing")
+    questions = ["how do I restart service-2?", "what is OPS-117 about?", "OPS-103"]
+
+    batched = asyncio.run(retriever.retrieve_batch(questions, top_k=4, min_score=0.0))
+    single = [asyncio.run(retriever.retrieve(q, top_k=4, min_score=0.0)) for q in questions]
+
+    assert [[c.chunk_id for c in r] for r in batched] == [[c.chunk_id for c in r] for r in single]
+    assert all(c.doc_id != "doc3" for r in batched for c in r)
+
+
+def test_snapshot_survives_reload_and_compaction(tmp_path: Path) -> None:
+    from services.common.lexical_index import LexicalIndex
+    from services.common.vector_index import ChunkRecord, VectorIndex
+    from services.indexer.embedder import HashingEmbedder
+
+    embedder = HashingEmbedder()
+    writer = VectorIndex(tmp_path / "vectors")
+    lexical_writer = LexicalIndex(tmp_path / "lexical")
+    for i in range(6):
+        text = f"Vendor review note {i}."
+        rec = ChunkRecord(chunk_id=f"doc{i}#0", document_id=f"doc{i}", index=0, text=text)
+        writer.upsert_document(rec.document_id, [rec], embedder.embed([text]))
+        lexical_writer.add(rec.chunk_id, text)
+    lexical_writer.commit()
+
+    reader, lexical_reader = VectorIndex(tmp_path / "vectors"), LexicalIndex(tmp_path / "lexical")
+    vectors, lexical = reader.snapshot, lexical_reader.snapshot
+    for i in range(4):  # deleting most rows forces a compaction that renumbers them
+        writer.delete_document(f"doc{i}")
+        lexical_writer.delete_prefix(f"doc{i}#")
+    writer.compact()
+    lexical_writer.commit()
+    assert reader.refresh() and lexical_reader.refresh()
+
+    hits = vectors.search(embedder.embed(["vendor review note 5"])[0], top_k=6)
+    assert len(hits) == 6 and vectors.record(hits[0][0]).chunk_id == "doc5#0"
+    assert len(lexical.search("vendor", top_k=10)) == 6
+    assert len(reader) == 2 and len(lexical_reader) == 2
@@ -0,0 +1,127 @@
+import json
+import threading
+from datetime import datetime, timedelta
+
+from services.briefs.briefs.main import generate_brief
+from services.common.rollups import MAX_FAILURE_REASONS, OTHER_REASON, Rollup, RollupStore
+
+
+def _line(ts: datetime, event_type: str, **payload) -> str:
+    event = {"event_type": event_type, "service": "test", "payload": payload}
+    return json.dumps({"timestamp": ts.isoformat(), "prev_hash": None, "event": event, "record_hash": "x"}) + "\n"
+
+
+def _answer(ts: datetime, latency_ms: int, doc_id: str = "doc-a", **extra) -> str:
+    return _line(ts, "answer", latency_ms=latency_ms, citations=[{"doc_id": doc_id}], **extra)
+
+
+def test_catch_up_reads_only_new_complete_lines(tmp_path) -> None:
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    log = logs / "evidence-2026-01-01.jsonl"
+    t = datetime(2026, 1, 1, 9, 15)
+    store = RollupStore(tmp_path / "rollups")
+
+    log.write_text(_answer(t, 100) + _answer(t + timedelta(hours=1), 300))
+    assert store.catch_up(logs) == 2
+    assert store.catch_up(logs) == 0
+
+    # A half-written line waits until it is complete.
+    partial = _answer(t, 200, doc_id="doc-b", abstained=True)
+    with log.open("a") as f:
+        f.write(partial[:20])
+    assert store.catch_up(logs) == 0
+    with log.open("a") as f:
+        f.write(partial[20:])
+    assert store.catch_up(logs) == 1
+
+    nine = store.load(datetime(2026, 1, 1, 9))
+    assert nine.answers == 2 and nine.abstained == 1
+    assert nine.cited_documents == {"doc-a": 1, "doc-b": 1}
+    assert store.load(datetime(2026, 1, 1, 10)).answers == 1
+
+
+def test_lost_checkpoint_does_not_double_count(tmp_path) -> None:
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    t = datetime(2026, 1, 1, 9)
+    (logs / "evidence-2026-01-01.jsonl").write_text(_line(t, "ingestion", size_bytes=10) * 3)
+    store = RollupStore(tmp_path / "rollups")
+    store.catch_up(logs)
+
+    (tmp_path / "rollups" / "checkpoint.json").unlink()
+    store.catch_up(logs)
+
+    assert store.load(t).events["ingestion"] == 3
+    assert store.load(t).ingested_bytes == 30
+
+
+def test_log_directories_with_the_same_file_names_are_tracked_apart(tmp_path) -> None:
+    t = datetime(2026, 1, 1, 9)
+    bench, real = tmp_path / "bench", tmp_path / "real"
+    for logs, n, doc_id in ((bench, 50, "bench"), (real, 10, "real")):
+        logs.mkdir()
+        (logs / "evidence-2026-01-01.jsonl").write_text(_answer(t, 100, doc_id=doc_id) * n)
+    store = RollupStore(tmp_path / "rollups")
+
+    assert store.catch_up(bench) == 50
+    assert store.catch_up(real) == 10
+
+    assert store.load(t).answers == 60
+    assert store.load(t).cited_documents == {"bench": 50, "real": 10}
+
+
+def test_concurrent_catch_ups_count_each_line_once(tmp_path) -> None:
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    log = logs / "evidence-2026-01-01.jsonl"
+    t = datetime(2026, 1, 1, 9)
+    stores = [RollupStore(tmp_path / "rollups") for _ in range(4)]  # as if from separate processes
+
+    def writer_and_reader(store: RollupStore) -> None:
+        for _ in range(25):
+            with log.open("a") as f:
+                f.write(_line(t, "ingestion", size_bytes=1))
+            store.catch_up(logs)
+
+    threads = [threading.Thread(target=writer_and_reader, args=(s,)) for s in stores]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stores[0].catch_up(logs)
+
+    assert stores[0].load(t).events["ingestion"] == 100
+
+
+def test_failure_reasons_overflow_into_other() -> None:
+    rollup = Rollup()
+    for i in range(MAX_FAILURE_REASONS + 5):
+        rollup.add({"event_type": "evaluation", "payload": {"passed": False, "failure_reasons": [f"missing {i}"]}})
+    rollup.add({"event_type": "evaluation", "payload": {"failure_reasons": ["missing 0"]}})
+
+    assert len(rollup.failure_reasons) == MAX_FAILURE_REASONS + 1
+    assert rollup.failure_reasons[OTHER_REASON] == 5
+    assert rollup.failure_reasons["eval: missing 0"] == 2
+
+
+def test_brief_merges_hourly_rollups(tmp_path) -> None:
+    logs = tmp_path / "logs"
+    logs.mkdir()
+    now = datetime(2026, 1, 2, 8, 30)
+    lines = [_answer(now - timedelta(hours=h), 100 * h) for h in range(1, 6)]
+    lines.append(_line(now - timedelta(hours=2), "index", num_chunks=4, status="error", error_message="parse failed"))
+    lines.append(_line(now - timedelta(hours=3), "evaluation", passed=False, failure_reasons=["missing phrase"]))
+    lines.append(_answer(now - timedelta(days=3), 100))  # outside the period
+    (logs / "evidence-2026-01-02.jsonl").write_text("".join(lines))
+
+    ev = generate_brief(now, log_dir=logs, rollup_dir=tmp_path / "rollups", brief_dir=tmp_path / "briefs")
+
+    text = (tmp_path / "briefs" / "2026-01-02_daily_brief.md").read_text()
+    assert ev.payload.num_items == 7
+    assert "- Questions answered: 5" in text
+    assert "- doc-a: 5" in text
+    assert "- Cases passed: 0/1" in text
+    assert "- index: parse failed: 1" in text
+    assert "- eval: missing phrase: 1" in text
+    assert "p50" in text
@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+from fastapi.testclient import TestClient
+
+from services.common import tracing
+from services.common.tracing import format_trace, parse_traceparent, span, trace_headers
+
+
+INCOMING = "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"
+
+
+def test_parse_traceparent_rejects_malformed_headers() -> None:
+    assert parse_traceparent(INCOMING) == ("0af7651916cd43dd8448eb211c80319c", "b7ad6b7169203331")
+    assert parse_traceparent("00-" + "0" * 32 + "-b7ad6b7169203331-01") is None
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(None) is None
+
+
+def test_spans_nest_and_follow_threads() -> None:
+    async def run() -> dict:
+        with span("root", service="rag-api") as root:
+            inner = await asyncio.to_thread(lambda: trace_headers()["traceparent"])
+        return {"root": root, "inner": inner}
+
+    out = asyncio.run(run())
+
+    assert out["inner"] == out["root"].traceparent
+    assert trace_headers() == {}
+
+
+def test_rag_query_continues_trace_into_events_and_span_file(monkeypatch, tmp_path) -> None:
+    from services.rag import main
+
+    async def no_chunks(*args, **kwargs):
+        return []
+
+    posted = []
+    monkeypatch.setattr(tracing, "_trace_path", tracing._trace_path)
+    tracing.configure(str(tmp_path / "spans.jsonl"))
+    monkeypatch.setattr(main, "retrieve", no_chunks)
+    monkeypatch.setattr(main, "_post_events", posted.append)
+    client = TestClient(main.app)
+
+    resp = client.post("/rag/query", json={"question": "What is tracing?"}, headers={"traceparent": INCOMING})
+
+    trace_id = "0af7651916cd43dd8448eb211c80319c"
+    assert resp.headers["traceparent"].startswith(f"00-{trace_id}-")
+    assert {e["data"]["trace_id"] for e in posted[0]} == {trace_id}
+
+    tracing.flush()
+    spans = [json.loads(line) for line in (tmp_path / "spans.jsonl").read_text().splitlines()]
+    root = next(s for s in spans if s["name"] == "POST /rag/query")
+    assert root["parent_id"] == "b7ad6b7169203331" and root["service"] == "rag-api"
+    assert {"pack", "generate"} <= {s["name"] for s in spans if s["parent_id"] == root["span_id"]}
+    assert "POST /rag/query [rag-api]" in format_trace(spans)
+    tracing.configure(None)